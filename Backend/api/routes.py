@@ -1,40 +1,144 @@
 from fastapi import APIRouter, HTTPException
-from services.scraper import Scraper
-from services.rag import ask_question
-from services.reset import clear_embeddings
+from fastapi.responses import StreamingResponse
+from config import ANSWER_MODE, RETRIEVAL_MODE, DEFAULT_COLLECTION
+from typing import Optional
+import asyncio
+
+# Service modules are imported in the handlers, so importing the app stays
+# fast; the startup warm-up (services.warmup) imports them before serving.
 
 router = APIRouter()
 
-@router.post("/ingest-url/")
-async def ingest_url(url: str, max_depth: int = 1):
+def _check_collection(collection: str):
+    from services.vectorstore import validate_collection
+
+    try:
+        validate_collection(collection)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@router.post("/ingest-url/", status_code=202)
+async def ingest_url(url: str, max_depth: int = 1, collection: str = DEFAULT_COLLECTION):
     """
      Endpoint to enter the URL to be scraped .
+     The crawl runs as a background job; poll /ingest-jobs/{job_id} for progress.
+     Its pages are stored in `collection`, which is created if needed.
      """
+    from services.jobs import job_manager, JobQueueFull
+
+    _check_collection(collection)
     try:
-        scraper = Scraper(base_url=url, max_depth=max_depth)
-        scraper.scrape()
-        return {"message": "URL processed successfully!", "result": "Data stored in pgvector > scraptable > embedding"}
+        job = job_manager.submit(url, max_depth=max_depth, collection=collection)
+        return {"message": "URL queued for ingestion.", "job_id": job.id, "status": job.status}
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/ingest-jobs/")
+async def list_ingest_jobs():
+    """
+    Endpoint to list known ingestion jobs and their progress.
+    """
+    from services.jobs import job_manager
+
+    return {"jobs": [job.to_dict() for job in job_manager.list()]}
+
+@router.get("/ingest-jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    """
+    Endpoint to report the status and progress of one ingestion job.
+    """
+    from services.jobs import job_manager
+
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job.to_dict()
+
+@router.delete("/ingest-jobs/{job_id}")
+async def cancel_ingest_job(job_id: str):
+    """
+    Endpoint to cancel a queued or running ingestion job.
+    """
+    from services.jobs import job_manager
+
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job.to_dict()
+
 @router.post("/ask-question/")
-async def ask_question_endpoint(question: str):
+async def ask_question_endpoint(question: str, top_k: int = 3, mode: str = ANSWER_MODE, stream: bool = False,
+                                retrieval: str = RETRIEVAL_MODE, collection: str = DEFAULT_COLLECTION):
     """
     Endpoint to ask questions based on the scraped and embedded content.
+    With stream=true the answer is generated from all retrieved content in one
+    prompt and returned as plain text while the LLM produces it.
+    retrieval selects how content is found: "vector", "keyword" or "hybrid".
+    Only the content of `collection` is searched.
     """
+    from services.rag import ask_question, stream_answer, ANSWER_MODES, RETRIEVAL_MODES
+
+    _check_collection(collection)
+    if mode not in ANSWER_MODES:
+        raise HTTPException(status_code=422, detail=f"mode must be one of {ANSWER_MODES}")
+    if retrieval not in RETRIEVAL_MODES:
+        raise HTTPException(status_code=422, detail=f"retrieval must be one of {RETRIEVAL_MODES}")
+    if stream:
+        return StreamingResponse(stream_answer(question, top_k=top_k, retrieval=retrieval, collection=collection),
+                                 media_type="text/plain")
     try:
-        answer = ask_question(question)
+        # Retrieval and LLM calls block, keep them off the event loop
+        answer = await asyncio.to_thread(ask_question, question, top_k=top_k, mode=mode, retrieval=retrieval,
+                                         collection=collection)
         return {"question": question, "answer": answer}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/reset-embeddings/")
-async def reset_embeddings():
+async def reset_embeddings(collection: Optional[str] = None):
     """
-    Endpoint to clear all data in the embeddings table.
+    Endpoint to clear all data in the embeddings table, or with `collection`
+    only that collection's, which drops its partition.
     """
+    from services.reset import clear_embeddings
+
+    if collection is not None:
+        _check_collection(collection)
     try:
-        clear_embeddings()
-        return {"status": "success", "message": "All embeddings have been cleared."}
+        cleared = await asyncio.to_thread(clear_embeddings, collection)
+        if collection is None:
+            return {"status": "success", "message": "All embeddings have been cleared."}
+        if not cleared:
+            raise HTTPException(status_code=404, detail=f"Collection '{collection}' not found.")
+        return {"status": "success", "message": f"Collection '{collection}' has been cleared."}
+    except HTTPException:
+        raise
     except Exception as e:
-        return {"status": "error", "message": str(e)}
\ No newline at end of file
+        return {"status": "error", "message": str(e)}
+
+@router.get("/collections/")
+async def list_collections():
+    """
+    Endpoint to list the collections with their approximate row counts and sizes.
+    """
+    from services.vectorstore import VectorDB
+
+    def collections():
+        with VectorDB() as db:
+            return db.list_collections()
+
+    try:
+        return {"collections": await asyncio.to_thread(collections)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache-stats/")
+async def get_cache_stats():
+    """
+    Endpoint to report hit/miss counts and sizes of the embedding and answer caches.
+    """
+    from services.cache import cache_stats
+
+    return cache_stats()
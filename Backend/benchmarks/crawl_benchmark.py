@@ -0,0 +1,70 @@
+"""
+Crawl throughput benchmark against a local synthetic website.
+
+With --sitemap the site serves a sitemap of every page, ranked so later
+pages come first, and with --max-pages the crawl stops after that many pages.
+Together they show which pages a budgeted crawl reaches.
+
+Usage (from the Backend directory):
+    python -m benchmarks.crawl_benchmark --pages 300 --depth 2 --latency 0.02
+    python -m benchmarks.crawl_benchmark --pages 1000 --depth 1 --sitemap --max-pages 100
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")  # Nothing is sent to OpenAI
+
+from benchmarks.site_server import serve_site
+from services.scraper import Scraper
+
+
+class BenchmarkScraper(Scraper):
+    """Scraper that drops extracted content instead of embedding and storing it."""
+
+    def _store_to_db(self, chunks, url, meta=None):
+        pass
+
+
+def run(mode: str, base_url: str, depth: int, concurrency: int, rps: float, max_pages: int = 0) -> dict:
+    scraper = BenchmarkScraper(
+        base_url, max_depth=depth, concurrency=concurrency,
+        per_host_concurrency=concurrency, per_host_rps=rps, incremental=False, max_pages=max_pages
+    )
+    start = time.perf_counter()
+    if mode == "sync":
+        scraper.scrape()
+    else:
+        asyncio.run(scraper.scrape_async())
+    elapsed = time.perf_counter() - start
+    pages = len(scraper.visited_urls)
+    page_ids = [int(url.rsplit("/", 1)[-1]) for url in scraper.visited_urls if "/page/" in url]
+    return {"mode": mode, "pages": pages, "seconds": round(elapsed, 3), "pages_per_sec": round(pages / elapsed, 1),
+            "bytes": scraper.progress.bytes_fetched, "sitemap_urls": scraper.progress.sitemap_urls,
+            "median_page": sorted(page_ids)[len(page_ids) // 2] if page_ids else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--fanout", type=int, default=15)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.02, help="Server-side delay per request (seconds)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rps", type=float, default=0, help="Per-host rate limit, 0 disables it")
+    parser.add_argument("--modes", default="sync,async")
+    parser.add_argument("--sitemap", action="store_true", help="Serve a sitemap of every page")
+    parser.add_argument("--max-pages", type=int, default=0, help="Crawl budget in pages, 0 for none")
+    args = parser.parse_args()
+
+    with serve_site(pages=args.pages, fanout=args.fanout, latency=args.latency, sitemap=args.sitemap) as base_url:
+        for mode in args.modes.split(","):
+            result = run(mode, base_url, args.depth, args.concurrency, args.rps, args.max_pages)
+            print(f"{result['mode']:>6}: {result['pages']} pages in {result['seconds']}s "
+                  f"({result['pages_per_sec']} pages/sec), {result['bytes'] / 2**20:.1f} MB, "
+                  f"{result['sitemap_urls']} sitemap URLs, median page id {result['median_page']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Local embedding throughput: texts/sec per provider and batch size.
+
+Runs entirely offline. The hashing provider is always available; the onnx and
+sentence-transformers providers are included when their packages are
+installed and LOCAL_EMBEDDING_MODEL points at a model.
+
+Usage (from the Backend directory):
+    python -m benchmarks.embedding_benchmark --texts 2000 --words 350 --batch-sizes 16,64,256
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")  # Nothing is sent to OpenAI
+
+from services.embedding import (
+    HashingEmbeddingProvider, OnnxEmbeddingProvider, SentenceTransformerEmbeddingProvider
+)
+
+
+def make_texts(count: int, words: int) -> list:
+    # Varying lengths, like the chunks of real pages
+    return [" ".join(f"word{(i * 7 + j) % 5000}" for j in range(words // 2 + i % (words // 2 + 1)))
+            for i in range(count)]
+
+
+def load_providers(names: list, batch_size: int, threads: int) -> dict:
+    providers = {}
+    for name in names:
+        try:
+            if name == "hashing":
+                providers[name] = HashingEmbeddingProvider(batch_size=batch_size)
+            elif name == "onnx":
+                providers[name] = OnnxEmbeddingProvider(batch_size=batch_size, threads=threads)
+            elif name == "sentence-transformers":
+                providers[name] = SentenceTransformerEmbeddingProvider(batch_size=batch_size, threads=threads)
+        except Exception as e:
+            print(f"{name:>22}: skipped ({e})")
+    return providers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=350)
+    parser.add_argument("--batch-sizes", default="16,64,256")
+    parser.add_argument("--threads", type=int, default=0, help="Inference threads, 0 uses all cores")
+    parser.add_argument("--providers", default="hashing,onnx,sentence-transformers")
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts, args.words)
+    providers = load_providers(args.providers.split(","), 1, args.threads)
+    for name, provider in providers.items():
+        for batch_size in (int(size) for size in args.batch_sizes.split(",")):
+            provider.batch_size = batch_size
+            start = time.perf_counter()
+            provider.embed(texts)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>22} batch {batch_size:>4}: {len(texts) / elapsed:>9.1f} texts/sec "
+                  f"({provider.dimension} dims)")
+
+
+if __name__ == "__main__":
+    main()
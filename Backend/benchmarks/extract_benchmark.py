@@ -0,0 +1,98 @@
+"""
+HTML extraction benchmark: pages/sec and peak RSS per parser backend.
+
+"baseline" is the pre-extraction path (BeautifulSoup html.parser, get_text,
+find_all('a') and two regex cleaning passes); the others use
+services.extract with the given backend. Each backend runs in its own
+process so peak RSS figures do not contaminate each other.
+
+Usage (from the Backend directory):
+    python -m benchmarks.extract_benchmark --pages 200 --words 5000
+"""
+import argparse
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")  # Nothing is sent to OpenAI
+
+from benchmarks.site_server import render_page
+
+PAGE_URL = "http://bench.local/page/0"
+
+
+def make_pages(count: int, words: int) -> list:
+    script = "<script>" + "var x = 1;" * 5000 + "</script>"
+    pages = []
+    for page_id in range(count):
+        html = render_page(page_id, count, 50, words).decode("utf-8")
+        pages.append(html.replace("</body>", script + "</body>").encode("utf-8"))
+    return pages
+
+
+def baseline(html: bytes):
+    from bs4 import BeautifulSoup
+    from urllib.parse import urljoin
+    from utils.text_utils import clean_text
+
+    soup = BeautifulSoup(html.decode("utf-8"), "html.parser")
+    text = re.sub(r"\s+", " ", soup.get_text())
+    text = re.sub(r"[^\x00-\x7F]+", "", text).strip()
+    links = [urljoin(PAGE_URL, a["href"]) for a in soup.find_all("a", href=True)]
+    return clean_text(text), links
+
+
+def run_worker(backend: str, pages: int, words: int) -> dict:
+    from services.extract import extract
+    from utils.text_utils import clean_text
+
+    documents = make_pages(pages, words)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    for html in documents:
+        if backend == "baseline":
+            baseline(html)
+        else:
+            extracted = extract(html, PAGE_URL, backend=backend)
+            clean_text(extracted.text)
+    elapsed = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+    return {
+        "backend": backend,
+        "pages_per_sec": round(pages / elapsed, 1),
+        "peak_rss_mb": round(peak_rss / 1024, 1),
+        "parse_rss_growth_mb": round((peak_rss - rss_before) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--words", type=int, default=5000)
+    parser.add_argument("--backends", default=None, help="Comma-separated, defaults to baseline + all installed")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.pages, args.words)))
+        return
+
+    from services.extract import available_backends
+    backends = args.backends.split(",") if args.backends else ["baseline"] + available_backends()
+    for backend in backends:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.extract_benchmark", "--worker", backend,
+             "--pages", str(args.pages), "--words", str(args.words)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{result['backend']:>12}: {result['pages_per_sec']:>8} pages/sec, "
+              f"peak RSS {result['peak_rss_mb']} MB (+{result['parse_rss_growth_mb']} MB while parsing)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import base64
+import json
+import multiprocessing
+import re
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+ANSWER = "According to the sources, the answer is in the first passage."
+
+
+def fake_embedding(text: str, dim: int) -> np.ndarray:
+    """
+    Embeds text by hashing its words into `dim` buckets, so texts that share
+    words get similar vectors and vector retrieval returns sensible results.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in _TOKEN.findall(text.lower()):
+        vector[zlib.crc32(word.encode("utf-8")) % dim] += 1.0
+    norm = float(np.linalg.norm(vector))
+    if not norm:
+        vector[0], norm = 1.0, 1.0
+    return vector / norm
+
+
+class _Quota:
+    """
+    Requests- and tokens-per-minute limits enforced like OpenAI's: continuously
+    refilled budgets, a 429 with Retry-After when one runs out, and
+    x-ratelimit-* headers on every response.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.limits = {"requests": rpm, "tokens": tpm}
+        self.remaining = dict(self.limits)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, tokens: int):
+        """
+        Returns (allowed, seconds until allowed, headers).
+        """
+        cost = {"requests": 1, "tokens": tokens}
+        with self.lock:
+            now = time.monotonic()
+            for kind, limit in self.limits.items():
+                if limit:
+                    self.remaining[kind] = min(limit, self.remaining[kind] + (now - self.updated) * limit / 60)
+            self.updated = now
+            short = [(cost[kind] - self.remaining[kind]) * 60 / limit for kind, limit in self.limits.items()
+                     if limit and self.remaining[kind] < min(cost[kind], limit)]
+            if not short:
+                for kind, limit in self.limits.items():
+                    if limit:
+                        self.remaining[kind] -= min(cost[kind], limit)
+            headers = {}
+            for kind, limit in self.limits.items():
+                if limit:
+                    headers[f"x-ratelimit-limit-{kind}"] = str(limit)
+                    headers[f"x-ratelimit-remaining-{kind}"] = str(max(0, int(self.remaining[kind])))
+            return not short, max(short, default=0.0), headers
+
+
+def _make_handler(dim: int, embedding_latency: float, chat_latency: float, stream_chunks: int,
+                  rpm: int = 0, tpm: int = 0):
+    quota = _Quota(rpm, tpm)
+
+    class OpenAIHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # Headers and body are separate writes; don't delay the body
+        rate_headers = {}
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            allowed, retry_after, self.rate_headers = quota.take(self._tokens(request))
+            if not allowed:
+                self.rate_headers["retry-after-ms"] = str(int(retry_after * 1000) + 1)
+                self._send_json({"error": {"message": "Rate limit reached", "type": "requests",
+                                           "code": "rate_limit_exceeded"}}, status=429)
+                return
+            if self.path.endswith("/embeddings"):
+                self._embeddings(request)
+            elif self.path.endswith("/chat/completions"):
+                self._chat(request)
+            else:
+                self._send_json({"error": {"message": f"Unknown path {self.path}"}}, status=404)
+
+        def _embeddings(self, request):
+            if embedding_latency:
+                time.sleep(embedding_latency)
+            inputs = request["input"] if isinstance(request["input"], list) else [request["input"]]
+            tokens = sum(len(text) // 4 + 1 for text in inputs)
+            vectors = [fake_embedding(text, dim) for text in inputs]
+            if request.get("encoding_format") == "base64":
+                # What the SDK asks for by default: little-endian float32, base64-encoded
+                vectors = [base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii") for vector in vectors]
+            else:
+                vectors = [vector.tolist() for vector in vectors]
+            self._send_json({
+                "object": "list",
+                "model": request.get("model", "fake"),
+                "data": [{"object": "embedding", "index": i, "embedding": vector} for i, vector in enumerate(vectors)],
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+
+        def _chat(self, request):
+            prompt_tokens = sum(len(message.get("content") or "") // 4 + 1 for message in request["messages"])
+            completion_tokens = len(ANSWER) // 4 + 1
+            if not request.get("stream"):
+                if chat_latency:
+                    time.sleep(chat_latency)
+                self._send_json({
+                    "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                    "model": request.get("model", "fake"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": ANSWER}}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                              "total_tokens": prompt_tokens + completion_tokens},
+                })
+                return
+
+            # Stream the answer in pieces spread over the latency, as a real model would
+            self.send_response(200)
+            for name, value in self.rate_headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            words = ANSWER.split(" ")
+            size = -(-len(words) // stream_chunks)
+            pieces = [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+            pieces[-1] = pieces[-1].rstrip()
+            for piece in pieces:
+                time.sleep(chat_latency / len(pieces))
+                event = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": request.get("model", "fake"),
+                         "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+        @staticmethod
+        def _tokens(request):
+            if "messages" in request:
+                text = " ".join(message.get("content") or "" for message in request["messages"])
+                return len(text) // 4 + 1 + (request.get("max_tokens") or 0)
+            inputs = request.get("input") or []
+            return sum(len(text) // 4 + 1 for text in (inputs if isinstance(inputs, list) else [inputs]))
+
+        def _send_json(self, payload, status=200):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            for name, value in self.rate_headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return OpenAIHandler
+
+
+def _serve_forever(handler_args, port_queue):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(*handler_args))
+    server.daemon_threads = True
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+@contextmanager
+def serve_openai(dim: int = 1536, embedding_latency: float = 0.0, chat_latency: float = 0.0,
+                 stream_chunks: int = 8, separate_process: bool = True, rpm: int = 0, tpm: int = 0):
+    """
+    Runs a local stand-in for the OpenAI embeddings and chat completions API
+    for the duration of the block. Every request waits for the configured
+    latency, and responses carry token usage like the real API's. With `rpm`
+    or `tpm` set, requests beyond that quota are rejected with 429s.
+
+    With `separate_process` (the default), the server runs in a child process
+    so serving requests does not compete with the code under test for the GIL.
+
+    Yields:
+        str: The base URL to use as OPENAI_BASE_URL.
+    """
+    handler_args = (dim, embedding_latency, chat_latency, stream_chunks, rpm, tpm)
+    if separate_process:
+        port_queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=_serve_forever, args=(handler_args, port_queue), daemon=True)
+        process.start()
+        try:
+            yield f"http://127.0.0.1:{port_queue.get(timeout=10)}/v1"
+        finally:
+            process.terminate()
+            process.join()
+        return
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(*handler_args))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    finally:
+        server.shutdown()
+        server.server_close()
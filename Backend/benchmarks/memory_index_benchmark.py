@@ -0,0 +1,80 @@
+"""
+In-process vector index benchmark: query latency and recall of float32 and
+int8 indexes against exact float64 search, plus incremental refresh cost.
+
+Rows come from a stand-in for VectorDB, so no database is needed.
+
+Usage (from the Backend directory):
+    python -m benchmarks.memory_index_benchmark --rows 50000 --dim 1536 --queries 200
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")  # Nothing is sent to OpenAI
+
+import numpy as np
+
+from benchmarks.stand_in_store import StandInStore, install
+from services.memory_index import MemoryVectorIndex
+
+
+def make_rows(vectors: np.ndarray, first_id: int, updated_at: datetime) -> list:
+    return [{"id": first_id + i, "url": f"https://example.com/{first_id + i}", "content": f"chunk {first_id + i}",
+             "embedding": vector, "updated_at": updated_at} for i, vector in enumerate(vectors)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--new-rows", type=int, default=1000, help="Rows added before the refresh measurement")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.rows, args.dim), dtype=np.float32)
+    queries = vectors[rng.choice(args.rows, args.queries)] + 0.5 * rng.standard_normal((args.queries, args.dim))
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    exact = [set(np.argsort(-(unit.astype(np.float64) @ q))[:args.top_k]) for q in queries]
+
+    install()
+    loaded_at = datetime.now(timezone.utc) - timedelta(hours=1)
+    for dtype in ("float32", "int8"):
+        StandInStore.reset()
+        StandInStore.add_rows(make_rows(vectors, 0, loaded_at))
+        with tempfile.TemporaryDirectory() as snapshot:
+            index = MemoryVectorIndex(dtype, snapshot_path=snapshot, refresh_seconds=1e9)
+            start = time.perf_counter()
+            index.load()
+            load_seconds = time.perf_counter() - start
+
+            latencies, hits = [], 0
+            for query, expected in zip(queries, exact):
+                start = time.perf_counter()
+                results = index.search(query.tolist(), args.top_k)
+                latencies.append(time.perf_counter() - start)
+                hits += len(expected & {row["id"] for row in results})
+
+            StandInStore.add_rows(make_rows(vectors[:args.new_rows], args.rows, loaded_at + timedelta(minutes=5)))
+            start = time.perf_counter()
+            index.refresh()
+            refresh_seconds = time.perf_counter() - start
+
+            reloaded = MemoryVectorIndex(dtype, snapshot_path=snapshot)
+            start = time.perf_counter()
+            reloaded.load_snapshot()
+            snapshot_seconds = time.perf_counter() - start
+
+        print(f"{dtype:>8}: p50 {np.percentile(latencies, 50) * 1000:.2f} ms, "
+              f"p99 {np.percentile(latencies, 99) * 1000:.2f} ms, "
+              f"recall@{args.top_k} {hits / (len(queries) * args.top_k):.3f}, "
+              f"matrix {index._state.matrix.nbytes / 2**20:.0f} MB, load {load_seconds:.2f}s, "
+              f"refresh +{args.new_rows} rows {refresh_seconds:.2f}s, snapshot map {snapshot_seconds * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Async crawl throughput with parsing and chunking offloaded to a process pool.
+
+Pages are large enough that parsing, cleaning and chunking dominate; the run
+with 0 workers does that work in threads under the GIL. The site is served
+from a separate process so it does not compete with the crawler for the GIL.
+
+Usage (from the Backend directory):
+    python -m benchmarks.parse_pool_benchmark --pages 300 --words 20000 --workers 0,1,2,4
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")  # Nothing is sent to OpenAI
+
+from benchmarks.crawl_benchmark import BenchmarkScraper
+from benchmarks.site_server import serve_site
+
+
+def run(base_url: str, depth: int, concurrency: int, workers: int) -> dict:
+    scraper = BenchmarkScraper(
+        base_url, max_depth=depth, concurrency=concurrency, per_host_concurrency=concurrency,
+        per_host_rps=0, incremental=False, parse_workers=workers
+    )
+    start = time.perf_counter()
+    asyncio.run(scraper.scrape_async())
+    elapsed = time.perf_counter() - start
+    pages = len(scraper.visited_urls)
+    return {"workers": workers, "pages": pages, "seconds": round(elapsed, 3),
+            "pages_per_sec": round(pages / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--fanout", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--words", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", default="0,1,2,4", help="Comma-separated parse pool sizes to compare")
+    args = parser.parse_args()
+
+    print(f"CPUs: {os.cpu_count()}")
+    with serve_site(pages=args.pages, fanout=args.fanout, words=args.words, separate_process=True) as base_url:
+        for workers in (int(w) for w in args.workers.split(",")):
+            result = run(base_url, args.depth, args.concurrency, workers)
+            print(f"{result['workers']:>3} workers: {result['pages']} pages in {result['seconds']}s "
+                  f"({result['pages_per_sec']} pages/sec)")
+
+
+if __name__ == "__main__":
+    main()
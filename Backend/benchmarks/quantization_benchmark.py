@@ -0,0 +1,140 @@
+"""
+Vector quantization benchmark: recall and latency of a halfvec or binary
+first pass re-ranked by exact distance, against exact float32 search.
+
+By default the first pass is simulated in-process with numpy, exactly as
+pgvector quantizes (float16 values for halfvec, sign bits and Hamming
+distance for binary), so quantization error is measured apart from ANN
+index error. No database is needed.
+
+With --postgres, rows are loaded into a scratch collection of the configured
+database and searched through VectorDB.query_similar with the
+VECTOR_QUANTIZATION and QUANTIZED_CANDIDATES of the environment; the
+collection is dropped afterwards.
+
+Usage (from the Backend directory):
+    python -m benchmarks.quantization_benchmark --rows 50000 --dim 1536 --queries 200
+    VECTOR_QUANTIZATION=binary python -m benchmarks.quantization_benchmark --postgres --rows 20000
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")  # Nothing is sent to OpenAI
+
+import numpy as np
+
+SCRATCH_COLLECTION = "quantization_bench"
+
+
+def make_vectors(rows: int, dim: int, queries: int, rng) -> tuple:
+    """
+    Unit vectors drawn around a few hundred topic centres, as embeddings of
+    real pages cluster, plus queries near random rows.
+    """
+    centres = rng.standard_normal((max(1, rows // 200), dim), dtype=np.float32)
+    vectors = centres[rng.integers(len(centres), size=rows)] + rng.standard_normal((rows, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    picked = vectors[rng.choice(rows, queries)]
+    query_vectors = picked + 0.8 * rng.standard_normal((queries, dim), dtype=np.float32) / np.sqrt(dim)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return vectors, query_vectors.astype(np.float32)
+
+
+def first_pass(kind: str, vectors: np.ndarray):
+    """
+    Returns (bytes per vector, scorer) for a quantization; the scorer gives
+    the first-pass distance of every row to a query.
+    """
+    if kind == "none":
+        return vectors.itemsize * vectors.shape[1], lambda query: -(vectors @ query)
+    if kind == "halfvec":
+        # numpy has no fast float16 matmul, so score the float16-rounded values in float32 as pgvector does
+        half = vectors.astype(np.float16).astype(np.float32)
+        return 2 * half.shape[1], lambda query: -(half @ query.astype(np.float16).astype(np.float32))
+    bits = np.packbits(vectors > 0, axis=1)
+    return bits.shape[1], lambda query: np.bitwise_count(bits ^ np.packbits(query > 0)).sum(axis=1)
+
+
+def run_in_process(args, vectors: np.ndarray, queries: np.ndarray, exact: list):
+    for kind in ("none", "halfvec", "binary"):
+        vector_bytes, score = first_pass(kind, vectors)
+        for candidates in ([args.top_k] if kind == "none" else args.candidates):
+            latencies, hits = [], 0
+            for query, expected in zip(queries, exact):
+                start = time.perf_counter()
+                distances = score(query)
+                shortlist = np.argpartition(distances, candidates)[:candidates]
+                # Re-rank the shortlist by exact distance on the full vectors
+                found = shortlist[np.argsort(-(vectors[shortlist] @ query))[:args.top_k]]
+                latencies.append(time.perf_counter() - start)
+                hits += len(expected & set(found.tolist()))
+            print(f"{kind:>8} re-rank {candidates:>4}: p50 {np.percentile(latencies, 50) * 1000:.2f} ms, "
+                  f"p99 {np.percentile(latencies, 99) * 1000:.2f} ms, "
+                  f"recall@{args.top_k} {hits / (len(queries) * args.top_k):.3f}, "
+                  f"{vector_bytes} bytes/vector ({vectors.itemsize * vectors.shape[1] / vector_bytes:.0f}x smaller)")
+
+
+def run_postgres(args, vectors: np.ndarray, queries: np.ndarray, exact: list):
+    from config import VECTOR_INDEX_TYPE, VECTOR_QUANTIZATION, QUANTIZED_CANDIDATES
+    from services.vectorstore import VectorDB, _partition_name, _vector_index_name, init_db
+
+    init_db()
+    try:
+        with VectorDB() as db:
+            db.insert_vectors([(f"https://bench.example/{i}", 0, f"chunk {i}", vector.tolist())
+                               for i, vector in enumerate(vectors)], collection=SCRATCH_COLLECTION)
+            db.cursor.execute(f"SELECT id, url FROM {_partition_name(SCRATCH_COLLECTION)};")
+            row_ids = {row["url"]: row["id"] for row in db.cursor.fetchall()}
+            exact_ids = [{row_ids[f"https://bench.example/{i}"] for i in expected} for expected in exact]
+        with VectorDB() as db:
+            start = time.perf_counter()
+            db.rebuild_index(SCRATCH_COLLECTION)
+            build_seconds = time.perf_counter() - start
+            # Partition indexes built with the parent's are named by Postgres, so find it by its parent
+            db.cursor.execute("""
+            SELECT coalesce(sum(pg_relation_size(x.indexrelid)), 0) AS bytes
+            FROM pg_index x JOIN pg_inherits i ON i.inhrelid = x.indexrelid
+            WHERE x.indrelid = %s::regclass AND i.inhparent = %s::regclass;
+            """, (_partition_name(SCRATCH_COLLECTION), _vector_index_name()))
+            index_bytes = db.cursor.fetchone()["bytes"]
+
+        latencies, hits = [], 0
+        with VectorDB() as db:
+            for query, expected in zip(queries, exact_ids):
+                start = time.perf_counter()
+                results = db.query_similar(query.tolist(), args.top_k, with_content=False,
+                                           collection=SCRATCH_COLLECTION)
+                latencies.append(time.perf_counter() - start)
+                db.conn.rollback()
+                hits += len(expected & {row["id"] for row in results})
+        print(f"{VECTOR_INDEX_TYPE}/{VECTOR_QUANTIZATION} re-rank {QUANTIZED_CANDIDATES}: "
+              f"p50 {np.percentile(latencies, 50) * 1000:.2f} ms, p99 {np.percentile(latencies, 99) * 1000:.2f} ms, "
+              f"recall@{args.top_k} {hits / (len(queries) * args.top_k):.3f}, "
+              f"index {index_bytes / 2**20:.1f} MB, build {build_seconds:.1f}s")
+    finally:
+        with VectorDB() as db:
+            db.drop_collection(SCRATCH_COLLECTION)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[20, 50, 100, 200],
+                        help="Shortlist sizes re-ranked in-process")
+    parser.add_argument("--postgres", action="store_true", help="Measure the configured database instead")
+    args = parser.parse_args()
+
+    vectors, queries = make_vectors(args.rows, args.dim, args.queries, np.random.default_rng(0))
+    exact = [set(np.argsort(-(vectors.astype(np.float64) @ query))[:args.top_k].tolist()) for query in queries]
+    if args.postgres:
+        run_postgres(args, vectors, queries, exact)
+    else:
+        run_in_process(args, vectors, queries, exact)
+
+
+if __name__ == "__main__":
+    main()
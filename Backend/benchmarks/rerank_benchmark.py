@@ -0,0 +1,118 @@
+"""
+Re-ranking benchmark: how often the passage that answers a question reaches
+the LLM, and how many prompt tokens that takes, with and without the
+re-ranking stage (RERANK_OVERFETCH).
+
+A synthetic site is chunked as ingestion would chunk it, with some pages
+mirrored under a second URL. Each question asks about a fact planted in one
+page. Embeddings are the fake ones of benchmarks.fake_openai and rows live in
+the in-memory stand-in for the database, so no network access, API key or
+database is needed. Prompts are built but not sent.
+
+Usage (from the Backend directory):
+    python -m benchmarks.rerank_benchmark --pages 300 --questions 100 --top-k 3
+"""
+import argparse
+import os
+import random
+from datetime import datetime, timezone
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")  # Nothing is sent to OpenAI
+os.environ["MEMORY_INDEX"] = "none"
+
+import numpy as np
+
+from benchmarks.fake_openai import fake_embedding
+from benchmarks.site_server import page_words
+
+EMBEDDING_DIM = 1536
+
+
+def build_corpus(pages: int, words: int, questions: int, rng) -> list:
+    """
+    Stores the chunks of `pages` synthetic pages, a quarter of them mirrored
+    under a second URL, and returns (question, fact) pairs for facts planted
+    in random pages.
+    """
+    from benchmarks.stand_in_store import StandInStore
+    from config import CHUNK_SIZE, CHUNK_OVERLAP
+    from utils.text_utils import chunk_text
+
+    facts = {}
+    asked = []
+    for number, page_id in enumerate(rng.sample(range(pages), questions)):
+        setting, value = f"setting{number}x", f"value{number}y"
+        facts[page_id] = f"the {setting} option defaults to {value}"
+        asked.append((f"What does the {setting} option default to?", value))
+
+    now = datetime.now(timezone.utc)
+    rows = []
+    for page_id in range(pages):
+        body = page_words(page_id, words)
+        if page_id in facts:
+            position = rng.randrange(len(body))
+            body = body[:position] + facts[page_id].split() + body[position:]
+        urls = [f"https://docs.example/page/{page_id}"]
+        if page_id % 4 == 0:
+            urls.append(f"https://mirror.example/page/{page_id}")
+        for url in urls:
+            for index, chunk in enumerate(chunk_text(" ".join(body), CHUNK_SIZE, CHUNK_OVERLAP)):
+                rows.append({"id": len(rows) + 1, "url": url, "chunk_index": index, "content": chunk,
+                             "embedding": fake_embedding(chunk, EMBEDDING_DIM), "updated_at": now})
+    StandInStore.add_rows(rows)
+    return asked
+
+
+def measure(asked: list, top_k: int, retrieval: str) -> dict:
+    from services import rag
+    from services.rerank import best_window
+    from utils.text_utils import count_tokens
+
+    combined_hits, combined_tokens, snippet_hits, snippet_tokens = 0, [], 0, []
+    for question, value in asked:
+        embedding = fake_embedding(question, EMBEDDING_DIM).tolist()
+        _, passages = rag._retrieve(question, embedding, top_k, retrieval)
+        messages, _ = rag._combined_messages(question, passages)
+        prompt = messages[-1]["content"]
+        combined_hits += value in prompt
+        combined_tokens.append(count_tokens(prompt))
+
+        # Without re-ranking, per_snippet mode fetches snippets only
+        _, passages = rag._retrieve(question, embedding, top_k, retrieval, with_content=False)
+        contents = [best_window(question, passage.text, rag.LLM_SNIPPET_TOKENS) for passage in passages]
+        snippet_hits += any(value in content for content in contents)
+        snippet_tokens.append(sum(count_tokens(content) for content in contents))
+    return {
+        "combined_recall": combined_hits / len(asked),
+        "combined_tokens": float(np.mean(combined_tokens)),
+        "snippet_recall": snippet_hits / len(asked),
+        "snippet_tokens": float(np.mean(snippet_tokens)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--words", type=int, default=1200, help="Body words per page")
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--retrieval", default="vector", help="Retrieval mode")
+    parser.add_argument("--overfetch", type=int, nargs="+", default=[1, 2, 4, 8], help="RERANK_OVERFETCH values")
+    args = parser.parse_args()
+
+    from benchmarks.stand_in_store import StandInStore, install
+    from services import rag
+
+    install()
+    StandInStore.reset()
+    asked = build_corpus(args.pages, args.words, args.questions, random.Random(0))
+    for overfetch in args.overfetch:
+        rag.RERANK_OVERFETCH = overfetch
+        result = measure(asked, args.top_k, args.retrieval)
+        print(f"RERANK_OVERFETCH={overfetch}: "
+              f"combined recall {result['combined_recall']:.2f} with {result['combined_tokens']:.0f} prompt tokens, "
+              f"per_snippet recall {result['snippet_recall']:.2f} with {result['snippet_tokens']:.0f} tokens")
+
+
+if __name__ == "__main__":
+    main()
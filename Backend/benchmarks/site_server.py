@@ -0,0 +1,166 @@
+import hashlib
+import itertools
+import multiprocessing
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LINK_GRAPHS = ("tree", "random")
+
+# A made-up vocabulary, drawn from with Zipf-like frequencies so pages read
+# like text to the cleaner, the tokenizer and full-text search
+_SYLLABLES = ("ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pa", "qui", "dor")
+VOCABULARY = ["".join(parts) for length in (2, 3) for parts in itertools.product(_SYLLABLES, repeat=length)]
+_WEIGHTS = list(itertools.accumulate(1.0 / rank for rank in range(1, len(VOCABULARY) + 1)))
+
+
+def page_words(page_id: int, words: int) -> list:
+    """
+    Returns the body words of a page, the same on every call.
+    """
+    return random.Random(page_id).choices(VOCABULARY, cum_weights=_WEIGHTS, k=words)
+
+
+def page_links(page_id: int, pages: int, fanout: int, graph: str = "tree") -> list:
+    """
+    Returns the ids of the pages a page links to.
+
+    "tree" links each page to `fanout` children, so a crawl of depth d reaches
+    roughly fanout**d pages. "random" links to `fanout` pages picked at random,
+    giving cycles and pages reached from many parents.
+    """
+    if graph == "random":
+        return random.Random(-1 - page_id).sample(range(pages), min(fanout, pages))
+    return [child for child in range(page_id * fanout + 1, page_id * fanout + fanout + 1) if child < pages]
+
+
+def render_page(page_id: int, pages: int, fanout: int, words: int, graph: str = "tree") -> bytes:
+    """
+    Renders a synthetic HTML page of about `words` words of body text that
+    links to other pages as `graph` (see `page_links`) dictates.
+    """
+    links = "".join(f'<li><a href="/page/{c}">Page {c}</a></li>' for c in page_links(page_id, pages, fanout, graph))
+    body = " ".join(page_words(page_id, words))
+    html = (
+        f"<html><head><title>Page {page_id}</title></head><body>"
+        f"<nav><ul>{links}</ul></nav><main><h1>Page {page_id}</h1><p>{body}</p></main>"
+        "</body></html>"
+    )
+    return html.encode("utf-8")
+
+
+def render_sitemap(pages: int) -> bytes:
+    """
+    Renders a sitemap listing every page. Later pages were modified more
+    recently and are ranked higher, so a priority crawl reaches them first.
+    """
+    now = time.time()
+    urls = "".join(
+        f"<url><loc>/page/{page_id}</loc>"
+        f"<lastmod>{time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now - (pages - page_id) * 3600))}</lastmod>"
+        f"<priority>{0.1 + 0.9 * page_id / max(1, pages - 1):.2f}</priority></url>"
+        for page_id in range(pages)
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'.encode("utf-8")
+
+
+def _make_handler(pages: int, fanout: int, words: int, latency: float, graph: str, sitemap: bool = False,
+                  robots: str = ""):
+    class SiteHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, so clients can reuse connections
+        disable_nagle_algorithm = True  # Headers and body are separate writes; don't delay the body
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            if self.path == "/robots.txt" and robots:
+                self._send(robots.encode("utf-8"), "text/plain")
+                return
+            if self.path == "/sitemap.xml" and sitemap:
+                # Relative <loc>s are not allowed in sitemaps, so make them absolute here
+                host = f"http://{self.headers.get('Host')}"
+                self._send(render_sitemap(pages).replace(b"<loc>/", f"<loc>{host}/".encode()), "application/xml")
+                return
+            path = self.path.rstrip("/") or "/page/0"
+            try:
+                page_id = int(path.rsplit("/", 1)[-1])
+            except ValueError:
+                page_id = -1
+            if not path.startswith("/page/") or not 0 <= page_id < pages:
+                self.send_error(404)
+                return
+            payload = render_page(page_id, pages, fanout, words, graph)
+            etag = '"%s"' % hashlib.sha1(payload).hexdigest()
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _send(self, payload: bytes, content_type: str):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return SiteHandler
+
+
+def _serve_forever(pages, fanout, words, latency, graph, sitemap, robots, port_queue):
+    server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                 _make_handler(pages, fanout, words, latency, graph, sitemap, robots))
+    server.daemon_threads = True
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+@contextmanager
+def serve_site(pages: int = 200, fanout: int = 10, words: int = 300, latency: float = 0.0,
+               separate_process: bool = False, graph: str = "tree", sitemap: bool = False, robots: str = ""):
+    """
+    Runs a synthetic website on a random local port for the duration of the block.
+
+    With `separate_process`, the server runs in a child process so it does not
+    compete with the crawler for the GIL. With `sitemap`, it serves a
+    /sitemap.xml of every page (see `render_sitemap`); a non-empty `robots` is
+    served as /robots.txt, which is otherwise missing.
+
+    Yields:
+        str: The base URL of the site, which serves the root page.
+    """
+    if separate_process:
+        port_queue = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=_serve_forever, args=(pages, fanout, words, latency, graph, sitemap, robots, port_queue), daemon=True
+        )
+        process.start()
+        try:
+            yield f"http://127.0.0.1:{port_queue.get(timeout=10)}/"
+        finally:
+            process.terminate()
+            process.join()
+        return
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                 _make_handler(pages, fanout, words, latency, graph, sitemap, robots))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,234 @@
+import re
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+
+import numpy as np
+
+from config import DEFAULT_COLLECTION
+from services.vectorstore import SNIPPET_LENGTH
+from utils.text_utils import content_hash
+from utils.url_utils import in_scope
+
+_TOKEN = re.compile(r"\w+")
+
+
+class StandInStore:
+    """
+    In-memory stand-in for VectorDB, so benchmarks run without Postgres.
+
+    It implements the VectorDB methods used by ingestion, retrieval, the
+    crawler and the in-process index, with exact search in place of the ANN
+    index. All instances share one set of class-level tables, as connections
+    share one database. Call `install()` to make the services use it.
+    """
+    _lock = threading.RLock()
+    rows = {}  # id -> {"id", "collection", "url", "chunk_index", "content", "chunk_hash", "embedding", "updated_at"}
+    pages = {}  # (collection, url) -> fetch metadata
+    _ids = {}  # (collection, url, chunk_index) -> id
+    _terms = {}  # id -> Counter of lowercased words
+    _next_id = 1
+    _matrix = None  # (ids, unit vectors, collections), rebuilt after writes
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls.rows, cls.pages, cls._ids, cls._terms = {}, {}, {}, {}
+            cls._next_id = 1
+            cls._matrix = None
+
+    @classmethod
+    def add_rows(cls, rows: list):
+        """
+        Loads ready-made rows (id, url, content, embedding, updated_at), e.g.
+        random vectors for index benchmarks.
+        """
+        with cls._lock:
+            for row in rows:
+                row = dict(row, chunk_index=row.get("chunk_index", row["id"]),
+                           collection=row.get("collection", DEFAULT_COLLECTION))
+                row.setdefault("chunk_hash", content_hash(row["content"]))
+                cls._put(row)
+
+    def insert_vectors(self, records, upsert=False, chunk_counts=None, batch_size=None,
+                       collection=DEFAULT_COLLECTION):
+        upsert = upsert or chunk_counts is not None
+        written = 0
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            for url, chunk_index, content, embedding in records:
+                record_id = self._ids.get((collection, url, chunk_index))
+                if record_id is not None and not upsert:
+                    continue
+                self._put({"id": record_id or self._take_id(), "collection": collection, "url": url,
+                           "chunk_index": chunk_index, "content": content, "chunk_hash": content_hash(content),
+                           "embedding": embedding, "updated_at": now})
+                written += 1
+            for url, count in (chunk_counts or {}).items():
+                stale = [key for key in self._ids if key[:2] == (collection, url) and key[2] >= count]
+                for key in stale:
+                    self._drop(self._ids[key])
+                written += len(stale)
+        return written
+
+    def get_chunk_hashes(self, urls, collection=DEFAULT_COLLECTION):
+        wanted = set(urls)
+        with self._lock:
+            hashes = {}
+            for row in self.rows.values():
+                if row["collection"] == collection and row["url"] in wanted:
+                    hashes.setdefault(row["url"], {})[row["chunk_index"]] = row["chunk_hash"]
+            return hashes
+
+    def get_pages(self, base_url, collection=DEFAULT_COLLECTION):
+        with self._lock:
+            return {url: dict(page) for (page_collection, url), page in self.pages.items()
+                    if page_collection == collection and in_scope(url, base_url)}
+
+    def upsert_pages(self, pages, collection=DEFAULT_COLLECTION):
+        with self._lock:
+            for page in pages:
+                self.pages[(collection, page["url"])] = dict(page, last_crawled=datetime.now(timezone.utc))
+
+    def delete_pages(self, urls, collection=DEFAULT_COLLECTION):
+        urls = set(urls)
+        with self._lock:
+            doomed = [row["id"] for row in self.rows.values() if row["collection"] == collection and row["url"] in urls]
+            for record_id in doomed:
+                self._drop(record_id)
+            for url in urls:
+                self.pages.pop((collection, url), None)
+        return len(doomed)
+
+    def ensure_collection(self, collection):
+        pass
+
+    def drop_collection(self, collection):
+        with self._lock:
+            doomed = [row["id"] for row in self.rows.values() if row["collection"] == collection]
+            for record_id in doomed:
+                self._drop(record_id)
+            for key in [key for key in self.pages if key[0] == collection]:
+                del self.pages[key]
+        return bool(doomed)
+
+    def list_collections(self):
+        with self._lock:
+            counts = Counter(row["collection"] for row in self.rows.values())
+        return [{"name": name, "approximate_rows": count, "bytes": None} for name, count in sorted(counts.items())]
+
+    def query_similar(self, embedding, top_k=5, ef_search=None, probes=None, with_content=True,
+                      collection=DEFAULT_COLLECTION):
+        return [self._result(record_id, with_content, similarity=similarity)
+                for record_id, similarity in self._semantic(embedding, top_k, collection)]
+
+    def query_keyword(self, query_text, top_k=5, with_content=True, collection=DEFAULT_COLLECTION):
+        return [self._result(record_id, with_content, score=score)
+                for record_id, score in self._lexical(query_text, top_k, collection)]
+
+    def query_hybrid(self, embedding, query_text, top_k=5, candidates=50, rrf_k=60, ef_search=None, probes=None,
+                     with_content=True, collection=DEFAULT_COLLECTION):
+        scores, similarities = {}, {}
+        for rank, (record_id, similarity) in enumerate(self._semantic(embedding, candidates, collection), start=1):
+            scores[record_id] = 1 / (rrf_k + rank)
+            similarities[record_id] = similarity
+        for rank, (record_id, _) in enumerate(self._lexical(query_text, candidates, collection), start=1):
+            scores[record_id] = scores.get(record_id, 0) + 1 / (rrf_k + rank)
+        fused = sorted(scores.items(), key=lambda item: -item[1])[:top_k]
+        return [self._result(record_id, with_content, similarity=similarities.get(record_id, 0.0), score=score)
+                for record_id, score in fused]
+
+    def get_chunks(self, ids, with_content=True):
+        with self._lock:
+            return [self._result(record_id, with_content) for record_id in ids if record_id in self.rows]
+
+    def fetch_embeddings(self, since=None, batch_size=5000):
+        with self._lock:
+            rows = [dict(row) for row in self.rows.values() if since is None or row["updated_at"] > since]
+        for start in range(0, len(rows), batch_size):
+            yield rows[start:start + batch_size]
+
+    def count_rows(self):
+        return len(self.rows)
+
+    def get_ids(self):
+        with self._lock:
+            return list(self.rows)
+
+    @classmethod
+    def _take_id(cls):
+        record_id, cls._next_id = cls._next_id, cls._next_id + 1
+        return record_id
+
+    @classmethod
+    def _put(cls, row):
+        cls.rows[row["id"]] = row
+        cls._ids[(row["collection"], row["url"], row["chunk_index"])] = row["id"]
+        cls._terms[row["id"]] = Counter(_TOKEN.findall(row["content"].lower()))
+        cls._next_id = max(cls._next_id, row["id"] + 1)
+        cls._matrix = None
+
+    @classmethod
+    def _drop(cls, record_id):
+        row = cls.rows.pop(record_id)
+        del cls._ids[(row["collection"], row["url"], row["chunk_index"])]
+        del cls._terms[record_id]
+        cls._matrix = None
+
+    def _semantic(self, embedding, limit, collection):
+        with self._lock:
+            if self._matrix is None:
+                ids = np.fromiter(self.rows, dtype=np.int64, count=len(self.rows))
+                vectors = np.asarray([self.rows[i]["embedding"] for i in ids], dtype=np.float32)
+                vectors = vectors.reshape(len(ids), -1)
+                vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                collections = np.asarray([self.rows[i]["collection"] for i in ids], dtype=str)
+                type(self)._matrix = (ids, vectors, collections)
+            ids, vectors, collections = self._matrix
+        if collection is not None:
+            ids, vectors = ids[collections == collection], vectors[collections == collection]
+        if not len(ids):
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        scores = vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        top = np.argsort(-scores)[:limit]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def _lexical(self, query_text, limit, collection):
+        terms = [term for term in _TOKEN.findall(query_text.lower()) if term != "or"]
+        with self._lock:
+            scored = [(record_id, sum(counts[term] for term in terms)) for record_id, counts in self._terms.items()
+                      if collection is None or self.rows[record_id]["collection"] == collection]
+        scored = [(record_id, float(score)) for record_id, score in scored if score]
+        return sorted(scored, key=lambda item: -item[1])[:limit]
+
+    def _result(self, record_id, with_content, **scores):
+        row = self.rows[record_id]
+        content = row["content"]
+        result = {
+            "id": record_id,
+            "url": row["url"],
+            "snippet": content[:SNIPPET_LENGTH] + "..." if len(content) > SNIPPET_LENGTH else content,
+        }
+        if with_content:
+            result["content"] = content
+        result.update(scores)
+        return result
+
+
+def install():
+    """
+    Points the services that talk to the database at StandInStore.
+    """
+    import services.memory_index
+    import services.rag
+    import services.scraper
+
+    for module in (services.memory_index, services.rag, services.scraper):
+        module.VectorDB = StandInStore
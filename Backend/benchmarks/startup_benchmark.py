@@ -0,0 +1,93 @@
+"""
+Startup benchmark: how long a fresh process takes to import the app, run
+its startup (with and without STARTUP_WARMUP) and answer its first and
+later questions.
+
+Each run is a new Python process, so imports are cold. Questions go to a
+local stand-in for the OpenAI API and rows come from the in-memory stand-in
+for the database, so no network access or API key is needed.
+
+Usage (from the Backend directory):
+    python -m benchmarks.startup_benchmark --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.fake_openai import fake_embedding, serve_openai
+
+EMBEDDING_DIM = 1536
+
+QUESTION = "What does the first passage say about startup?"
+
+
+def run_child(requests: int):
+    """
+    Runs in the measured process and prints its timings as JSON.
+    """
+    start = time.perf_counter()
+    import main
+    import_seconds = time.perf_counter() - start
+
+    # Point the services at the in-memory store, which imports them as the first request would
+    import services.vectorstore
+    from benchmarks.stand_in_store import StandInStore, install
+    from fastapi.testclient import TestClient
+    from services.cache import answer_cache
+
+    install()
+    services.vectorstore.init_db = lambda: None
+    StandInStore.reset()
+    now = datetime.now(timezone.utc)
+    texts = [f"Passage {i} says startup is measured in seconds." for i in range(20)]
+    StandInStore.add_rows([{"id": i, "url": f"https://example.com/{i}", "content": text,
+                            "embedding": fake_embedding(text, EMBEDDING_DIM), "updated_at": now}
+                           for i, text in enumerate(texts)])
+
+    start = time.perf_counter()
+    with TestClient(main.app) as client:
+        startup_seconds = time.perf_counter() - start
+        latencies = []
+        for _ in range(requests + 1):
+            start = time.perf_counter()
+            client.post("/ask-question/", params={"question": QUESTION, "mode": "combined"}).raise_for_status()
+            latencies.append(time.perf_counter() - start)
+            answer_cache.clear()  # Measure the full pipeline, not the answer cache
+    print(json.dumps({"import": import_seconds, "startup": startup_seconds, "first": latencies[0],
+                      "later": float(np.median(latencies[1:]))}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per setting")
+    parser.add_argument("--requests", type=int, default=20, help="Questions after the first one, per process")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.requests)
+        return
+
+    with serve_openai(dim=EMBEDDING_DIM) as openai_url:
+        for warmup in ("false", "true"):
+            env = dict(os.environ, OPENAI_API_KEY="benchmark", OPENAI_BASE_URL=openai_url, EMBEDDING_PROVIDER="openai",
+                       EMBEDDING_DIM=str(EMBEDDING_DIM), MEMORY_INDEX="none", STARTUP_WARMUP=warmup, LOG_LEVEL="WARNING",
+                       EMBEDDING_CACHE_PATH="", ANSWER_CACHE_PATH="")
+            runs = []
+            for _ in range(args.runs):
+                output = subprocess.run([sys.executable, "-m", "benchmarks.startup_benchmark", "--child",
+                                         "--requests", str(args.requests)],
+                                        env=env, capture_output=True, text=True, check=True).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+            median = {key: float(np.median([run[key] for run in runs])) * 1000 for key in runs[0]}
+            print(f"STARTUP_WARMUP={warmup:<5}: import {median['import']:.0f} ms, startup {median['startup']:.0f} ms, "
+                  f"first question {median['first']:.0f} ms, later questions p50 {median['later']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+End-to-end benchmark suite that needs neither the internet nor OpenAI.
+
+A synthetic website is crawled and ingested through a local stand-in for the
+OpenAI API that waits a configurable time per request. Questions are then
+asked against what was stored. Rows go to an in-memory stand-in for Postgres,
+or with --store postgres to the database configured by PGVECTOR_* (its
+tables are emptied first, so point it at a scratch database).
+
+Reported: crawl pages/sec, ingest chunks/sec, question p50/p99 latency and
+peak memory. Results are written to benchmarks/results/<commit>.json; pass
+an earlier file to --compare to see what changed.
+
+Usage (from the Backend directory):
+    python -m benchmarks.suite --pages 300 --questions 100 --embedding-latency 0.05 --chat-latency 0.3
+    python -m benchmarks.suite --compare benchmarks/results/1a2b3c4.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.fake_openai import serve_openai
+from benchmarks.site_server import LINK_GRAPHS, page_words, render_page, serve_site
+
+RESULTS_DIR = Path(__file__).parent / "results"
+# Metrics shown by --compare, and whether a higher value is better
+COMPARED = {
+    "crawl.pages_per_sec": True,
+    "ingest.chunks_per_sec": True,
+    "questions.p50_ms": False,
+    "questions.p99_ms": False,
+    "peak_rss_mb": False,
+}
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)  # Bytes on macOS, KiB on Linux
+
+
+def git_commit() -> str:
+    """
+    Returns the short hash of HEAD, suffixed with "-dirty" when tracked files changed.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+def reset_store(store: str):
+    if store == "postgres":
+        from services.reset import clear_embeddings
+
+        clear_embeddings()
+    else:
+        from benchmarks.stand_in_store import StandInStore
+
+        StandInStore.reset()
+
+
+def bench_crawl(args, base_url: str) -> dict:
+    from services.scraper import Scraper
+
+    scraper = Scraper(base_url, max_depth=args.depth, concurrency=args.concurrency,
+                      per_host_concurrency=args.concurrency, per_host_rps=args.rps, incremental=False)
+    start = time.perf_counter()
+    asyncio.run(scraper.scrape_async())
+    seconds = time.perf_counter() - start
+    progress = scraper.progress.to_dict()
+    return {
+        "pages": len(scraper.visited_urls),
+        "seconds": round(seconds, 3),
+        "pages_per_sec": round(len(scraper.visited_urls) / seconds, 1),
+        "chunks_embedded": progress["chunks_embedded"],
+        "errors": progress["errors"],
+    }
+
+
+def bench_ingest(args) -> dict:
+    """
+    Embeds and stores every page of the site into an empty store with a cold
+    embedding cache, without crawling, in the batches the crawler uses.
+    """
+    from config import INGEST_PAGE_BATCH
+    from services.cache import embedding_cache
+    from services.extract import process_page
+    from services.rag import ingest_chunks
+
+    pages = []
+    for page_id in range(args.pages):
+        url = f"https://bench.example/page/{page_id}"
+        html = render_page(page_id, args.pages, args.fanout, args.words, args.graph)
+        pages.append((url, process_page(html, url).chunks))
+    embedding_cache.clear()
+
+    start = time.perf_counter()
+    chunks = 0
+    for batch_start in range(0, len(pages), INGEST_PAGE_BATCH):
+        chunks += ingest_chunks(pages[batch_start:batch_start + INGEST_PAGE_BATCH])["chunks_embedded"]
+    seconds = time.perf_counter() - start
+    return {"chunks": chunks, "seconds": round(seconds, 3), "chunks_per_sec": round(chunks / seconds, 1)}
+
+
+def bench_questions(args) -> dict:
+    from services.cache import answer_cache
+    from services.rag import ask_question
+
+    rng = random.Random(0)
+    questions = [
+        f"What does the site say about {' '.join(rng.sample(page_words(rng.randrange(args.pages), args.words), 3))}?"
+        for _ in range(args.questions)
+    ]
+    answer_cache.clear()
+
+    def timed(question):
+        start = time.perf_counter()
+        ask_question(question, top_k=args.top_k, mode=args.mode, retrieval=args.retrieval)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.question_concurrency) as executor:
+        latencies = np.asarray(list(executor.map(timed, questions))) * 1000
+    seconds = time.perf_counter() - start
+    return {
+        "questions": len(questions),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 1),
+        "mean_ms": round(float(latencies.mean()), 1),
+        "questions_per_sec": round(len(questions) / seconds, 1),
+    }
+
+
+def compare(previous: dict, current: dict):
+    print(f"Compared with {previous['commit']} ({previous['date']}):")
+    for name, higher_is_better in COMPARED.items():
+        old, new = _lookup(previous, name), _lookup(current, name)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        better = change > 0 if higher_is_better else change < 0
+        verdict = "better" if better and abs(change) >= 5 else "worse" if abs(change) >= 5 else "same"
+        print(f"  {name:<24} {old:>10} -> {new:<10} {change:+6.1f}% {verdict}")
+
+
+def _lookup(results: dict, name: str):
+    value = results
+    for part in name.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--fanout", type=int, default=10)
+    parser.add_argument("--words", type=int, default=600, help="Body words per page")
+    parser.add_argument("--graph", choices=LINK_GRAPHS, default="tree")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--site-latency", type=float, default=0.01, help="Website delay per request (seconds)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Crawl requests in flight")
+    parser.add_argument("--rps", type=float, default=0, help="Per-host rate limit, 0 disables it")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="Embeddings API delay (seconds)")
+    parser.add_argument("--chat-latency", type=float, default=0.3, help="Chat API delay (seconds)")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension")
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--question-concurrency", type=int, default=1)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--mode", default="per_snippet", help="Answer mode")
+    parser.add_argument("--retrieval", default="vector", help="Retrieval mode")
+    parser.add_argument("--store", choices=("memory", "postgres"), default="memory")
+    parser.add_argument("--output", help="Results file, default benchmarks/results/<commit>.json")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--compare", help="Earlier results file to compare with")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"))
+    with serve_openai(args.dim, args.embedding_latency, args.chat_latency) as openai_url, \
+            serve_site(args.pages, args.fanout, args.words, args.site_latency, separate_process=True,
+                       graph=args.graph) as site_url:
+        # The services read these at import time, so they are imported only from here on
+        os.environ.update({
+            "OPENAI_API_KEY": "benchmark", "OPENAI_BASE_URL": openai_url, "EMBEDDING_PROVIDER": "openai",
+            "EMBEDDING_DIM": str(args.dim), "EMBEDDING_CACHE_PATH": "", "ANSWER_CACHE_PATH": "",
+        })
+        if args.store == "postgres":
+            from services.vectorstore import init_db
+
+            init_db()
+        else:
+            from benchmarks.stand_in_store import install
+
+            install()
+
+        results = {
+            "commit": git_commit(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "settings": vars(args),
+        }
+        reset_store(args.store)
+        results["crawl"] = bench_crawl(args, site_url)
+        reset_store(args.store)
+        results["ingest"] = bench_ingest(args)
+        results["questions"] = bench_questions(args)
+        results["peak_rss_mb"] = peak_rss_mb()
+
+    crawl, ingest, questions = results["crawl"], results["ingest"], results["questions"]
+    print(f"crawl:     {crawl['pages']} pages in {crawl['seconds']}s ({crawl['pages_per_sec']} pages/sec, "
+          f"{crawl['chunks_embedded']} chunks embedded, {crawl['errors']} errors)")
+    print(f"ingest:    {ingest['chunks']} chunks in {ingest['seconds']}s ({ingest['chunks_per_sec']} chunks/sec)")
+    print(f"questions: p50 {questions['p50_ms']} ms, p99 {questions['p99_ms']} ms "
+          f"({questions['questions_per_sec']} questions/sec)")
+    print(f"memory:    peak RSS {results['peak_rss_mb']} MB")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), results)
+    if not args.no_save:
+        path = Path(args.output) if args.output else RESULTS_DIR / f"{results['commit']}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
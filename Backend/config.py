@@ -17,16 +17,120 @@ PGVECTOR_PORT = int(os.getenv("PGVECTOR_PORT", 5432))
 PGVECTOR_DB = os.getenv("PGVECTOR_DB", "vector_db")
 PGVECTOR_USER = os.getenv("PGVECTOR_USER", "user")
 PGVECTOR_PASSWORD = os.getenv("PGVECTOR_PASSWORD", "password")
+PGVECTOR_POOL_MIN = int(os.getenv("PGVECTOR_POOL_MIN", 1))
+PGVECTOR_POOL_MAX = int(os.getenv("PGVECTOR_POOL_MAX", 10))
+PGVECTOR_POOL_TIMEOUT = float(os.getenv("PGVECTOR_POOL_TIMEOUT", 30))  # Seconds to wait for a free connection
+INSERT_BATCH_SIZE = int(os.getenv("INSERT_BATCH_SIZE", 500))  # Rows per bulk COPY/transaction
+DEFAULT_COLLECTION = os.getenv("DEFAULT_COLLECTION", "default")  # Collection used when a request names none
+
+# Vector Index Settings (pgvector ANN index on scraptable.embedding)
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "hnsw").lower()  # "hnsw", "ivfflat" or "none"
+HNSW_M = int(os.getenv("HNSW_M", 16))  # Graph links per node
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 64))  # Build-time candidate list size
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 40))  # Query-time candidate list size (recall knob)
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", 0))  # 0 picks rows/1000 (sqrt(rows) above 1M) on rebuild
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", 10))  # Lists scanned per query (recall knob)
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()  # Index "none", "halfvec" (2x) or "binary" (32x smaller)
+QUANTIZED_CANDIDATES = int(os.getenv("QUANTIZED_CANDIDATES", 200))  # Index matches re-ranked by exact distance
+
+# Retrieval Settings
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector").lower()  # "vector", "keyword" or "hybrid"
+TEXT_SEARCH_CONFIG = os.getenv("TEXT_SEARCH_CONFIG", "english")  # Postgres text search configuration
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 50))  # Results taken from each path before fusion
+RRF_K = int(os.getenv("RRF_K", 60))  # Reciprocal-rank fusion constant, larger flattens rank differences
+MEMORY_INDEX = os.getenv("MEMORY_INDEX", "none").lower()  # In-process vector index: "none", "float32" or "int8"
+MEMORY_INDEX_SNAPSHOT = os.getenv("MEMORY_INDEX_SNAPSHOT", "")  # Directory of a memory-mapped snapshot, optional
+MEMORY_INDEX_REFRESH_SECONDS = float(os.getenv("MEMORY_INDEX_REFRESH_SECONDS", 30))  # Incremental refresh interval
+INDEX_MAINTENANCE_WORK_MEM = os.getenv("INDEX_MAINTENANCE_WORK_MEM", "")  # e.g. "1GB" to speed up builds
 
 # Web Scraping Settings
 SCRAPER_USER_AGENT = os.getenv("SCRAPER_USER_AGENT", "ScrapperBot/1.0")
+SCRAPER_CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY", 16))  # Total in-flight requests
+SCRAPER_PER_HOST_CONCURRENCY = int(os.getenv("SCRAPER_PER_HOST_CONCURRENCY", 4))
+SCRAPER_PER_HOST_RPS = float(os.getenv("SCRAPER_PER_HOST_RPS", 10))  # 0 disables the rate limit
+SCRAPER_TIMEOUT = float(os.getenv("SCRAPER_TIMEOUT", 15))  # Seconds
+SCRAPER_PARSER = os.getenv("SCRAPER_PARSER", "auto")  # "auto", "selectolax", "lxml" or "html.parser"
+SCRAPER_MAX_RESPONSE_BYTES = int(os.getenv("SCRAPER_MAX_RESPONSE_BYTES", 5 * 1024 * 1024))  # Larger bodies are truncated
+SCRAPER_PARSE_WORKERS = int(os.getenv("SCRAPER_PARSE_WORKERS", 0))  # Parse/clean/chunk processes, 0 keeps it in-process
+SCRAPER_PARSE_QUEUE = int(os.getenv("SCRAPER_PARSE_QUEUE", 0))  # Bodies in flight to the pool, 0 means 2 per worker
+SCRAPER_RESPECT_ROBOTS = os.getenv("SCRAPER_RESPECT_ROBOTS", "true").lower() in ("1", "true", "yes")  # Obey robots.txt and its Crawl-delay
+SCRAPER_USE_SITEMAPS = os.getenv("SCRAPER_USE_SITEMAPS", "true").lower() in ("1", "true", "yes")  # Seed crawls from the site's sitemaps
+SCRAPER_MAX_SITEMAPS = int(os.getenv("SCRAPER_MAX_SITEMAPS", 50))  # Sitemap files read per crawl, including nested ones
+
+# Crawl Frontier and Budget Settings (URLs discovered by a crawl, shared by its workers; budgets apply per worker)
+CRAWL_FRONTIER = os.getenv("CRAWL_FRONTIER", "memory").lower()  # "memory", "sqlite" or "postgres"
+CRAWL_FRONTIER_PATH = os.getenv("CRAWL_FRONTIER_PATH", "frontier.sqlite3")  # SQLite file for "sqlite"
+CRAWL_LEASE_SECONDS = float(os.getenv("CRAWL_LEASE_SECONDS", 300))  # Leased URLs are handed out again after this
+CRAWL_POLL_INTERVAL = float(os.getenv("CRAWL_POLL_INTERVAL", 1.0))  # Wait while other workers hold the open URLs
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", 0))  # Pages fetched per crawl, highest priority first; 0 for no limit
+CRAWL_MAX_BYTES = int(os.getenv("CRAWL_MAX_BYTES", 0))  # Response bytes read per crawl, 0 for no limit
+CRAWL_MAX_SECONDS = float(os.getenv("CRAWL_MAX_SECONDS", 0))  # Crawl duration, 0 for no limit
+# Query parameters dropped when normalizing URLs; a trailing * matches a prefix
+URL_STRIP_QUERY_PARAMS = [
+    param.strip().lower() for param in
+    os.getenv("URL_STRIP_QUERY_PARAMS", "utm_*,gclid,fbclid,msclkid,dclid,mc_cid,mc_eid,_ga,_gl").split(",")
+    if param.strip()
+]
+
+# Content Dedupe Settings (checked before any page is embedded)
+CONTENT_DEDUPE = os.getenv("CONTENT_DEDUPE", "true").lower() in ("1", "true", "yes")
+SIMHASH_MAX_DISTANCE = int(os.getenv("SIMHASH_MAX_DISTANCE", 3))  # Differing bits of 64 for a near-duplicate, -1 for exact only
+
+# Ingestion Job Settings
+INGEST_MAX_CONCURRENT_JOBS = int(os.getenv("INGEST_MAX_CONCURRENT_JOBS", 2))  # Crawls running at once
+INGEST_MAX_QUEUED_JOBS = int(os.getenv("INGEST_MAX_QUEUED_JOBS", 100))  # Further submissions are rejected
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", 200))  # Finished jobs kept for status queries
+
+# Logging and Metrics Configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()  # DEBUG adds per-page and per-query detail
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")  # Stage timings on /metrics
+METRICS_TRACE = os.getenv("METRICS_TRACE", "false").lower() in ("1", "true", "yes")  # Per-request Server-Timing spans
+
+# Chunking and Embedding Settings
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 500))  # Tokens per text chunk for embedding
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 50))  # Tokens shared by consecutive chunks
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai").lower()  # "openai", "onnx", "sentence-transformers" or "hashing"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")  # OpenAI model
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", 1536))  # Must match the provider; sets the vector column's dimension
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")  # Name or ONNX model directory
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))  # Texts per local inference batch
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", 0))  # CPU threads for local inference, 0 uses all cores
+EMBEDDING_MAX_SEQ_LENGTH = int(os.getenv("EMBEDDING_MAX_SEQ_LENGTH", 256))  # Tokens per text for local models
+EMBEDDING_BATCH_MAX_INPUTS = int(os.getenv("EMBEDDING_BATCH_MAX_INPUTS", 2048))  # Provider limit per request
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", 250000))  # Kept below the 300k limit
+INGEST_PAGE_BATCH = int(os.getenv("INGEST_PAGE_BATCH", 16))  # Pages buffered before embedding together
+
+# Cache Settings (an empty *_PATH keeps the cache in memory only)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 20000))  # Entries kept in memory
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", 7 * 24 * 3600))  # Seconds
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")  # SQLite file for persistence
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", 256 * 1024 * 1024))  # Memory bound, 0 for none
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 1000))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 3600))
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "")
+ANSWER_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("ANSWER_CACHE_SEMANTIC_THRESHOLD", 0))  # e.g. 0.97, 0 disables
+
+# Answer Generation Settings
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-3.5-turbo")
+ANSWER_MODE = os.getenv("ANSWER_MODE", "per_snippet")  # "per_snippet" or "combined"
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))  # Parallel chat calls across all requests
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", 150))  # Answer length per snippet
+LLM_COMBINED_MAX_TOKENS = int(os.getenv("LLM_COMBINED_MAX_TOKENS", 400))  # Answer length in combined mode
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", 3000))  # Retrieved text budget in combined mode
+LLM_SNIPPET_TOKENS = int(os.getenv("LLM_SNIPPET_TOKENS", 250))  # Retrieved text budget per call in per_snippet mode
 
-# Logging Configuration
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Retrieval Post-processing Settings (RERANK_OVERFETCH=1 keeps the retrieval order and snippets)
+RERANK_OVERFETCH = int(os.getenv("RERANK_OVERFETCH", 4))  # Candidates retrieved per result kept
+RERANK_LEXICAL_WEIGHT = float(os.getenv("RERANK_LEXICAL_WEIGHT", 0.3))  # Share of the question-word score
+RERANK_MMR_LAMBDA = float(os.getenv("RERANK_MMR_LAMBDA", 0.7))  # 1 ranks by relevance alone, lower favours variety
+RERANK_DUPLICATE_THRESHOLD = float(os.getenv("RERANK_DUPLICATE_THRESHOLD", 0.8))  # Shared shingles of a duplicate
 
-# Other Constants
-CHUNK_SIZE = 500  # Size of text chunks for embedding
+# OpenAI Client Settings (shared by embeddings and chat; rate limits apply per model)
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", 0))  # Requests per minute, 0 learns the limit from response headers
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", 0))  # Tokens per minute, 0 learns the limit from response headers
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", 16))  # Requests in flight across all callers
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", os.getenv("EMBEDDING_MAX_RETRIES", 6)))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 60))  # Seconds per request attempt
 
-# Validate Required Configurations
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY is not set in the environment variables. Please configure it in a .env file.")
\ No newline at end of file
+# Startup Settings (OPENAI_API_KEY is checked when the OpenAI client is first used, not at import)
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() in ("1", "true", "yes")  # Load clients, models and caches before serving
@@ -1,13 +1,61 @@
-from fastapi import FastAPI
+import time
+
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from api.routes import router
+from config import LOG_LEVEL, METRICS_ENABLED, METRICS_TRACE, OPENAI_API_KEY, STARTUP_WARMUP
+from services.metrics import HTTP_SECONDS, end_trace, metrics, server_timing, start_trace
+from services.warmup import startup_phase, startup_seconds, warm_up
+import asyncio
 import logging
-import uvicorn
+
+startup_seconds["import"] = time.perf_counter() - _import_started
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Opens the database connection pool and bootstraps the schema once at startup,
+    loads the in-process vector index if one is configured and, with
+    STARTUP_WARMUP, loads the clients, models and caches that requests use.
+    Closes the pool and cache files at shutdown.
+
+    The services are imported here rather than with this module, so that
+    importing the app stays fast.
+    """
+    if not OPENAI_API_KEY:
+        logger.warning("OPENAI_API_KEY is not set; questions and OpenAI embeddings will fail until it is.")
+    try:
+        with startup_phase("database"):
+            from services.vectorstore import init_db
+
+            await asyncio.to_thread(init_db)
+        from services.memory_index import memory_index
+
+        if memory_index is not None:
+            with startup_phase("memory_index"):
+                await asyncio.to_thread(memory_index.load)
+    except Exception as e:
+        # Keep serving; the pool and schema are retried on first database use
+        logger.error("Database initialisation failed at startup: %s", e)
+    if STARTUP_WARMUP:
+        await asyncio.to_thread(warm_up)
+    logger.info("Startup took %s", ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in startup_seconds.items()))
+    yield
+    from services.cache import close_caches
+    from services.vectorstore import close_pool
+
+    await asyncio.to_thread(close_pool)
+    close_caches()
+
+
 # Application factory function
 def create_app() -> FastAPI:
     """
@@ -19,7 +67,8 @@ def create_app() -> FastAPI:
             "Scrapper Bot is a web scraping and question-answering service powered by FastAPI, "
             "OpenAI's GPT models, and PGVector for vector-based storage and retrieval."
         ),
-        version="1.0.0"
+        version="1.0.0",
+        lifespan=lifespan
     )
 
     # Configure CORS (optional, can be adjusted based on your requirements)
@@ -31,6 +80,37 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    if METRICS_ENABLED:
+        @app.middleware("http")
+        async def instrument_request(request: Request, call_next):
+            """
+            Times each request by route and, with METRICS_TRACE, returns the
+            pipeline stages it went through in a Server-Timing header.
+            """
+            token = start_trace() if METRICS_TRACE else None
+            start = time.perf_counter()
+            status = 500
+            try:
+                response = await call_next(request)
+                status = response.status_code
+            finally:
+                route = request.scope.get("route")
+                HTTP_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                                     route=getattr(route, "path", "unmatched"), status=status)
+                spans = end_trace(token) if token is not None else None
+            if spans:
+                response.headers["Server-Timing"] = server_timing(spans)
+                logger.info("Trace %s %s: %s", request.method, request.url.path, response.headers["Server-Timing"])
+            return response
+
+        @app.get("/metrics", include_in_schema=False)
+        async def get_metrics():
+            """
+            Stage latencies, throughput, token usage and error counts in the
+            Prometheus text format.
+            """
+            return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
     # Include API routes
     app.include_router(router)
 
@@ -46,5 +126,7 @@ def create_app() -> FastAPI:
 app = create_app()
 
 if __name__ == "__main__":
+    import uvicorn
+
     logger.info("Starting Scrapper Bot server...")
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""
+Maintenance commands for the Scrapper Bot backend.
+
+Usage (from the Backend directory):
+    python manage.py init-db    Create the connection pool and bootstrap the schema
+    python manage.py reindex    Rebuild the vector index, e.g. after a bulk load
+    python manage.py reset      Delete all stored embeddings
+    python manage.py collections
+                                List the collections and their sizes
+    python manage.py snapshot-index
+                                Write the in-process vector index snapshot (MEMORY_INDEX_SNAPSHOT)
+
+reindex and reset take --collection to act on a single collection.
+"""
+import argparse
+import logging
+
+from services.vectorstore import VectorDB, init_db, close_pool, validate_collection
+from services.reset import clear_embeddings
+from services.memory_index import memory_index
+from config import LOG_LEVEL
+
+logging.basicConfig(level=LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+
+def reindex(args):
+    with VectorDB() as db:
+        db.rebuild_index(args.collection)
+
+
+def reset(args):
+    if not clear_embeddings(args.collection):
+        raise SystemExit(f"Collection '{args.collection}' does not exist.")
+
+
+def list_collections(args):
+    with VectorDB() as db:
+        for collection in db.list_collections():
+            rows = collection["approximate_rows"]
+            print(f"{collection['name']:<32} {'?' if rows is None else rows:>12} rows "
+                  f"{collection['bytes'] / 2 ** 20:>10.1f} MB")
+
+
+def snapshot_index(args):
+    if memory_index is None or memory_index.snapshot_path is None:
+        raise SystemExit("Set MEMORY_INDEX and MEMORY_INDEX_SNAPSHOT to write a snapshot.")
+    memory_index.load()
+    memory_index.refresh()
+    memory_index.save_snapshot()
+
+
+COMMANDS = {
+    "init-db": lambda args: init_db(),
+    "reindex": reindex,
+    "reset": reset,
+    "collections": list_collections,
+    "snapshot-index": snapshot_index,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("--collection", type=validate_collection, help="Collection to act on, default all")
+    args = parser.parse_args()
+    try:
+        COMMANDS[args.command](args)
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+
+from config import (
+    EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_BYTES,
+    ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_PATH
+)
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(*parts: Any) -> str:
+    """
+    Builds a cache key from the SHA-256 of the given parts.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache with LRU eviction and a per-entry time to live.
+
+    When `path` is set, entries are also written through to a SQLite file, so
+    they survive restarts and can outlive their eviction from memory. The file
+    is opened by `open` at startup, or on first use. Values must be
+    JSON-serialisable, or bytes, which are stored as they are.
+
+    With `max_bytes` set, the least recently used entries are also evicted
+    once the bytes values held in memory exceed it.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, path: Optional[str] = None, max_bytes: int = 0):
+        self.name = name
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._bytes = 0  # Size of the bytes values in _data
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.semantic_hits = 0
+        self.evictions = 0
+        self.path = path
+        self._db = None
+
+    def open(self):
+        """
+        Opens the SQLite file, if the cache has one, and purges expired entries.
+        """
+        with self._lock:
+            self._connect()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        # Called with the lock held
+        if self._db is None and self.path:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires_at REAL, value TEXT)"
+            )
+            self._db.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+        return self._db
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value, or None on a miss or expired entry.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < now:
+                del self._data[key]
+                entry = None
+            db = self._connect() if entry is None else None
+            if db is not None:
+                row = db.execute(
+                    "SELECT expires_at, value FROM cache WHERE key = ? AND expires_at >= ?", (key, now)
+                ).fetchone()
+                if row:
+                    entry = (row[0], row[1] if isinstance(row[1], bytes) else json.loads(row[1]))
+                    self._store(key, entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any):
+        self.set_many([(key, value)])
+
+    def set_many(self, items: List[Tuple[str, Any]]):
+        """
+        Stores several (key, value) pairs, writing them to the SQLite file in
+        one transaction.
+        """
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            for key, value in items:
+                self._store(key, (expires_at, value))
+            db = self._connect()
+            if db is not None and items:
+                db.executemany(
+                    "INSERT OR REPLACE INTO cache (key, expires_at, value) VALUES (?, ?, ?)",
+                    [(key, expires_at, value if isinstance(value, bytes) else json.dumps(value))
+                     for key, value in items]
+                )
+                db.commit()
+
+    def values(self) -> list:
+        """
+        Returns the live in-memory values, most recently used last.
+        """
+        now = time.time()
+        with self._lock:
+            return [value for expires_at, value in self._data.values() if expires_at >= now]
+
+    def discard(self, predicate: Callable[[Any], bool]) -> int:
+        """
+        Removes the entries whose value `predicate` accepts, from memory and
+        from the SQLite file.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        with self._lock:
+            removed = {key for key, (_, value) in self._data.items() if predicate(value)}
+            for key in removed:
+                self._bytes -= _size(self._data.pop(key)[1])
+            db = self._connect()
+            if db is not None:
+                stored = [key for key, value in db.execute("SELECT key, value FROM cache")
+                          if predicate(value if isinstance(value, bytes) else json.loads(value))]
+                db.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in stored])
+                db.commit()
+                removed.update(stored)
+            return len(removed)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            db = self._connect()
+            if db is not None:
+                db.execute("DELETE FROM cache")
+                db.commit()
+
+    def record_semantic_hit(self):
+        """
+        Counts an exact-key miss that was then served by a similar entry from `values()`.
+        """
+        with self._lock:
+            self.semantic_hits += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "semantic_hits": self.semantic_hits,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _store(self, key: str, entry: tuple):
+        previous = self._data.get(key)
+        if previous is not None:
+            self._bytes -= _size(previous[1])
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        self._bytes += _size(entry[1])
+        while len(self._data) > self.maxsize or (self.max_bytes and self._bytes > self.max_bytes
+                                                 and len(self._data) > 1):
+            _, (_, evicted) = self._data.popitem(last=False)
+            self._bytes -= _size(evicted)
+            self.evictions += 1
+
+
+def _size(value: Any) -> int:
+    return len(value) if isinstance(value, bytes) else 0
+
+
+# Shared caches, keyed by content hash and model
+embedding_cache = TTLCache("embeddings", EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL, EMBEDDING_CACHE_PATH or None,
+                           EMBEDDING_CACHE_MAX_BYTES)
+answer_cache = TTLCache("answers", ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_PATH or None)
+
+
+def open_caches():
+    for cache in (embedding_cache, answer_cache):
+        cache.open()
+
+
+def close_caches():
+    for cache in (embedding_cache, answer_cache):
+        cache.close()
+
+
+def cache_stats() -> dict:
+    return {cache.name: cache.stats() for cache in (embedding_cache, answer_cache)}
+
+
+def _cache_metrics():
+    stats = cache_stats().values()
+    families = [("scrapper_cache_entries", "gauge", "Entries held in memory by each cache.",
+                 [({"cache": s["name"]}, s["size"]) for s in stats]),
+                ("scrapper_cache_bytes", "gauge", "Bytes of binary values, such as embeddings, held in memory.",
+                 [({"cache": s["name"]}, s["bytes"]) for s in stats])]
+    for field in ("hits", "misses", "semantic_hits", "evictions"):
+        families.append((f"scrapper_cache_{field}_total", "counter", f"Cache {field.replace('_', ' ')}.",
+                         [({"cache": s["name"]}, s[field]) for s in stats]))
+    return families
+
+
+metrics.add_collector(_cache_metrics)
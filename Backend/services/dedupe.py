@@ -0,0 +1,91 @@
+import logging
+import threading
+from typing import Optional
+
+from config import SIMHASH_MAX_DISTANCE
+
+logger = logging.getLogger(__name__)
+
+_BITS = 64
+
+
+def to_signed(fingerprint: int) -> int:
+    """
+    Maps a 64-bit SimHash onto the range of a Postgres BIGINT.
+    """
+    return fingerprint - (1 << _BITS) if fingerprint >= 1 << (_BITS - 1) else fingerprint
+
+
+def from_signed(value: int) -> int:
+    return value + (1 << _BITS) if value < 0 else value
+
+
+class ContentIndex:
+    """
+    Fingerprints of the pages kept by a crawl, used to skip duplicate pages
+    before they are embedded.
+
+    Exact duplicates share a text hash. Near-duplicates have SimHash
+    fingerprints at most `max_distance` bits apart; those are found without a
+    full scan by splitting fingerprints into `max_distance + 1` bands, because
+    two fingerprints that close must agree exactly on at least one band.
+    """
+
+    def __init__(self, max_distance: int = SIMHASH_MAX_DISTANCE):
+        self.max_distance = max_distance
+        bands = max_distance + 1 if max_distance >= 0 else 0
+        width = _BITS // bands if bands else 0
+        self._bands = [(band * width, _BITS if band == bands - 1 else (band + 1) * width) for band in range(bands)]
+        self._lock = threading.Lock()
+        self._pages = {}  # url -> (text_hash, fingerprint)
+        self._exact = {}  # text_hash -> url
+        self._buckets = [{} for _ in self._bands]  # band value -> set of urls
+
+    def find_or_add(self, url: str, text_hash: str, fingerprint: int) -> Optional[str]:
+        """
+        Returns the URL of another kept page this one duplicates, or records
+        the page and returns None.
+        """
+        with self._lock:
+            original = self._exact.get(text_hash)
+            if original is None and self.max_distance >= 0:
+                original = self._nearest(url, fingerprint)
+            if original is not None and original != url:
+                return original
+            self._remove(url)
+            self._pages[url] = (text_hash, fingerprint)
+            self._exact[text_hash] = url
+            for bucket, value in zip(self._buckets, self._band_values(fingerprint)):
+                bucket.setdefault(value, set()).add(url)
+            return None
+
+    def remove(self, url: str):
+        with self._lock:
+            self._remove(url)
+
+    def __len__(self):
+        return len(self._pages)
+
+    def _nearest(self, url, fingerprint):
+        for bucket, value in zip(self._buckets, self._band_values(fingerprint)):
+            for candidate in bucket.get(value, ()):
+                if candidate != url and bin(self._pages[candidate][1] ^ fingerprint).count("1") <= self.max_distance:
+                    return candidate
+        return None
+
+    def _remove(self, url):
+        entry = self._pages.pop(url, None)
+        if entry is None:
+            return
+        text_hash, fingerprint = entry
+        if self._exact.get(text_hash) == url:
+            del self._exact[text_hash]
+        for bucket, value in zip(self._buckets, self._band_values(fingerprint)):
+            urls = bucket.get(value)
+            if urls:
+                urls.discard(url)
+                if not urls:
+                    del bucket[value]
+
+    def _band_values(self, fingerprint):
+        return [(fingerprint >> start) & ((1 << (end - start)) - 1) for start, end in self._bands]
@@ -0,0 +1,233 @@
+import gzip
+import io
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+from xml.etree import ElementTree
+
+from config import SCRAPER_USER_AGENT, SCRAPER_MAX_SITEMAPS
+
+logger = logging.getLogger(__name__)
+
+# Largest sitemap file read, uncompressed; the sitemap protocol's own limit
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024
+
+# Frontier priority: the sitemap's own ranking of a page (0.5 when it gives none),
+# less a penalty per link hop from the base URL, plus a bonus for recent changes
+# that halves every FRESHNESS_HALF_LIFE_DAYS
+DEFAULT_PAGE_PRIORITY = 0.5
+DEPTH_PENALTY = 0.1
+FRESHNESS_BONUS = 0.5
+FRESHNESS_HALF_LIFE_DAYS = 30.0
+# Taken off pages the sitemap says have not changed since they were last crawled
+UNCHANGED_PENALTY = 1.0
+
+
+class SitemapEntry(NamedTuple):
+    url: str
+    lastmod: Optional[datetime]
+    priority: Optional[float]
+
+
+class RobotsRules:
+    """
+    The robots.txt rules of one site as they apply to SCRAPER_USER_AGENT.
+
+    Following RFC 9309, a robots.txt that is missing or answers with another
+    4xx status allows everything, and one that cannot be fetched (5xx or a
+    network error) disallows everything.
+    """
+
+    def __init__(self, parser: RobotFileParser, user_agent: str = SCRAPER_USER_AGENT):
+        self._parser = parser
+        self.user_agent = user_agent
+
+    @classmethod
+    def from_response(cls, status: Optional[int], body: bytes = b"",
+                      user_agent: str = SCRAPER_USER_AGENT) -> "RobotsRules":
+        """
+        Builds the rules from the robots.txt response status (None if it could
+        not be fetched) and body.
+        """
+        parser = RobotFileParser()
+        if status is None or status >= 500:
+            parser.disallow_all = True
+        elif status >= 400:
+            parser.allow_all = True
+        else:
+            lines = body.decode("utf-8", errors="replace").splitlines()
+            parser.parse(lines)
+            _parse_fractional_delays(parser, lines)
+        return cls(parser, user_agent)
+
+    def allowed(self, url: str) -> bool:
+        return self._parser.can_fetch(self.user_agent, url)
+
+    @property
+    def crawl_delay(self) -> float:
+        """
+        Seconds to wait between requests: the Crawl-delay, or the interval
+        implied by Request-rate if that is longer, 0 if neither is set.
+        """
+        delay = float(self._parser.crawl_delay(self.user_agent) or 0)
+        rate = self._parser.request_rate(self.user_agent)
+        if rate and rate.requests:
+            delay = max(delay, rate.seconds / rate.requests)
+        return delay
+
+    @property
+    def sitemaps(self) -> List[str]:
+        return self._parser.site_maps() or []
+
+
+def _parse_fractional_delays(parser: RobotFileParser, lines: List[str]):
+    """
+    Sets the Crawl-delay values with a fraction, e.g. "0.5", which
+    RobotFileParser only accepts as whole numbers, on their user-agent groups.
+    """
+    delays, agents, in_agents = {}, [], False
+    for line in lines:
+        field, _, value = line.split("#", 1)[0].partition(":")
+        field, value = field.strip().lower(), value.strip()
+        if field == "user-agent":
+            agents = agents + [value] if in_agents else [value]
+            in_agents = True
+            continue
+        in_agents = False
+        if field == "crawl-delay" and not value.isdigit():
+            try:
+                delays.update((agent, float(value)) for agent in agents)
+            except ValueError:
+                pass
+    for entry in parser.entries + [parser.default_entry]:
+        if entry is not None and entry.delay is None:
+            delay = next((delays[agent] for agent in entry.useragents if agent in delays), None)
+            if delay is not None and delay >= 0:
+                entry.delay = delay
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parses a sitemap <lastmod> (W3C datetime, e.g. "2024-05-01" or
+    "2024-05-01T12:00:00+02:00") as an aware datetime; None if it is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _parse_priority(value: Optional[str]) -> Optional[float]:
+    try:
+        return min(1.0, max(0.0, float(value))) if value else None
+    except ValueError:
+        return None
+
+
+def _local_name(tag: str) -> str:
+    # Sitemaps are namespaced, but not always with the official namespace
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_sitemap(body: bytes) -> Tuple[List[SitemapEntry], List[str]]:
+    """
+    Parses a sitemap file: an XML <urlset>, an XML <sitemapindex> or a plain
+    text list of URLs, optionally gzip-compressed.
+
+    Returns:
+        tuple: The page entries, and the URLs of the sitemaps an index lists.
+    """
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.GzipFile(fileobj=io.BytesIO(body)).read(MAX_SITEMAP_BYTES)
+    if body.lstrip(b"\xef\xbb\xbf \t\r\n")[:1] != b"<":
+        lines = body.decode("utf-8", errors="replace").splitlines()
+        return [SitemapEntry(line.strip(), None, None) for line in lines if line.strip().startswith("http")], []
+    try:
+        root = ElementTree.fromstring(body)
+    except ElementTree.ParseError as e:
+        logger.warning("Could not parse sitemap: %s", e)
+        return [], []
+
+    entries, sitemaps = [], []
+    kind = _local_name(root.tag)
+    for item in root:
+        fields = {_local_name(child.tag): (child.text or "").strip() for child in item}
+        if not fields.get("loc"):
+            continue
+        if kind == "sitemapindex":
+            sitemaps.append(fields["loc"])
+        elif kind == "urlset":
+            entries.append(SitemapEntry(fields["loc"], parse_lastmod(fields.get("lastmod")),
+                                        _parse_priority(fields.get("priority"))))
+    return entries, sitemaps
+
+
+def read_sitemaps(urls: List[str], fetch: Callable[[str], Tuple[Optional[int], bytes]],
+                  max_sitemaps: int = SCRAPER_MAX_SITEMAPS) -> Dict[str, SitemapEntry]:
+    """
+    Reads the given sitemaps and the sitemaps their indexes list, breadth-first,
+    up to `max_sitemaps` files.
+
+    Args:
+        urls (list): The sitemaps to start from.
+        fetch (callable): Returns the (status, body) of a URL; status is None
+            if the request failed.
+        max_sitemaps (int): Most sitemap files to fetch.
+
+    Returns:
+        dict: The entries found, by URL. A URL listed twice keeps its first entry.
+    """
+    queue, seen, entries = list(urls), set(), {}
+    while queue and len(seen) < max_sitemaps:
+        url = queue.pop(0)
+        if url in seen:
+            continue
+        seen.add(url)
+        status, body = fetch(url)
+        if status != 200:
+            logger.info("Sitemap %s unavailable (status %s)", url, status)
+            continue
+        found, nested = parse_sitemap(body)
+        for entry in found:
+            entries.setdefault(entry.url, entry)
+        queue.extend(nested)
+    if queue:
+        logger.info("Stopped after %d sitemaps, %d more not read", len(seen), len(queue))
+    return entries
+
+
+def default_sitemap(url: str) -> str:
+    """
+    Where a site's sitemap is by convention when robots.txt names none.
+    """
+    return urljoin(url, "/sitemap.xml")
+
+
+def robots_url(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}/robots.txt"
+
+
+def crawl_priority(depth: int, sitemap_priority: Optional[float] = None, lastmod: Optional[datetime] = None,
+                   last_crawled: Optional[datetime] = None, now: Optional[datetime] = None) -> float:
+    """
+    Scores a URL for the crawl frontier; higher scores are fetched first.
+
+    The score starts from the sitemap's <priority> (DEFAULT_PAGE_PRIORITY if
+    none), loses DEPTH_PENALTY per link hop, and gains up to FRESHNESS_BONUS
+    for a recent <lastmod>. A page whose <lastmod> is no later than its last
+    crawl is already stored as it is, so it loses UNCHANGED_PENALTY instead and
+    is fetched only once the budget has covered everything else.
+    """
+    score = (DEFAULT_PAGE_PRIORITY if sitemap_priority is None else sitemap_priority) - DEPTH_PENALTY * depth
+    if lastmod is None:
+        return score
+    if last_crawled is not None and lastmod <= last_crawled:
+        return score - UNCHANGED_PENALTY
+    age_days = max(0.0, ((now or datetime.now(timezone.utc)) - lastmod).total_seconds() / 86400)
+    return score + FRESHNESS_BONUS * 0.5 ** (age_days / FRESHNESS_HALF_LIFE_DAYS)
@@ -1,21 +1,290 @@
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
 from typing import List
-from config import OPENAI_API_KEY
+from config import (
+    EMBEDDING_PROVIDER, EMBEDDING_MODEL, EMBEDDING_DIM, EMBEDDING_BATCH_MAX_INPUTS, EMBEDDING_BATCH_MAX_TOKENS,
+    LOCAL_EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE, EMBEDDING_THREADS, EMBEDDING_MAX_SEQ_LENGTH, OPENAI_MAX_CONCURRENCY
+)
+from utils.text_utils import count_tokens
+from services.cache import embedding_cache, make_key
+from services.metrics import stage
+from services.openai_client import openai_client
+import logging
+import numpy as np
+import os
+import re
+import zlib
 
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY)
+logger = logging.getLogger(__name__)
 
-def embed_text(texts: List[str], model: str = "text-embedding-ada-002") -> List[List[float]]:
+EMBEDDING_PROVIDERS = ("openai", "onnx", "sentence-transformers", "hashing")
+
+# Sends the batches of one large embed call concurrently; the shared client still bounds the total
+_batch_executor = ThreadPoolExecutor(max_workers=OPENAI_MAX_CONCURRENCY, thread_name_prefix="embed")
+
+
+class EmbeddingProvider:
     """
-    Generates embeddings for a list of texts using OpenAI's embedding model.
+    Turns texts into embedding vectors of `dimension` floats.
+
+    `name` identifies the provider and model; embeddings from different names
+    are not comparable, so it is part of every embedding cache key.
     """
-    try:
-        # Call OpenAI API to generate embeddings
-        response = client.embeddings.create(
-            input=texts,
-            model=model
-        )
-        embeddings = [data.embedding for data in response.data]
+    name = "base"
+    dimension = 0
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """
+    Embeds with the OpenAI API, packing texts into as few requests as the
+    per-request input and token limits allow.
+
+    Requests go through the shared client, which keeps them within the
+    account's rate limits and retries transient failures; batches are sent
+    concurrently up to its in-flight limit.
+    """
+
+    def __init__(self, model: str = EMBEDDING_MODEL, dimension: int = EMBEDDING_DIM):
+        self.model = model
+        self.name = model  # Unprefixed, so embeddings cached before providers existed stay valid
+        self.dimension = dimension
+
+    def embed(self, texts):
+        batches = pack_batches(texts)
+        if len(batches) == 1:
+            return self._embed_batch(batches[0])
+        embeddings = []
+        for batch_embeddings in _batch_executor.map(self._embed_batch, batches):
+            embeddings.extend(batch_embeddings)
         return embeddings
-    except Exception as e:
-        raise RuntimeError(f"Failed to generate embeddings: {e}")
\ No newline at end of file
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        return openai_client.embed(batch, self.model)
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    Base for providers that run a model on the local CPU.
+
+    Texts are sorted by length before batching, so each batch pads to a
+    similar length, and results are returned in the original order.
+    """
+
+    def __init__(self, batch_size: int = EMBEDDING_BATCH_SIZE, threads: int = EMBEDDING_THREADS):
+        self.batch_size = batch_size
+        self.threads = threads or os.cpu_count() or 1
+
+    def embed(self, texts):
+        if not texts:
+            return []
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            indexes = order[start:start + self.batch_size]
+            embeddings[indexes] = self._embed_batch([texts[i] for i in indexes])
+        return embeddings.tolist()
+
+    def _embed_batch(self, batch: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class OnnxEmbeddingProvider(LocalEmbeddingProvider):
+    """
+    Runs a sentence-transformer model exported to ONNX with onnxruntime.
+
+    `model_dir` must hold `model.onnx` and the Hugging Face `tokenizer.json`.
+    Token embeddings are mean-pooled over the attention mask and L2-normalised,
+    matching sentence-transformers' default pooling.
+    """
+
+    def __init__(self, model_dir: str = LOCAL_EMBEDDING_MODEL, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 threads: int = EMBEDDING_THREADS, max_length: int = EMBEDDING_MAX_SEQ_LENGTH):
+        super().__init__(batch_size, threads)
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("The onnx embedding provider needs the onnxruntime and tokenizers packages") from e
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            str(Path(model_dir) / "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(str(Path(model_dir) / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self.name = f"onnx:{model_dir}"
+        output_dim = self.session.get_outputs()[0].shape[-1]
+        self.dimension = output_dim if isinstance(output_dim, int) else len(self._embed_batch(["dimension"])[0])
+
+    def _embed_batch(self, batch):
+        encodings = self.tokenizer.encode_batch(batch)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        token_embeddings = self.session.run(None, feeds)[0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return self._normalize(pooled.astype(np.float32))
+
+
+class SentenceTransformerEmbeddingProvider(LocalEmbeddingProvider):
+    """
+    Runs a sentence-transformers model with PyTorch on the CPU.
+    """
+
+    def __init__(self, model_name: str = LOCAL_EMBEDDING_MODEL, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 threads: int = EMBEDDING_THREADS, max_length: int = EMBEDDING_MAX_SEQ_LENGTH):
+        super().__init__(batch_size, threads)
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("The sentence-transformers embedding provider needs the "
+                              "sentence-transformers package") from e
+
+        torch.set_num_threads(self.threads)
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.model.max_seq_length = max_length
+        self.name = f"sentence-transformers:{model_name}"
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def _embed_batch(self, batch):
+        return self.model.encode(batch, batch_size=len(batch), convert_to_numpy=True,
+                                 normalize_embeddings=True).astype(np.float32)
+
+
+class HashingEmbeddingProvider(LocalEmbeddingProvider):
+    """
+    Embeds texts by hashing their words and word bigrams into `dimension` buckets.
+
+    It needs no model and no network, so it suits tests and offline runs.
+    Texts sharing vocabulary get similar vectors, but it captures no meaning
+    beyond that.
+    """
+
+    _TOKEN = re.compile(r"\w+")
+
+    def __init__(self, dimension: int = EMBEDDING_DIM, batch_size: int = EMBEDDING_BATCH_SIZE):
+        super().__init__(batch_size, 1)
+        self.dimension = dimension
+        self.name = f"hashing:{dimension}"
+
+    def _embed_batch(self, batch):
+        rows, buckets = [], []
+        for row, text in enumerate(batch):
+            words = self._TOKEN.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            rows.extend([row] * len(features))
+            buckets.extend(zlib.crc32(feature.encode("utf-8")) for feature in features)
+        buckets = np.asarray(buckets, dtype=np.uint32)
+        # The top hash bit picks the sign, so colliding features tend to cancel out
+        signs = np.where(buckets >> 31, -1.0, 1.0).astype(np.float32)
+        counts = np.zeros((len(batch), self.dimension), dtype=np.float32)
+        np.add.at(counts, (np.asarray(rows, dtype=np.intp), buckets % self.dimension), signs)
+        return self._normalize(np.sign(counts) * np.log1p(np.abs(counts)))
+
+
+@lru_cache(maxsize=1)
+def get_provider() -> EmbeddingProvider:
+    """
+    Returns the process-wide embedding provider selected by EMBEDDING_PROVIDER.
+
+    Raises:
+        ValueError: If the provider is unknown or its dimension is not EMBEDDING_DIM,
+            the dimension of the 'scraptable.embedding' column.
+    """
+    if EMBEDDING_PROVIDER == "openai":
+        provider = OpenAIEmbeddingProvider()
+    elif EMBEDDING_PROVIDER == "onnx":
+        provider = OnnxEmbeddingProvider()
+    elif EMBEDDING_PROVIDER == "sentence-transformers":
+        provider = SentenceTransformerEmbeddingProvider()
+    elif EMBEDDING_PROVIDER == "hashing":
+        provider = HashingEmbeddingProvider()
+    else:
+        raise ValueError(f"Unknown embedding provider '{EMBEDDING_PROVIDER}', expected one of {EMBEDDING_PROVIDERS}")
+    if provider.dimension != EMBEDDING_DIM:
+        raise ValueError(f"Embedding provider {provider.name} produces {provider.dimension}-dimensional vectors "
+                         f"but EMBEDDING_DIM is {EMBEDDING_DIM}")
+    logger.info("Using embedding provider %s (%d dimensions)", provider.name, provider.dimension)
+    return provider
+
+
+def embed_text(texts: List[str]) -> List[List[float]]:
+    """
+    Generates embeddings for a list of texts with the configured embedding provider.
+
+    Embeddings are returned in the same order as `texts`. Previously embedded
+    texts are served from the embedding cache, keyed by a hash of the
+    provider's name and the text, and only the misses are sent to the provider.
+    The cache holds them as float32 bytes, a quarter of the memory of float lists.
+    """
+    provider = get_provider()
+    keys = [make_key(provider.name, text) for text in texts]
+    embeddings = [_from_cached(embedding_cache.get(key)) for key in keys]
+
+    # Embed each distinct missing text once
+    missing = {}
+    for key, text, embedding in zip(keys, texts, embeddings):
+        if embedding is None:
+            missing.setdefault(key, text)
+    if missing:
+        with stage("embed", items=len(missing)):
+            fresh = provider.embed(list(missing.values()))
+        embedding_cache.set_many([(key, np.asarray(embedding, dtype="<f4").tobytes())
+                                  for key, embedding in zip(missing, fresh)])
+        fresh_by_key = dict(zip(missing, fresh))
+        embeddings = [embedding if embedding is not None else fresh_by_key[key]
+                      for key, embedding in zip(keys, embeddings)]
+    return embeddings
+
+
+def _from_cached(value):
+    # Entries written before embeddings were cached as bytes are float lists
+    if isinstance(value, bytes):
+        return np.frombuffer(value, dtype="<f4").tolist()
+    return value
+
+
+def pack_batches(texts: List[str], max_inputs: int = EMBEDDING_BATCH_MAX_INPUTS,
+                 max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS) -> List[List[str]]:
+    """
+    Groups texts, in order, into batches within the input-count and token limits.
+    """
+    batches, batch, batch_tokens = [], [], 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if batch and (len(batch) >= max_inputs or batch_tokens + tokens > max_tokens):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def embedding_model_name() -> str:
+    """
+    Returns the name of the configured provider and model without loading it.
+    """
+    if EMBEDDING_PROVIDER == "openai":
+        return EMBEDDING_MODEL
+    if EMBEDDING_PROVIDER == "hashing":
+        return f"hashing:{EMBEDDING_DIM}"
+    return f"{EMBEDDING_PROVIDER}:{LOCAL_EMBEDDING_MODEL}"
@@ -0,0 +1,155 @@
+import logging
+import re
+import time
+from typing import List, NamedTuple, Optional, Union
+from urllib.parse import urljoin
+
+from config import SCRAPER_PARSER, CHUNK_SIZE, CHUNK_OVERLAP
+from utils.text_utils import clean_text, chunk_text, content_hash, simhash
+
+logger = logging.getLogger(__name__)
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser  # Older selectolax releases only ship the Modest backend
+    except ImportError:
+        HTMLParser = None
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+# Elements whose text is not page content
+BOILERPLATE_TAGS = ("script", "style", "noscript", "template", "svg", "iframe", "nav", "header", "footer", "aside")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class Extracted(NamedTuple):
+    text: str  # Visible text with whitespace collapsed
+    links: List[str]  # Absolute URLs of <a href> targets, in document order
+    canonical: Optional[str] = None  # Absolute URL of <link rel="canonical">, if any
+
+
+class ProcessedPage(NamedTuple):
+    chunks: List[str]  # Cleaned text chunks ready for embedding
+    links: List[str]  # Absolute URLs of <a href> targets, in document order
+    canonical: Optional[str]  # Absolute URL of <link rel="canonical">, if any
+    text_hash: str  # SHA-256 of the cleaned text, equal for exact duplicates
+    simhash: int  # 64-bit SimHash of the cleaned text, close for near-duplicates
+    parse_seconds: float = 0.0  # Time spent parsing, reported as the "parse" stage
+    clean_seconds: float = 0.0  # Time spent cleaning, chunking and fingerprinting, the "clean" stage
+
+
+def available_backends() -> List[str]:
+    """
+    Returns the installed parser backends, fastest first.
+    """
+    backends = []
+    if HTMLParser is not None:
+        backends.append("selectolax")
+    if lxml is not None:
+        backends.append("lxml")
+    backends.append("html.parser")
+    return backends
+
+
+def select_backend(preferred: str = SCRAPER_PARSER) -> str:
+    """
+    Resolves "auto" (or an unavailable backend) to the fastest installed one.
+    """
+    backends = available_backends()
+    if preferred in backends:
+        return preferred
+    if preferred != "auto":
+        logger.warning("Parser backend '%s' is not available, using '%s'", preferred, backends[0])
+    return backends[0]
+
+
+def extract(html: Union[str, bytes], page_url: str, backend: str = SCRAPER_PARSER) -> Extracted:
+    """
+    Extracts visible text and links from an HTML document with a single parse.
+
+    Boilerplate elements (scripts, styles, navigation, headers, footers) are
+    dropped before the text is collected.
+
+    Args:
+        html (str | bytes): The document. Bytes let the parser detect the encoding.
+        page_url (str): The document's URL, used to resolve relative links.
+        backend (str): "selectolax", "lxml", "html.parser" or "auto".
+
+    Returns:
+        Extracted: The text, absolute link URLs and canonical URL.
+    """
+    backend = select_backend(backend)
+    if backend == "selectolax":
+        text, hrefs, canonical = _extract_selectolax(html)
+    elif backend == "lxml":
+        text, hrefs, canonical = _extract_lxml(html)
+    else:
+        text, hrefs, canonical = _extract_html_parser(html)
+    links = [urljoin(page_url, href.strip()) for href in hrefs if href]
+    canonical = urljoin(page_url, canonical.strip()) if canonical and canonical.strip() else None
+    return Extracted(_WHITESPACE.sub(" ", text).strip(), links, canonical)
+
+
+def process_page(html: Union[str, bytes], page_url: str, backend: str = SCRAPER_PARSER) -> ProcessedPage:
+    """
+    Parses, cleans and chunks a page in one call.
+
+    This is the CPU-heavy part of crawling. It is a module-level function with
+    small, picklable arguments and results so it can run in a worker process.
+    The page's fingerprints for duplicate detection are computed here as well,
+    so duplicates can be dropped before anything is sent for embedding.
+    Stage timings travel back with the result, since metrics recorded in a
+    worker process would not reach the parent.
+    """
+    start = time.perf_counter()
+    extracted = extract(html, page_url, backend)
+    parsed = time.perf_counter()
+    text = clean_text(extracted.text)
+    chunks = chunk_text(text, CHUNK_SIZE, CHUNK_OVERLAP)
+    text_hash, fingerprint = content_hash(text), simhash(text)
+    return ProcessedPage(chunks, extracted.links, extracted.canonical, text_hash, fingerprint,
+                         parsed - start, time.perf_counter() - parsed)
+
+
+def _extract_selectolax(html):
+    tree = HTMLParser(html)
+    # Links are collected before stripping, navigation menus hold most of them
+    hrefs = [node.attributes.get("href") for node in tree.css("a[href]")]
+    canonical = tree.css_first('link[rel="canonical"][href]')
+    canonical = canonical.attributes.get("href") if canonical is not None else None
+    tree.strip_tags(list(BOILERPLATE_TAGS))
+    # The whole document, not just <body>, so the <title> is kept as the other backends keep it
+    root = tree.root
+    return (root.text(separator=" ") if root is not None else ""), hrefs, canonical
+
+
+def _extract_lxml(html):
+    if isinstance(html, str):
+        # lxml rejects str input that carries an XML encoding declaration
+        html = html.encode("utf-8")
+    try:
+        doc = lxml.html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return "", [], None
+    hrefs = doc.xpath("//a/@href")
+    canonical = doc.xpath('//link[@rel="canonical"]/@href')
+    etree.strip_elements(doc, *BOILERPLATE_TAGS, etree.Comment, with_tail=False)
+    return " ".join(doc.itertext()), hrefs, (canonical[0] if canonical else None)
+
+
+def _extract_html_parser(html):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    hrefs = [a_tag["href"] for a_tag in soup.find_all("a", href=True)]
+    canonical = soup.find("link", rel="canonical", href=True)
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+    return soup.get_text(" "), hrefs, (canonical["href"] if canonical else None)
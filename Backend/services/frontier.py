@@ -0,0 +1,321 @@
+import heapq
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+from typing import List, Tuple
+
+from psycopg2.extras import execute_values
+
+from config import CRAWL_FRONTIER, CRAWL_FRONTIER_PATH, CRAWL_LEASE_SECONDS
+from services.vectorstore import VectorDB
+from utils.url_utils import normalize_url
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+
+FRONTIER_BACKENDS = ("memory", "sqlite", "postgres")
+
+
+class Frontier:
+    """
+    The set of URLs a crawl has discovered, shared by every worker taking part in it.
+
+    URLs are deduplicated on their normalized form. A worker leases a batch of
+    pending URLs, highest priority first, crawls them and completes each one
+    together with the links it found. Leases expire, so URLs held by a worker that crashed are handed out
+    again, and a crawl whose entries are still stored resumes where it stopped.
+
+    Subclasses implement the storage; every method must be safe to call from
+    several threads.
+    """
+
+    def __init__(self, crawl_id: str, lease_seconds: float = CRAWL_LEASE_SECONDS):
+        self.crawl_id = crawl_id
+        self.lease_seconds = lease_seconds
+
+    def add(self, urls: List[tuple]) -> int:
+        """
+        Adds (url, depth) pairs or (url, depth, priority) triples that have not
+        been seen before as pending. Priority defaults to 0.
+
+        Returns:
+            int: The number of URLs that were new.
+        """
+        raise NotImplementedError
+
+    def lease(self, limit: int) -> List[Tuple[str, int]]:
+        """
+        Claims up to `limit` pending URLs for `lease_seconds`, highest priority
+        first and, among equal priorities, shallowest first.
+        """
+        raise NotImplementedError
+
+    def complete(self, url: str, discovered: List[tuple] = ()):
+        """
+        Marks a leased URL as crawled and adds the links found on it, as for `add`.
+        """
+        raise NotImplementedError
+
+    def in_progress(self) -> int:
+        """
+        Returns the number of URLs currently leased by any worker.
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Forgets the crawl, so the next crawl with the same id starts afresh.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _normalized(urls) -> List[Tuple[str, int, float]]:
+        # Later duplicates of a URL are dropped, keeping the first (shallowest) depth
+        unique = {}
+        for url, depth, *priority in urls:
+            unique.setdefault(normalize_url(url), (depth, float(priority[0]) if priority else 0.0))
+        return [(url, depth, priority) for url, (depth, priority) in unique.items()]
+
+
+class MemoryFrontier(Frontier):
+    """
+    Frontier held in this process; it is neither shared nor resumable.
+    """
+
+    def __init__(self, crawl_id: str, lease_seconds: float = CRAWL_LEASE_SECONDS):
+        super().__init__(crawl_id, lease_seconds)
+        self._lock = threading.Lock()
+        self._states = {}  # url -> [state, depth, leased_until, priority]
+        self._pending = []  # Heap of (-priority, depth, insertion order, url)
+        self._order = itertools.count()  # Equal priorities and depths are leased in discovery order
+
+    def add(self, urls):
+        added = 0
+        with self._lock:
+            for url, depth, priority in self._normalized(urls):
+                if url not in self._states:
+                    self._states[url] = [PENDING, depth, 0.0, priority]
+                    heapq.heappush(self._pending, (-priority, depth, next(self._order), url))
+                    added += 1
+        return added
+
+    def lease(self, limit):
+        now = time.monotonic()
+        leased = []
+        with self._lock:
+            if not self._pending:
+                # Hand out again URLs whose lease ran out
+                for url, (state, depth, until, priority) in self._states.items():
+                    if state == LEASED and until < now:
+                        heapq.heappush(self._pending, (-priority, depth, next(self._order), url))
+            while self._pending and len(leased) < limit:
+                url = heapq.heappop(self._pending)[3]
+                entry = self._states[url]
+                entry[0], entry[2] = LEASED, now + self.lease_seconds
+                leased.append((url, entry[1]))
+        return leased
+
+    def complete(self, url, discovered=()):
+        self.add(discovered)
+        with self._lock:
+            entry = self._states.get(normalize_url(url))
+            if entry:
+                entry[0] = DONE
+
+    def in_progress(self):
+        now = time.monotonic()
+        with self._lock:
+            return sum(1 for state, _, until, _ in self._states.values() if state == LEASED and until >= now)
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+            self._pending.clear()
+
+
+class SQLiteFrontier(Frontier):
+    """
+    Frontier stored in a local SQLite file. It survives restarts and can be
+    shared by crawler processes on the same machine.
+    """
+
+    def __init__(self, crawl_id: str, path: str = CRAWL_FRONTIER_PATH,
+                 lease_seconds: float = CRAWL_LEASE_SECONDS):
+        super().__init__(crawl_id, lease_seconds)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+        CREATE TABLE IF NOT EXISTS frontier (
+            crawl_id TEXT NOT NULL,
+            url TEXT NOT NULL,
+            depth INTEGER NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            leased_until REAL,
+            priority REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (crawl_id, url)
+        );
+        """)
+        if "priority" not in {row[1] for row in self._db.execute("PRAGMA table_info(frontier)")}:
+            self._db.execute("ALTER TABLE frontier ADD COLUMN priority REAL NOT NULL DEFAULT 0")
+        self._db.execute("DROP INDEX IF EXISTS frontier_open")
+        self._db.execute("CREATE INDEX IF NOT EXISTS frontier_next ON frontier (crawl_id, state, priority DESC, depth)")
+
+    def add(self, urls):
+        urls = self._normalized(urls)
+        if not urls:
+            return 0
+        with self._lock:
+            cursor = self._db.executemany(
+                "INSERT OR IGNORE INTO frontier (crawl_id, url, depth, priority) VALUES (?, ?, ?, ?)",
+                [(self.crawl_id, url, depth, priority) for url, depth, priority in urls]
+            )
+            return cursor.rowcount
+
+    def lease(self, limit):
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock, so two processes never lease the same URL
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute("""
+                SELECT url, depth FROM frontier
+                WHERE crawl_id = ? AND (state = 'pending' OR (state = 'leased' AND leased_until < ?))
+                ORDER BY priority DESC, depth LIMIT ?
+                """, (self.crawl_id, now, limit)).fetchall()
+                self._db.executemany(
+                    "UPDATE frontier SET state = 'leased', leased_until = ? WHERE crawl_id = ? AND url = ?",
+                    [(now + self.lease_seconds, self.crawl_id, url) for url, _ in rows]
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return [(url, depth) for url, depth in rows]
+
+    def complete(self, url, discovered=()):
+        self.add(discovered)
+        with self._lock:
+            self._db.execute("UPDATE frontier SET state = 'done', leased_until = NULL WHERE crawl_id = ? AND url = ?",
+                             (self.crawl_id, normalize_url(url)))
+
+    def in_progress(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT count(*) FROM frontier WHERE crawl_id = ? AND state = 'leased' AND leased_until >= ?",
+                (self.crawl_id, time.time())
+            ).fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM frontier WHERE crawl_id = ?", (self.crawl_id,))
+
+    def close(self):
+        self._db.close()
+
+
+class PostgresFrontier(Frontier):
+    """
+    Frontier stored in the 'scraptable_frontier' table of the vector database,
+    so crawler nodes on several machines can work through one crawl together.
+    """
+
+    def add(self, urls):
+        urls = self._normalized(urls)
+        if not urls:
+            return 0
+        with VectorDB() as db:
+            try:
+                inserted = execute_values(db.cursor, """
+                INSERT INTO scraptable_frontier (crawl_id, url, depth, priority) VALUES %s
+                ON CONFLICT (crawl_id, url) DO NOTHING
+                RETURNING url;
+                """, [(self.crawl_id, url, depth, priority) for url, depth, priority in urls], fetch=True)
+                db.conn.commit()
+                return len(inserted)
+            except Exception:
+                db.conn.rollback()
+                raise
+
+    def lease(self, limit):
+        with VectorDB() as db:
+            try:
+                # SKIP LOCKED lets concurrent nodes lease disjoint batches without waiting on each other
+                db.cursor.execute("""
+                UPDATE scraptable_frontier f
+                SET state = 'leased', leased_until = now() + make_interval(secs => %s)
+                FROM (
+                    SELECT url FROM scraptable_frontier
+                    WHERE crawl_id = %s AND (state = 'pending' OR (state = 'leased' AND leased_until < now()))
+                    ORDER BY priority DESC, depth
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                ) claimed
+                WHERE f.crawl_id = %s AND f.url = claimed.url
+                RETURNING f.url, f.depth, f.priority;
+                """, (self.lease_seconds, self.crawl_id, limit, self.crawl_id))
+                rows = db.cursor.fetchall()
+                db.conn.commit()
+            except Exception:
+                db.conn.rollback()
+                raise
+        rows.sort(key=lambda row: (-row["priority"], row["depth"]))
+        return [(row["url"], row["depth"]) for row in rows]
+
+    def complete(self, url, discovered=()):
+        discovered = self._normalized(discovered)
+        with VectorDB() as db:
+            try:
+                # Recording the links and finishing the URL in one transaction means a crash
+                # in between cannot lose the links
+                if discovered:
+                    execute_values(db.cursor, """
+                    INSERT INTO scraptable_frontier (crawl_id, url, depth, priority) VALUES %s
+                    ON CONFLICT (crawl_id, url) DO NOTHING;
+                    """, [(self.crawl_id, link, depth, priority) for link, depth, priority in discovered])
+                db.cursor.execute("""
+                UPDATE scraptable_frontier SET state = 'done', leased_until = NULL
+                WHERE crawl_id = %s AND url = %s;
+                """, (self.crawl_id, normalize_url(url)))
+                db.conn.commit()
+            except Exception:
+                db.conn.rollback()
+                raise
+
+    def in_progress(self):
+        with VectorDB() as db:
+            db.cursor.execute("""
+            SELECT count(*) AS leased FROM scraptable_frontier
+            WHERE crawl_id = %s AND state = 'leased' AND leased_until >= now();
+            """, (self.crawl_id,))
+            return db.cursor.fetchone()["leased"]
+
+    def clear(self):
+        with VectorDB() as db:
+            db.cursor.execute("DELETE FROM scraptable_frontier WHERE crawl_id = %s;", (self.crawl_id,))
+            db.conn.commit()
+
+
+def get_frontier(crawl_id: str, backend: str = CRAWL_FRONTIER) -> Frontier:
+    """
+    Creates the frontier for a crawl.
+
+    Args:
+        crawl_id (str): Identifies the crawl; workers using the same id share its frontier.
+        backend (str): "memory", "sqlite" or "postgres".
+    """
+    if backend == "sqlite":
+        return SQLiteFrontier(crawl_id)
+    if backend == "postgres":
+        return PostgresFrontier(crawl_id)
+    if backend != "memory":
+        raise ValueError(f"Unknown frontier backend '{backend}', expected one of {FRONTIER_BACKENDS}")
+    return MemoryFrontier(crawl_id)
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from config import INGEST_MAX_CONCURRENT_JOBS, INGEST_MAX_QUEUED_JOBS, INGEST_JOB_HISTORY, DEFAULT_COLLECTION
+from services.metrics import metrics
+from services.scraper import Scraper, CrawlProgress
+from services.vectorstore import validate_collection
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobQueueFull(Exception):
+    """Raised when too many ingestion jobs are already waiting to run."""
+
+
+class IngestJob:
+    """
+    A single URL ingestion submitted to the JobManager.
+    """
+
+    def __init__(self, url: str, max_depth: int, collection: str = DEFAULT_COLLECTION):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.max_depth = max_depth
+        self.collection = collection
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.progress = CrawlProgress()
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "url": self.url,
+            "max_depth": self.max_depth,
+            "collection": self.collection,
+            "status": self.status,
+            "error": self.error,
+            "progress": self.progress.to_dict(),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs ingestion jobs in the background on the current event loop.
+
+    At most `max_concurrent` crawls run at once; later submissions wait for a
+    free slot, and submissions beyond `max_queued` waiting jobs are rejected.
+    """
+
+    def __init__(self, max_concurrent: int = INGEST_MAX_CONCURRENT_JOBS,
+                 max_queued: int = INGEST_MAX_QUEUED_JOBS, history: int = INGEST_JOB_HISTORY):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.history = history
+        self.jobs = OrderedDict()
+        self._slots = None  # Created lazily so it binds to the running event loop
+
+    def submit(self, url: str, max_depth: int = 1, collection: str = DEFAULT_COLLECTION) -> IngestJob:
+        """
+        Queues a crawl of `url` into `collection` and returns immediately.
+
+        Raises:
+            ValueError: If the collection name is invalid.
+            JobQueueFull: If `max_queued` jobs are already waiting.
+        """
+        validate_collection(collection)
+        queued = sum(1 for job in self.jobs.values() if job.status == QUEUED)
+        if queued >= self.max_queued:
+            raise JobQueueFull(f"{queued} ingestion jobs are already queued, try again later.")
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+
+        job = IngestJob(url, max_depth, collection)
+        self.jobs[job.id] = job
+        job.task = asyncio.get_running_loop().create_task(self._run(job))
+        self._prune()
+        logger.info("Queued ingestion job %s for URL: %s (collection: %s)", job.id, url, collection)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self.jobs.get(job_id)
+
+    def list(self) -> list:
+        return list(self.jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[IngestJob]:
+        """
+        Cancels a queued or running job. Finished jobs are returned unchanged.
+        """
+        job = self.jobs.get(job_id)
+        if job and job.status not in FINISHED_STATES and job.task:
+            job.task.cancel()
+            logger.info("Cancellation requested for ingestion job %s", job_id)
+        return job
+
+    async def _run(self, job: IngestJob):
+        try:
+            async with self._slots:
+                job.status = RUNNING
+                job.started_at = time.time()
+                logger.info("Running ingestion job %s", job.id)
+                scraper = Scraper(base_url=job.url, max_depth=job.max_depth, progress=job.progress,
+                                  collection=job.collection)
+                await scraper.scrape_async()
+            job.status = COMPLETED
+        except asyncio.CancelledError:
+            job.status = CANCELLED
+            logger.info("Ingestion job %s cancelled", job.id)
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            logger.error("Ingestion job %s failed: %s", job.id, e, exc_info=True)
+        finally:
+            job.finished_at = time.time()
+            job.task = None
+
+    def _prune(self):
+        """
+        Forgets the oldest finished jobs once more than `history` are kept.
+        """
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self.jobs[job_id]
+
+
+# Shared job manager used by the API routes
+job_manager = JobManager()
+
+
+def _job_metrics():
+    counts = dict.fromkeys((QUEUED, RUNNING) + FINISHED_STATES, 0)
+    for job in job_manager.list():
+        counts[job.status] += 1
+    return [("scrapper_ingest_jobs", "gauge", "Ingestion jobs known to this process, by status.",
+             [({"status": status}, count) for status, count in counts.items()])]
+
+
+metrics.add_collector(_job_metrics)
@@ -0,0 +1,273 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from config import (
+    EMBEDDING_DIM, MEMORY_INDEX, MEMORY_INDEX_SNAPSHOT, MEMORY_INDEX_REFRESH_SECONDS, DEFAULT_COLLECTION
+)
+from services.vectorstore import VectorDB
+
+logger = logging.getLogger(__name__)
+
+MEMORY_INDEX_TYPES = ("none", "float32", "int8")
+
+# Rows are scored this many at a time, keeping the float32 copy of an int8 block in cache
+_BLOCK_ROWS = 1024
+# Re-read rows updated this long before the watermark, since transactions that
+# started earlier may have committed after the last refresh
+_REFRESH_OVERLAP = timedelta(seconds=60)
+
+
+class _IndexState(NamedTuple):
+    ids: np.ndarray  # int64, one per row of `matrix`
+    matrix: np.ndarray  # float32 unit vectors, or int8 quantized unit vectors
+    scales: Optional[np.ndarray]  # float32 per-row dequantization scale for int8
+    urls: List[str]
+    contents: List[str]
+    collections: List[str]
+    groups: Dict[str, np.ndarray]  # collection -> its row positions, ascending
+    watermark: Optional[datetime]  # Latest updated_at loaded from the database
+
+
+def _group(collections: List[str]) -> Dict[str, np.ndarray]:
+    names, inverse = np.unique(np.asarray(collections, dtype=str), return_inverse=True)
+    return {str(name): np.flatnonzero(inverse == i) for i, name in enumerate(names)}
+
+
+class MemoryVectorIndex:
+    """
+    Read-only copy of 'scraptable' held in process memory, for exact top-k
+    search by dot product without a database round-trip. Each collection's
+    row positions are kept, so a search scores only its collection.
+
+    Embeddings are L2-normalised at load, so the dot product is the cosine
+    similarity. With `dtype` "int8" each row is stored as int8 with its own
+    scale, using a quarter of the memory. Postgres stays the source of truth:
+    the index is loaded from it (or from a snapshot) and refreshed
+    incrementally from the rows' updated_at. Queries read an immutable state,
+    so a refresh never blocks them.
+    """
+
+    def __init__(self, dtype: str = "float32", snapshot_path: Optional[str] = None,
+                 refresh_seconds: float = MEMORY_INDEX_REFRESH_SECONDS):
+        if dtype not in ("float32", "int8"):
+            raise ValueError(f"Unknown memory index type '{dtype}', expected float32 or int8")
+        self.dtype = dtype
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.refresh_seconds = refresh_seconds
+        self._state: Optional[_IndexState] = None
+        self._load_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._last_refresh = 0.0
+        self._stale = False
+
+    def __len__(self):
+        return len(self._state.ids) if self._state is not None else 0
+
+    def search(self, embedding: list, top_k: int = 5, collection: Optional[str] = DEFAULT_COLLECTION) -> List[dict]:
+        """
+        Returns the `top_k` rows of `collection` (None for all collections)
+        most similar to `embedding`, best first, as dicts with id, url,
+        content and similarity. Only that collection's rows are scored.
+        """
+        self.load()
+        self._maybe_refresh()
+        state = self._state
+        rows = None
+        if collection is not None:
+            rows = state.groups.get(collection)
+            if rows is None:
+                return []
+        count = len(state.ids) if rows is None else len(rows)
+        if not count or top_k <= 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, _BLOCK_ROWS):
+            end = start + _BLOCK_ROWS
+            block = slice(start, end) if rows is None else rows[start:end]
+            if state.scales is None:
+                scores[start:end] = state.matrix[block] @ query
+            else:
+                scores[start:end] = (state.matrix[block].astype(np.float32) @ query) * state.scales[block]
+        top_k = min(top_k, len(scores))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        positions = top if rows is None else rows[top]
+        return [{"id": int(state.ids[i]), "url": state.urls[i], "content": state.contents[i],
+                 "similarity": float(score)} for i, score in zip(positions, scores[top])]
+
+    def mark_stale(self):
+        """
+        Requests a refresh before the next query, e.g. after this process wrote rows.
+        """
+        self._stale = True
+
+    def refresh(self):
+        """
+        Loads rows added or changed since the last refresh and drops deleted rows.
+        """
+        with self._refresh_lock:
+            state = self._state
+            since = state.watermark - _REFRESH_OVERLAP if state and state.watermark else None
+            rows = []
+            with VectorDB() as db:
+                for batch in db.fetch_embeddings(since=since):
+                    rows.extend(batch)
+                row_count = db.count_rows()
+                live_ids = None
+                if state is not None:
+                    known = len(np.union1d(state.ids, [row["id"] for row in rows]))
+                    if known != row_count:
+                        live_ids = np.asarray(db.get_ids(), dtype=np.int64)
+            self._state = self._merge(state, rows, live_ids)
+            self._last_refresh = time.monotonic()
+            self._stale = False
+            logger.info("Memory index refreshed: %d rows changed, %d rows indexed.", len(rows), len(self))
+
+    def save_snapshot(self, path: Optional[str] = None):
+        """
+        Writes the index to a directory that `load_snapshot` can memory-map.
+
+        Each file is written under a temporary name and renamed into place, so
+        processes mapping the previous snapshot keep a consistent view.
+        """
+        path = Path(path) if path else self.snapshot_path
+        state = self._state
+        path.mkdir(parents=True, exist_ok=True)
+        arrays = {"ids": state.ids, "matrix": state.matrix}
+        if state.scales is not None:
+            arrays["scales"] = state.scales
+        for name, array in arrays.items():
+            with open(path / f"{name}.npy.tmp", "wb") as f:
+                np.save(f, array)
+            os.replace(path / f"{name}.npy.tmp", path / f"{name}.npy")
+        with open(path / "meta.json.tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "dtype": self.dtype,
+                "watermark": state.watermark.isoformat() if state.watermark else None,
+                "urls": state.urls,
+                "contents": state.contents,
+                "collections": state.collections,
+            }, f)
+        os.replace(path / "meta.json.tmp", path / "meta.json")
+        logger.info("Memory index snapshot of %d rows written to %s", len(state.ids), path)
+
+    def load_snapshot(self, path: Optional[str] = None) -> bool:
+        """
+        Loads a snapshot, memory-mapping its matrix, and returns False if there is none.
+
+        Processes that map the same snapshot share its pages in the OS cache.
+        """
+        path = Path(path) if path else self.snapshot_path
+        if path is None or not (path / "meta.json").exists():
+            return False
+        with open(path / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["dtype"] != self.dtype:
+            logger.warning("Ignoring %s memory index snapshot at %s, index type is %s",
+                           meta["dtype"], path, self.dtype)
+            return False
+        # Snapshots written before collections existed hold only the default collection
+        collections = meta.get("collections") or [DEFAULT_COLLECTION] * len(meta["urls"])
+        self._state = _IndexState(
+            ids=np.load(path / "ids.npy"),
+            matrix=np.load(path / "matrix.npy", mmap_mode="r"),
+            scales=np.load(path / "scales.npy") if self.dtype == "int8" else None,
+            urls=meta["urls"],
+            contents=meta["contents"],
+            collections=collections,
+            groups=_group(collections),
+            watermark=datetime.fromisoformat(meta["watermark"]) if meta["watermark"] else None,
+        )
+        logger.info("Memory index snapshot of %d rows loaded from %s", len(self._state.ids), path)
+        return True
+
+    def load(self):
+        """
+        Loads the index on first use: from the snapshot when there is one, then
+        refreshed from the database. A fresh full load is written as the snapshot.
+        """
+        if self._state is not None:
+            return
+        with self._load_lock:
+            if self._state is not None:
+                return
+            loaded = self.load_snapshot()
+            self.refresh()
+            if not loaded and self.snapshot_path:
+                self.save_snapshot()
+
+    def _maybe_refresh(self):
+        """
+        Starts a background refresh once the refresh interval has passed.
+        """
+        due = self._stale or time.monotonic() - self._last_refresh >= self.refresh_seconds
+        if due and not self._refresh_lock.locked():
+            threading.Thread(target=self._refresh_quietly, name="memory-index-refresh", daemon=True).start()
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error("Memory index refresh failed: %s", e)
+
+    def _merge(self, state: Optional[_IndexState], rows: list, live_ids: Optional[np.ndarray]) -> _IndexState:
+        """
+        Builds a new state from the old one with `rows` upserted and rows missing
+        from `live_ids` (when given) removed.
+        """
+        new_ids = np.asarray([row["id"] for row in rows], dtype=np.int64)
+        vectors = np.asarray([row["embedding"] for row in rows], dtype=np.float32)
+        matrix, scales = self._encode(vectors)
+        watermark = max((row["updated_at"] for row in rows), default=None)
+        new_collections = [row.get("collection", DEFAULT_COLLECTION) for row in rows]
+        if state is None:
+            return _IndexState(new_ids, matrix, scales, [row["url"] for row in rows],
+                               [row["content"] for row in rows], new_collections, _group(new_collections),
+                               watermark)
+
+        keep = ~np.isin(state.ids, new_ids)
+        if live_ids is not None:
+            keep &= np.isin(state.ids, live_ids)
+        kept = np.flatnonzero(keep)
+        if len(kept) == len(state.ids) and not rows:
+            return state
+        if state.watermark and (watermark is None or state.watermark > watermark):
+            watermark = state.watermark
+        collections = [state.collections[i] for i in kept] + new_collections
+        return _IndexState(
+            ids=np.concatenate([state.ids[kept], new_ids]),
+            matrix=np.concatenate([state.matrix[kept], matrix]) if len(kept) else matrix,
+            scales=np.concatenate([state.scales[kept], scales]) if scales is not None else None,
+            urls=[state.urls[i] for i in kept] + [row["url"] for row in rows],
+            contents=[state.contents[i] for i in kept] + [row["content"] for row in rows],
+            collections=collections,
+            groups=_group(collections),
+            watermark=watermark,
+        )
+
+    def _encode(self, vectors: np.ndarray):
+        if vectors.size == 0:
+            vectors = vectors.reshape(0, EMBEDDING_DIM)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        if self.dtype == "float32":
+            return np.ascontiguousarray(vectors, dtype=np.float32), None
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+        quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+
+
+# Shared in-process index, or None when MEMORY_INDEX is "none"
+memory_index = (
+    MemoryVectorIndex(MEMORY_INDEX, MEMORY_INDEX_SNAPSHOT or None) if MEMORY_INDEX != "none" else None
+)
@@ -0,0 +1,260 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import METRICS_ENABLED
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, wide enough for both a cache lookup and a slow LLM call
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Spans of the request being traced in this context, or None when it is not traced
+_spans: contextvars.ContextVar[Optional[List[Tuple[str, float, float]]]] = contextvars.ContextVar(
+    "metrics_spans", default=None
+)
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """
+    A monotonically increasing count per combination of label values.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def total(self) -> float:
+        with self._lock:
+            return sum(self._values.values())
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value:g}" for key, value in values]
+
+
+class Histogram:
+    """
+    Observations counted into cumulative buckets per combination of label
+    values, with their count and sum, as Prometheus histograms are.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, list] = {}  # key -> [bucket counts..., count, sum]
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0, 0.0]
+            if index < len(self.buckets):
+                entry[index] += 1
+            entry[-2] += 1
+            entry[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, list(entry)) for key, entry in self._values.items())
+        lines = []
+        for key, entry in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames, key, 'le="%g"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            inf_labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf_labels} {entry[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {entry[-2]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {entry[-1]:.6f}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    The metrics of this process, rendered in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        """
+        Registers a callable returning (name, kind, documentation, [(labels, value)])
+        tuples, for values read at scrape time such as cache sizes.
+        """
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                logger.error("Metrics collector %s failed: %s", getattr(collect, "__name__", collect), e)
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared registry of this process
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    "scrapper_stage_duration_seconds",
+    "Time spent in each pipeline stage: fetch, parse, clean, embed, db_write, retrieval and llm.",
+    ("stage",),
+)
+STAGE_ERRORS = metrics.counter("scrapper_stage_errors_total", "Pipeline stage calls that raised.", ("stage",))
+STAGE_ITEMS = metrics.counter(
+    "scrapper_stage_items_total", "Items handled by each pipeline stage, e.g. pages fetched or chunks embedded.",
+    ("stage",),
+)
+CRAWL_EVENTS = metrics.counter(
+    "scrapper_crawl_events_total", "Crawl progress events across all crawls, by kind.", ("event",)
+)
+TOKENS = metrics.counter(
+    "scrapper_tokens_total", "Tokens reported by the OpenAI API, by model and kind.", ("model", "kind")
+)
+HTTP_SECONDS = metrics.histogram(
+    "scrapper_http_request_duration_seconds", "Latency of API requests by route and status.",
+    ("method", "route", "status"),
+)
+
+
+def observe_stage(name: str, seconds: float, items: int = 0):
+    """
+    Records a stage duration measured elsewhere, e.g. in a parse worker process.
+    """
+    if not METRICS_ENABLED:
+        return
+    STAGE_SECONDS.observe(seconds, stage=name)
+    if items:
+        STAGE_ITEMS.inc(items, stage=name)
+    spans = _spans.get()
+    if spans is not None:
+        spans.append((name, time.perf_counter() - seconds, seconds))
+
+
+@contextmanager
+def stage(name: str, items: int = 0):
+    """
+    Times the enclosed block as one call of pipeline stage `name`, counting
+    `items` handled and an error if the block raises.
+    """
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=name)
+        if items:
+            STAGE_ITEMS.inc(items, stage=name)
+        spans = _spans.get()
+        if spans is not None:
+            spans.append((name, start, seconds))
+
+
+def record_tokens(model: str, usage):
+    """
+    Counts the tokens of an OpenAI response's `usage`, if it has one.
+    """
+    if not METRICS_ENABLED or usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        count = getattr(usage, kind, None)
+        if count:
+            TOKENS.inc(count, model=model, kind=kind[:-len("_tokens")])
+
+
+def start_trace() -> contextvars.Token:
+    """
+    Starts collecting the stage spans of the current request; pass the
+    returned token to `end_trace`.
+
+    Threads started with `asyncio.to_thread` inherit the trace. Work handed to
+    other executors joins it only when submitted through `contextvars.copy_context().run`.
+    """
+    return _spans.set([])
+
+
+def end_trace(token: contextvars.Token) -> List[Tuple[str, float, float]]:
+    """
+    Stops the trace started with `token` and returns its spans as
+    (stage, start, seconds) tuples, in the order they finished.
+    """
+    spans = _spans.get() or []
+    _spans.reset(token)
+    return spans
+
+
+def server_timing(spans: List[Tuple[str, float, float]]) -> str:
+    """
+    Formats spans as a Server-Timing header value, which browser developer
+    tools show next to the request.
+    """
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, _, seconds in spans)
@@ -0,0 +1,315 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, List, Optional
+
+from config import (
+    OPENAI_API_KEY, OPENAI_RPM, OPENAI_TPM, OPENAI_MAX_CONCURRENCY, OPENAI_MAX_RETRIES, OPENAI_TIMEOUT
+)
+from services.cache import make_key
+from services.metrics import metrics, record_tokens, stage
+from utils.text_utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+RETRIES = metrics.counter(
+    "scrapper_openai_retries_total", "OpenAI requests retried, by model and reason.", ("model", "reason")
+)
+THROTTLED_SECONDS = metrics.counter(
+    "scrapper_openai_throttled_seconds_total", "Time requests waited for rate limit budget, by model.", ("model",)
+)
+COALESCED = metrics.counter(
+    "scrapper_openai_coalesced_total", "Requests answered by an identical request already in flight.", ("model",)
+)
+
+# Longest single wait between attempts, in seconds
+_MAX_BACKOFF = 60.0
+# Statuses worth retrying: timeout, conflict, rate limit and server errors
+_RETRY_STATUSES = (408, 409, 429)
+
+
+class TokenBucket:
+    """
+    A budget of `per_minute` units refilled continuously, as OpenAI's request
+    and token limits are.
+
+    `reserve` takes units immediately and returns how long the caller must
+    wait before using them, so concurrent callers queue up in arrival order
+    instead of all waking at once. A bucket with no limit never waits until
+    one is set, e.g. from response headers.
+    """
+
+    def __init__(self, per_minute: float = 0):
+        self._lock = threading.Lock()
+        self.per_minute = 0.0
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        if per_minute:
+            self.set_limit(per_minute)
+
+    def set_limit(self, per_minute: float):
+        with self._lock:
+            if not self.per_minute:
+                self._tokens = per_minute
+            self.per_minute = float(per_minute)
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            if not self.per_minute:
+                return 0.0
+            self._refill()
+            # A request larger than the whole budget can still run once the bucket is full
+            self._tokens -= min(amount, self.per_minute)
+            return max(0.0, -self._tokens) * 60.0 / self.per_minute
+
+    def adjust(self, amount: float):
+        """
+        Returns units to the bucket (or takes more, if negative) once the real
+        cost of a request is known.
+        """
+        with self._lock:
+            if self.per_minute:
+                self._refill()
+                self._tokens = min(self.per_minute, self._tokens + amount)
+
+    def sync(self, remaining: float):
+        """
+        Lowers the budget to what the provider reports as remaining, which
+        also accounts for other processes sharing the same quota.
+        """
+        with self._lock:
+            if self.per_minute:
+                self._refill()
+                self._tokens = min(self._tokens, remaining)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.per_minute, self._tokens + (now - self._updated) * self.per_minute / 60.0)
+        self._updated = now
+
+
+class _ModelLimits:
+    def __init__(self):
+        self.requests = TokenBucket(OPENAI_RPM)
+        self.tokens = TokenBucket(OPENAI_TPM)
+        self.paused_until = 0.0  # Set after a 429, so every caller backs off together
+
+
+class OpenAIClient:
+    """
+    The process-wide gateway to the OpenAI API used for embeddings and chat.
+
+    Every request passes through per-model token buckets for requests and
+    tokens per minute, so a large crawl runs close to the account's quota
+    without tripping it, and a global in-flight limit. Limits left at 0 are
+    learned from the x-ratelimit-* response headers. Rate limits, timeouts,
+    connection errors and server errors are retried with full-jitter
+    exponential backoff, honouring Retry-After; a 429 pauses all callers of
+    that model. Identical embedding and chat requests made while one is in
+    flight share its response.
+    """
+
+    def __init__(self, max_concurrency: int = OPENAI_MAX_CONCURRENCY, max_retries: int = OPENAI_MAX_RETRIES,
+                 timeout: float = OPENAI_TIMEOUT):
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._limits: Dict[str, _ModelLimits] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._sdk = None
+
+    @property
+    def sdk(self):
+        """
+        The underlying openai.OpenAI client, created on first use or by the
+        startup warm-up. Retries are done here, so the SDK's own are turned off.
+
+        Raises:
+            ValueError: If OPENAI_API_KEY is not set.
+        """
+        if self._sdk is None:
+            if not OPENAI_API_KEY:
+                raise ValueError("OPENAI_API_KEY is not set in the environment variables. "
+                                 "Please configure it in a .env file.")
+            from openai import OpenAI
+
+            with self._lock:
+                if self._sdk is None:
+                    self._sdk = OpenAI(api_key=OPENAI_API_KEY, max_retries=0, timeout=self.timeout)
+        return self._sdk
+
+    def embed(self, texts: List[str], model: str, tokens: Optional[int] = None) -> List[List[float]]:
+        """
+        Embeds a batch of texts in one request and returns the vectors in input order.
+
+        Args:
+            texts (list): The inputs, within the provider's per-request limits.
+            model (str): The embedding model.
+            tokens (int): The inputs' token count, if the caller already knows it.
+                Otherwise it is estimated from their length; the rate limit
+                budget is corrected with the usage the response reports.
+        """
+        tokens = tokens if tokens is not None else sum((len(text) + 3) // 4 for text in texts)
+
+        def request():
+            response = self._request(model, tokens, lambda: self.sdk.embeddings.with_raw_response.create(
+                input=texts, model=model
+            ))
+            return [data.embedding for data in sorted(response.data, key=lambda d: d.index)]
+
+        return self._coalesce(make_key("embed", model, *texts), model, request)
+
+    def chat(self, messages: List[dict], model: str, max_tokens: int):
+        """
+        Runs a chat completion and returns the response.
+        """
+        tokens = self._chat_tokens(messages, max_tokens)
+        return self._coalesce(
+            make_key("chat", model, max_tokens, *(m["role"] + "\0" + m["content"] for m in messages)), model,
+            lambda: self._request(model, tokens, lambda: self.sdk.chat.completions.with_raw_response.create(
+                model=model, messages=messages, max_tokens=max_tokens
+            )),
+        )
+
+    def chat_stream(self, messages: List[dict], model: str, max_tokens: int) -> Iterator[str]:
+        """
+        Runs a streamed chat completion, yielding the answer text as it arrives.
+
+        Opening the stream is retried like any request; a stream that fails
+        part-way is not, since its text was already handed out.
+        """
+        tokens = self._chat_tokens(messages, max_tokens)
+        with self._slots:
+            response = self._request(model, tokens, lambda: self.sdk.chat.completions.with_raw_response.create(
+                model=model, messages=messages, max_tokens=max_tokens, stream=True
+            ), acquire_slot=False)
+            for event in response:
+                if event.choices and event.choices[0].delta.content:
+                    yield event.choices[0].delta.content
+
+    def _request(self, model: str, tokens: int, send: Callable, acquire_slot: bool = True):
+        """
+        Sends a request within the model's rate limits, retrying transient
+        failures, and returns the parsed response.
+        """
+        from openai import APIConnectionError, APIStatusError
+
+        limits = self._model_limits(model)
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_budget(model, limits, tokens)
+            try:
+                if acquire_slot:
+                    with self._slots:
+                        raw = send()
+                else:
+                    raw = send()
+            except APIStatusError as e:
+                retryable = e.status_code in _RETRY_STATUSES or e.status_code >= 500
+                if not retryable or getattr(e, "code", None) == "insufficient_quota" or attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e.response.headers)
+                if e.status_code == 429:
+                    limits.paused_until = max(limits.paused_until, time.monotonic() + delay)
+                reason = str(e.status_code)
+            except APIConnectionError as e:  # Includes timeouts
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                reason = type(e).__name__
+            else:
+                self._observe_headers(limits, raw.headers)
+                response = raw.parse()
+                usage = getattr(response, "usage", None)
+                if usage is not None:
+                    record_tokens(model, usage)
+                    limits.tokens.adjust(tokens - (getattr(usage, "total_tokens", None) or tokens))
+                return response
+            RETRIES.inc(model=model, reason=reason)
+            logger.warning("OpenAI %s request failed (%s, attempt %d of %d), retrying in %.1fs",
+                           model, reason, attempt + 1, self.max_retries + 1, delay)
+            time.sleep(delay)
+
+    def _wait_for_budget(self, model: str, limits: _ModelLimits, tokens: int):
+        wait = max(limits.paused_until - time.monotonic(), 0.0,
+                   limits.requests.reserve(1), limits.tokens.reserve(tokens))
+        if wait > 0:
+            THROTTLED_SECONDS.inc(wait, model=model)
+            logger.debug("Waiting %.2fs for %s rate limit budget", wait, model)
+            with stage("rate_limit_wait"):
+                time.sleep(wait)
+
+    def _coalesce(self, key: str, model: str, request: Callable):
+        """
+        Runs `request`, or waits for the identical request already in flight.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            COALESCED.inc(model=model)
+            return future.result()
+        try:
+            result = request()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _model_limits(self, model: str) -> _ModelLimits:
+        with self._lock:
+            limits = self._limits.get(model)
+            if limits is None:
+                limits = self._limits[model] = _ModelLimits()
+            return limits
+
+    @staticmethod
+    def _observe_headers(limits: _ModelLimits, headers):
+        """
+        Learns unset limits from, and syncs the buckets with, the x-ratelimit-* headers.
+        """
+        for bucket, kind, configured in ((limits.requests, "requests", OPENAI_RPM),
+                                         (limits.tokens, "tokens", OPENAI_TPM)):
+            try:
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if limit and not configured and float(limit) != bucket.per_minute:
+                    bucket.set_limit(float(limit))
+                if remaining is not None:
+                    bucket.sync(float(remaining))
+            except ValueError:
+                continue
+
+    @staticmethod
+    def _backoff(attempt: int, headers=None) -> float:
+        """
+        Returns the provider's Retry-After if given, else a full-jitter
+        exponential delay, so retrying callers spread out instead of
+        returning in lockstep.
+        """
+        if headers is not None:
+            try:
+                if headers.get("retry-after-ms"):
+                    return min(_MAX_BACKOFF, float(headers["retry-after-ms"]) / 1000)
+                if headers.get("retry-after"):
+                    return min(_MAX_BACKOFF, float(headers["retry-after"]))
+            except ValueError:
+                pass
+        return random.uniform(0, min(_MAX_BACKOFF, 0.5 * 2 ** attempt))
+
+    @staticmethod
+    def _chat_tokens(messages: List[dict], max_tokens: int) -> int:
+        # The tokens-per-minute limit counts the prompt and the requested completion length
+        return sum(count_tokens(message["content"]) + 4 for message in messages) + max_tokens
+
+
+# Shared client, so every request in the process draws on the same limits
+openai_client = OpenAIClient()
@@ -1,48 +1,117 @@
 from services.vectorstore import VectorDB
-from utils.text_utils import clean_text
-from openai import OpenAI
-from config import OPENAI_API_KEY
+from services.embedding import embed_text, embedding_model_name
+from services.cache import answer_cache, make_key
+from services.memory_index import memory_index
+from services.metrics import stage
+from services.openai_client import openai_client
+from services.rerank import Passage, best_window, pack_passages, rerank
+from utils.text_utils import clean_text, chunk_text, count_tokens, content_hash
+from config import (
+    CHUNK_SIZE, CHUNK_OVERLAP, CHAT_MODEL, ANSWER_MODE, LLM_MAX_CONCURRENCY,
+    LLM_MAX_TOKENS, LLM_COMBINED_MAX_TOKENS, LLM_CONTEXT_TOKENS, LLM_SNIPPET_TOKENS, ANSWER_CACHE_SEMANTIC_THRESHOLD,
+    RETRIEVAL_MODE, DEFAULT_COLLECTION, RERANK_OVERFETCH
+)
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+import contextvars
 import logging
+import numpy as np
+import re
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)  # Use DEBUG for detailed logs
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY)
 
-
-def ingest_and_store(content: str, url: str):
+def ingest_and_store(content: str, url: str, collection: str = DEFAULT_COLLECTION):
     """
     Ingests text content, generates embeddings using OpenAI's API, and stores them in the vector database.
+
+    Returns:
+        dict: Counts of chunks embedded and rows written for this content.
+    """
+    return ingest_documents([(url, content)], collection)
+
+
+def ingest_documents(documents: List[Tuple[str, str]], collection: str = DEFAULT_COLLECTION):
     """
+    Cleans, chunks, embeds and stores several pages at once.
+
+    Args:
+        documents (list): (url, content) pairs.
+        collection (str): The collection to store them in.
+
+    Returns:
+        dict: Counts of chunks embedded and rows written across all documents.
+    """
+    # Step 1: Clean the text content and split it into overlapping chunks
+    logger.debug("Cleaning and chunking text content...")
+    return ingest_chunks([
+        (url, chunk_text(clean_text(content), CHUNK_SIZE, CHUNK_OVERLAP)) for url, content in documents
+    ], collection)
+
+
+def ingest_chunks(pages: List[Tuple[str, List[str]]], collection: str = DEFAULT_COLLECTION):
+    """
+    Embeds and stores the chunks of several pages at once, replacing what was stored for them.
+
+    The chunks of all pages are embedded together, so a batch of pages costs a
+    handful of embedding requests instead of one request per page. Chunks whose
+    content hash matches the stored one are neither re-embedded nor rewritten.
+
+    Args:
+        pages (list): (url, chunks) pairs, each page's chunks in document order.
+        collection (str): The collection to store them in.
+
+    Returns:
+        dict: Counts of chunks embedded and rows written across all pages.
+    """
+    urls = [url for url, _ in pages]
     try:
-        logger.info("Started ingestion process for URL: %s", url)
+        logger.info("Started ingestion process for %d URL(s): %s", len(urls), urls)
+        chunks = []  # (url, chunk_index, text)
+        chunk_counts = {}
+        for url, page_chunks in pages:
+            chunk_counts[url] = len(page_chunks)
+            chunks.extend((url, index, chunk) for index, chunk in enumerate(page_chunks))
 
-        # Step 1: Clean the text content
-        logger.debug("Cleaning text content...")
-        cleaned_text = clean_text(content)
-        logger.debug("Cleaned text: %s", cleaned_text[:100])  # Log first 100 characters
+        # Step 2: Only chunks whose content changed since the last crawl need embedding
+        with VectorDB() as db:
+            stored_hashes = db.get_chunk_hashes(urls, collection)
+        changed = [(url, index, text) for url, index, text in chunks
+                   if stored_hashes.get(url, {}).get(index) != content_hash(text)]
+        logger.debug("%d of %d chunks are new or changed.", len(changed), len(chunks))
 
-        # Step 2: Generate embeddings using OpenAI's embedding model
-        logger.debug("Generating embeddings for the content...")
-        embeddings = client.embeddings.create(input=[cleaned_text], model="text-embedding-ada-002").data[0].embedding
-        logger.debug("Generated embedding (length: %d, first 5 dimensions): %s", len(embeddings), embeddings[:5])
+        # Step 3: Generate embeddings for the changed chunks in batched requests
+        embeddings = embed_text([text for _, _, text in changed]) if changed else []
 
-        # Step 3: Store embeddings in the vector database
-        logger.debug("Connecting to the vector database for storage...")
-        db = VectorDB()
+        # Step 4: Store them, dropping chunks beyond each page's new length
         logger.debug("Storing embeddings into the database...")
-        db.insert_vector(url=url, embedding=embeddings, content=cleaned_text)
-        logger.info("Successfully stored content and embeddings for URL: %s", url)
-        db.close()
+        records = [(url, index, text, embedding) for (url, index, text), embedding in zip(changed, embeddings)]
+        with stage("db_write", items=len(records)), VectorDB() as db:
+            rows_written = db.insert_vectors(records, chunk_counts=chunk_counts, collection=collection)
+        if rows_written:
+            if memory_index is not None:
+                memory_index.mark_stale()
+            # Cached answers from this collection may no longer reflect the stored content
+            discard_answers(collection)
+        logger.info("Stored %d changed chunks (%d total) for %d URL(s).", len(changed), len(chunks), len(urls))
+
+        return {"chunks_embedded": len(changed), "rows_written": rows_written}
 
     except Exception as e:
-        logger.error("Error during ingestion and storage for URL %s: %s", url, e, exc_info=True)
+        logger.error("Error during ingestion and storage for URL(s) %s: %s", urls, e, exc_info=True)
         raise
 
 
-def ask_question(question: str, top_k: int = 3):
+SYSTEM_PROMPT = "You are a helpful assistant."
+ANSWER_MODES = ("per_snippet", "combined")
+RETRIEVAL_MODES = ("vector", "keyword", "hybrid")
+
+# Shared across requests so LLM_MAX_CONCURRENCY bounds all in-flight chat calls
+_llm_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+
+
+def ask_question(question: str, top_k: int = 3, mode: str = ANSWER_MODE, retrieval: str = RETRIEVAL_MODE,
+                 collection: str = DEFAULT_COLLECTION):
     """
     Retrieves the most relevant answers to a question from the vector database using both:
     1. Vector similarity search.
@@ -51,70 +120,304 @@ def ask_question(question: str, top_k: int = 3):
     Args:
         question (str): The question to ask.
         top_k (int): Number of top similar results to return. Default is 3.
+        mode (str): "per_snippet" answers from each result with concurrent LLM
+            calls, each given up to LLM_SNIPPET_TOKENS of its passage;
+            "combined" sends all results in one prompt of LLM_CONTEXT_TOKENS.
+        retrieval (str): "vector" ranks chunks by embedding similarity, "keyword"
+            by full-text match, and "hybrid" fuses both rankings.
+        collection (str): The collection to search.
 
     Returns:
         dict: A dictionary containing results from vector similarity and LLM-based search.
+
+    With RERANK_OVERFETCH above 1, RERANK_OVERFETCH * top_k candidates are
+    retrieved and `rerank` picks the top_k passages from them: the most
+    relevant to the question, without overlapping or repeated text.
+
+    Answers are cached per collection, normalised question, mode, retrieval, top_k, RERANK_OVERFETCH
+    and models. With ANSWER_CACHE_SEMANTIC_THRESHOLD set, a cached answer under the same settings to
+    a question whose embedding is at least that similar is also reused.
     """
+    if mode not in ANSWER_MODES:
+        raise ValueError(f"Unknown answer mode '{mode}', expected one of {ANSWER_MODES}")
+    if retrieval not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode '{retrieval}', expected one of {RETRIEVAL_MODES}")
     try:
         logger.info("Processing question: %s", question)
+        cache_key = make_key(CHAT_MODEL, embedding_model_name(), collection, mode, retrieval, top_k, RERANK_OVERFETCH,
+                             _normalize_question(question))
+        cached = answer_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Answer served from cache.")
+            return cached["result"]
 
-        # Step 1: Generate embedding for the question
-        logger.debug("Generating embedding for the question...")
-        question_embedding = client.embeddings.create(input=[question], model="text-embedding-ada-002").data[0].embedding
-        logger.debug("Question embedding (length: %d, first 5 dimensions): %s", len(question_embedding), question_embedding[:5])
+        # Step 1: Generate embedding for the question (keyword retrieval needs none)
+        question_embedding = None
+        if retrieval != "keyword" or ANSWER_CACHE_SEMANTIC_THRESHOLD > 0:
+            logger.debug("Generating embedding for the question...")
+            question_embedding = embed_text([question])[0]
 
-        # Step 2: Query the vector database for similar content
-        logger.debug("Querying the vector database for similar content...")
-        db = VectorDB()
-        vector_results = db.query_similar(question_embedding, top_k=top_k)
-
-        # Enhance vector similarity with content snippets
-        enhanced_results = []
-        for result in vector_results:
-            content_snippet = db.get_content_snippet(result["id"])
-            enhanced_results.append({
-                "id": result.get("id"),
-                "url": result.get("url"),
-                "similarity": round(result.get("similarity", 0.0), 2),
-                "snippet": content_snippet
-            })
+        if ANSWER_CACHE_SEMANTIC_THRESHOLD > 0:
+            similar = _find_similar_answer(question_embedding, mode, retrieval, top_k, collection)
+            if similar is not None:
+                answer_cache.record_semantic_hit()
+                logger.info("Answer served from cache (semantic match).")
+                return similar
 
-        db.close()
-
-        logger.info("Vector similarity results retrieved: %d records", len(enhanced_results))
-        logger.debug("Enhanced Similarity Results: %s", enhanced_results)
+        # Without re-ranking, per-snippet answers only need the snippets, so full chunks are fetched for combined mode
+        enhanced_results, passages = _retrieve(question, question_embedding, top_k, retrieval,
+                                               with_content=mode == "combined", collection=collection)
 
         # Step 3: Use LLM to retrieve richer answers
-        logger.debug("Retrieving answers using LLM-based search...")
-        llm_results = []
-        for result in enhanced_results:
-            try:
-                llm_query = f"Based on the following content, answer the question: {question}\n\nContent: {result.get('snippet') or result.get('url')}"
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful assistant."},
-                        {"role": "user", "content": llm_query}
-                    ],
-                    max_tokens=150
-                )
-                llm_results.append({
-                    "id": result.get("id"),
-                    "url": result.get("url"),
-                    "answer": response.choices[0].message.content.strip(),
-                    "similarity": result.get("similarity")
-                })
-                logger.debug(
-                    "LLM Result - ID: %s, URL: %s, Answer: %s",
-                    result.get("id"), result.get("url"), response.choices[0].message.content.strip()
-                )
-            except Exception as e:
-                logger.error("Error during LLM processing for result ID %s: %s", result.get("id"), e, exc_info=True)
+        logger.debug("Retrieving answers using LLM-based search (mode: %s)...", mode)
+        if mode == "combined":
+            llm_results = _answer_combined(question, passages)
+        else:
+            llm_results = _answer_per_snippet(question, passages)
 
         logger.info("LLM-based search results retrieved successfully.")
 
-        return {"vector_similarity": enhanced_results, "llm_search": llm_results}
+        result = {"vector_similarity": enhanced_results, "llm_search": llm_results}
+        if llm_results:
+            # The fields of the exact key, so that semantic matches are made under the same settings
+            answer_cache.set(cache_key, {
+                "model": CHAT_MODEL,
+                "embedding_model": embedding_model_name(),
+                "collection": collection,
+                "mode": mode,
+                "retrieval": retrieval,
+                "top_k": top_k,
+                "rerank_overfetch": RERANK_OVERFETCH,
+                "embedding": question_embedding if ANSWER_CACHE_SEMANTIC_THRESHOLD > 0 else None,
+                "result": result,
+            })
+        return result
 
     except Exception as e:
         logger.error("Error during question answering: %s", e, exc_info=True)
-        raise
\ No newline at end of file
+        raise
+
+
+def stream_answer(question: str, top_k: int = 3, retrieval: str = RETRIEVAL_MODE,
+                  collection: str = DEFAULT_COLLECTION):
+    """
+    Answers the question from all retrieved passages in one prompt, yielding
+    the answer text as the LLM produces it.
+    """
+    logger.info("Streaming answer for question: %s", question)
+    question_embedding = embed_text([question])[0] if retrieval != "keyword" else None
+    enhanced_results, passages = _retrieve(question, question_embedding, top_k, retrieval, collection=collection)
+    if not enhanced_results:
+        yield "No relevant content found."
+        return
+    messages, _ = _combined_messages(question, passages)
+    with stage("llm"):
+        yield from openai_client.chat_stream(messages, CHAT_MODEL, LLM_COMBINED_MAX_TOKENS)
+
+
+def discard_answers(collection: str) -> int:
+    """
+    Evicts the cached answers drawn from a collection, leaving those of other
+    collections, in memory and on disk.
+
+    Returns:
+        int: The number of answers evicted.
+    """
+    evicted = answer_cache.discard(lambda entry: entry.get("collection", DEFAULT_COLLECTION) == collection)
+    logger.debug("Evicted %d cached answers of collection '%s'", evicted, collection)
+    return evicted
+
+
+def _normalize_question(question: str) -> str:
+    return re.sub(r"\s+", " ", question).strip().lower()
+
+
+def _find_similar_answer(question_embedding: list, mode: str, retrieval: str, top_k: int, collection: str):
+    """
+    Returns the cached result whose question embedding is most similar to this
+    one, if the cosine similarity reaches ANSWER_CACHE_SEMANTIC_THRESHOLD.
+    """
+    settings = {"model": CHAT_MODEL, "embedding_model": embedding_model_name(), "collection": collection,
+                "mode": mode, "retrieval": retrieval, "top_k": top_k, "rerank_overfetch": RERANK_OVERFETCH}
+    entries = [entry for entry in answer_cache.values()
+               if entry.get("embedding") is not None
+               and all(entry.get(field) == value for field, value in settings.items())]
+    if not entries:
+        return None
+    matrix = np.asarray([entry["embedding"] for entry in entries], dtype=np.float32)
+    query = np.asarray(question_embedding, dtype=np.float32)
+    scores = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12)
+    best = int(np.argmax(scores))
+    if scores[best] >= ANSWER_CACHE_SEMANTIC_THRESHOLD:
+        return entries[best]["result"]
+    return None
+
+
+def _retrieve(question: str, question_embedding: list, top_k: int, retrieval: str = "vector",
+              with_content: bool = True, collection: str = DEFAULT_COLLECTION):
+    """
+    Fetches the chunks most relevant to the question in one query and, with
+    RERANK_OVERFETCH above 1, re-ranks that many times more candidates down
+    to `top_k` passages.
+
+    Snippets are cut by the database. Without re-ranking, the full chunk text
+    is only transferred when `with_content` is set, and passages are the
+    snippets otherwise.
+
+    Returns:
+        tuple: The enhanced results (with short snippets) and the passages
+            behind them, in the same order.
+    """
+    # Step 2: Query the vector database for relevant content
+    logger.debug("Querying the vector database for relevant content (retrieval: %s)...", retrieval)
+    overfetch = max(1, RERANK_OVERFETCH)
+    with stage("retrieval"):
+        vector_results = _query(question, question_embedding, top_k * overfetch, retrieval,
+                                with_content or overfetch > 1, collection)
+
+    if overfetch > 1:
+        with stage("rerank", items=len(vector_results)):
+            passages = rerank(question, vector_results, top_k)
+    else:
+        passages = [Passage((result.get("id"),), result.get("url"), result.get("content") or result["snippet"],
+                            result.get("similarity") or 0.0, result.get("score") or 0.0) for result in vector_results]
+    enhanced_results = [_enhance(passage) for passage in passages]
+    logger.info("Vector similarity results retrieved: %d records", len(enhanced_results))
+    logger.debug("Enhanced Similarity Results: %s", enhanced_results)
+    return enhanced_results, passages
+
+
+def _query(question: str, question_embedding: list, top_k: int, retrieval: str, with_content: bool,
+           collection: str) -> list:
+    if retrieval == "vector" and memory_index is not None:
+        # The in-process index holds the content too, so no database query is needed
+        vector_results = memory_index.search(question_embedding, top_k=top_k, collection=collection)
+        for result in vector_results:
+            result["snippet"] = _snippet(result["content"])
+    else:
+        with VectorDB() as db:
+            if retrieval == "keyword":
+                vector_results = db.query_keyword(_keyword_query(question), top_k=top_k, with_content=with_content,
+                                                  collection=collection)
+            elif retrieval == "hybrid":
+                vector_results = db.query_hybrid(question_embedding, _keyword_query(question), top_k=top_k,
+                                                 with_content=with_content, collection=collection)
+            else:
+                vector_results = db.query_similar(question_embedding, top_k=top_k, with_content=with_content,
+                                                  collection=collection)
+    return vector_results
+
+
+def _enhance(passage: Passage) -> dict:
+    enhanced = {
+        "id": passage.ids[0],
+        "url": passage.url,
+        "similarity": round(passage.similarity, 2),
+        "snippet": _snippet(passage.text)
+    }
+    if RERANK_OVERFETCH > 1 or passage.score:
+        enhanced["score"] = round(passage.score, 4)
+    if len(passage.ids) > 1:
+        enhanced["chunk_ids"] = list(passage.ids)
+    return enhanced
+
+
+def _snippet(content: str, length: int = 200) -> str:
+    """
+    Shortens content the way VectorDB's retrieval queries cut their snippets.
+    """
+    return content[:length] + "..." if len(content) > length else content
+
+
+def _keyword_query(question: str) -> str:
+    """
+    Turns a question into a websearch_to_tsquery query matching any of its words.
+
+    Quoted phrases are kept as phrases. Matching any word instead of all of them
+    lets chunks that share only the distinctive terms (identifiers, error codes,
+    product names) match; ts_rank_cd still ranks chunks with more terms higher.
+    """
+    phrases = re.findall(r'"[^"]+"', question)
+    words = re.findall(r"[\w.-]+", re.sub(r'"[^"]+"', " ", question))
+    # "or" and a leading "-" are websearch_to_tsquery operators, keep them literal
+    words = [word.lstrip("-") for word in words if word.lower() != "or" and word.strip("-")]
+    return " or ".join(phrases + words)
+
+
+def _answer_per_snippet(question: str, passages: list) -> list:
+    """
+    Answers the question once per passage, running the LLM calls concurrently.
+    Latency is that of the slowest call rather than the sum of all calls.
+    """
+    # Each call runs in a copy of this context, so it joins the request's trace
+    futures = [_llm_executor.submit(contextvars.copy_context().run, _answer_snippet, question, passage)
+               for passage in passages]
+    answers = [future.result() for future in futures]
+    return [answer for answer in answers if answer is not None]
+
+
+def _answer_snippet(question: str, passage: Passage):
+    try:
+        content = best_window(question, passage.text, LLM_SNIPPET_TOKENS) or passage.url
+        llm_query = f"Based on the following content, answer the question: {question}\n\nContent: {content}"
+        with stage("llm"):
+            response = openai_client.chat([
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": llm_query}
+            ], CHAT_MODEL, LLM_MAX_TOKENS)
+        answer = response.choices[0].message.content.strip()
+        logger.debug("LLM Result - ID: %s, URL: %s, Answer: %s", passage.ids[0], passage.url, answer)
+        return {
+            "id": passage.ids[0],
+            "url": passage.url,
+            "answer": answer,
+            "similarity": round(passage.similarity, 2)
+        }
+    except Exception as e:
+        logger.error("Error during LLM processing for result ID %s: %s", passage.ids[0], e, exc_info=True)
+        return None
+
+
+def _answer_combined(question: str, passages: list) -> list:
+    """
+    Answers the question with a single LLM call over all retrieved passages.
+    """
+    if not passages:
+        return []
+    try:
+        messages, used = _combined_messages(question, passages)
+        with stage("llm"):
+            response = openai_client.chat(messages, CHAT_MODEL, LLM_COMBINED_MAX_TOKENS)
+        return [{
+            "answer": response.choices[0].message.content.strip(),
+            # Numbered as in the prompt, so [n] in the answer is sources[n - 1]
+            "sources": [{"id": passage.ids[0], "url": passage.url, "similarity": round(passage.similarity, 2),
+                         "chunk_ids": list(passage.ids)} for passage in used]
+        }]
+    except Exception as e:
+        logger.error("Error during combined LLM processing: %s", e, exc_info=True)
+        return []
+
+
+def _combined_messages(question: str, passages: list) -> tuple:
+    """
+    Builds the chat messages for one prompt holding as many passages as fit in
+    LLM_CONTEXT_TOKENS, best first, each numbered with its source URL.
+
+    Returns:
+        tuple: The messages, and the passages that made it into the prompt.
+    """
+    # The "[n] url" header of each section counts against the budget too
+    headers = sum(count_tokens(f"[{number}] {passage.url}\n\n\n")
+                  for number, passage in enumerate(passages, start=1))
+    packed = pack_passages(question, passages, max(1, LLM_CONTEXT_TOKENS - headers))
+    sections = [f"[{number}] {passage.url}\n{text}" for number, (passage, text) in enumerate(packed, start=1)]
+    llm_query = (
+        f"Based on the following numbered sources, answer the question: {question}\n"
+        "Cite the sources you use by number, e.g. [1].\n\n"
+        + "\n\n".join(sections)
+    )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": llm_query}
+    ], [passage for passage, _ in packed]
@@ -0,0 +1,273 @@
+import logging
+import math
+import re
+from collections import Counter
+from typing import List, NamedTuple, Optional, Tuple
+
+from config import RERANK_LEXICAL_WEIGHT, RERANK_MMR_LAMBDA, RERANK_DUPLICATE_THRESHOLD
+from utils.text_utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters for the lexical score
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Weight of a question bigram found verbatim, relative to its words' BM25 weights
+PHRASE_WEIGHT = 0.5
+# Words two chunks of a page must share at their boundary to be treated as overlapping
+MIN_OVERLAP_WORDS = 8
+# Word shingle size for near-duplicate detection
+SHINGLE_SIZE = 3
+# A passage cut shorter than this to fit the prompt is left out instead
+MIN_PASSAGE_TOKENS = 50
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it its of on or that the this to was what when
+where which who why will with you your
+""".split())
+
+
+class Passage(NamedTuple):
+    ids: tuple  # Chunks the text came from, more than one when overlapping chunks were merged
+    url: str
+    text: str
+    similarity: float  # Retrieval similarity of the best chunk
+    score: float  # Relevance after re-ranking, 0 to 1
+
+
+def _terms(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def _query_terms(question: str) -> List[str]:
+    return [term for term in _terms(question) if term not in STOPWORDS]
+
+
+def _normalized(values: List[float]) -> List[float]:
+    low, high = min(values), max(values)
+    if high - low < 1e-12:
+        return [1.0] * len(values)
+    return [(value - low) / (high - low) for value in values]
+
+
+def lexical_scores(question: str, texts: List[str]) -> List[float]:
+    """
+    Scores each text against the question: BM25 over the question's words,
+    with document frequencies taken from the texts themselves, plus a bonus
+    for each pair of adjacent question words that appears as a phrase.
+
+    This is the cheap cross-scorer of the re-ranking step. Unlike the
+    embedding similarity, it sees the question and the passage together, so
+    passages holding the exact identifiers, names and phrases asked about
+    move up.
+    """
+    query = _query_terms(question)
+    if not query or not texts:
+        return [0.0] * len(texts)
+    documents = [_terms(text) for text in texts]
+    average_length = sum(len(document) for document in documents) / len(documents) or 1.0
+    frequency = Counter(term for document in documents for term in set(document))
+    idf = {term: math.log(1 + (len(documents) - frequency[term] + 0.5) / (frequency[term] + 0.5)) for term in query}
+    bigrams = list(zip(query, query[1:]))
+
+    scores = []
+    for document in documents:
+        counts = Counter(document)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * len(document) / average_length)
+        score = sum(idf[term] * counts[term] * (BM25_K1 + 1) / (counts[term] + norm) for term in set(query))
+        if bigrams:
+            pairs = set(zip(document, document[1:]))
+            score += PHRASE_WEIGHT * sum((idf[first] + idf[second]) / 2 for first, second in bigrams
+                                         if (first, second) in pairs)
+        scores.append(score)
+    return scores
+
+
+def _tail_overlap(first: List[str], second: List[str]) -> Optional[int]:
+    """
+    Returns where in `first` the start of `second` repeats if `first` ends
+    with it, as consecutive chunks of a page do, or None.
+
+    Chunks are cut at token boundaries, so the first word of `second` and the
+    last word of `first` may be partial and are not compared.
+    """
+    probe = second[1:1 + MIN_OVERLAP_WORDS]
+    if len(probe) < MIN_OVERLAP_WORDS:
+        return None
+    start = max(1, len(first) - len(second) - 1)
+    for position in range(start, len(first) - len(probe) + 1):
+        if first[position:position + len(probe)] == probe:
+            overlap = first[position:-1]
+            if second[1:1 + len(overlap)] == overlap:
+                return position
+    return None
+
+
+def _merge(kept: Passage, candidate: Passage) -> Optional[Passage]:
+    """
+    Joins two chunks of the same page that overlap, in page order, or None
+    if they do not.
+    """
+    if kept.url != candidate.url:
+        return None
+    first, second = kept.text.split(), candidate.text.split()
+    for before, after in ((first, second), (second, first)):
+        position = _tail_overlap(before, after)
+        if position is not None:
+            ids = kept.ids + candidate.ids if before is first else candidate.ids + kept.ids
+            return kept._replace(ids=ids, text=" ".join(before[:position] + after[1:]),
+                                 similarity=max(kept.similarity, candidate.similarity))
+    return None
+
+
+def _shingles(text: str) -> set:
+    words = _terms(text)
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+
+
+def dedupe(passages: List[Passage], threshold: float = RERANK_DUPLICATE_THRESHOLD) -> List[Passage]:
+    """
+    Merges overlapping chunks of the same page into one passage and drops
+    passages whose word shingles are mostly contained in a better one.
+
+    Args:
+        passages (list): Passages, best first.
+        threshold (float): Share of a passage's shingles found in a kept
+            passage that makes it a duplicate.
+
+    Returns:
+        list: The remaining passages, in the same order.
+    """
+    kept, kept_shingles = [], []
+    for passage in passages:
+        for index, other in enumerate(kept):
+            merged = _merge(other, passage)
+            if merged is not None:
+                kept[index], kept_shingles[index] = merged, _shingles(merged.text)
+                break
+        else:
+            shingles = _shingles(passage.text)
+            if any(len(shingles & other) >= threshold * len(shingles) for other in kept_shingles):
+                logger.debug("Dropping duplicate passage %s from %s", passage.ids, passage.url)
+                continue
+            kept.append(passage)
+            kept_shingles.append(shingles)
+    return kept
+
+
+def _cosine(first: Counter, second: Counter) -> float:
+    if len(first) > len(second):
+        first, second = second, first
+    dot = sum(count * second[term] for term, count in first.items())
+    norms = math.sqrt(sum(c * c for c in first.values())) * math.sqrt(sum(c * c for c in second.values()))
+    return dot / norms if norms else 0.0
+
+
+def mmr(passages: List[Passage], top_k: int, mmr_lambda: float = RERANK_MMR_LAMBDA) -> List[Passage]:
+    """
+    Picks `top_k` passages by maximal marginal relevance: each pick maximises
+    `mmr_lambda` * relevance - (1 - `mmr_lambda`) * its highest word-count
+    cosine similarity to the passages already picked, so a second passage
+    saying the same thing loses to one that adds something.
+    """
+    counts = [Counter(term for term in _terms(passage.text) if term not in STOPWORDS) for passage in passages]
+    remaining = list(range(len(passages)))
+    redundancy = [0.0] * len(passages)
+    picked = []
+    while remaining and len(picked) < top_k:
+        best = max(remaining, key=lambda i: mmr_lambda * passages[i].score - (1 - mmr_lambda) * redundancy[i])
+        remaining.remove(best)
+        picked.append(best)
+        for i in remaining:
+            redundancy[i] = max(redundancy[i], _cosine(counts[i], counts[best]))
+    return [passages[i] for i in picked]
+
+
+def rerank(question: str, results: List[dict], top_k: int, lexical_weight: float = RERANK_LEXICAL_WEIGHT,
+           mmr_lambda: float = RERANK_MMR_LAMBDA) -> List[Passage]:
+    """
+    Re-ranks over-fetched retrieval results and keeps the best `top_k`.
+
+    Each result's retrieval score (fused score or similarity) and its lexical
+    score against the question are scaled to 0..1 across the results and
+    blended by `lexical_weight`. Overlapping and duplicate chunks are then
+    merged or dropped, and `mmr` picks a relevant but varied set.
+
+    Args:
+        question (str): The question asked.
+        results (list): Retrieval rows with id, url, similarity and content
+            (or only a snippet), best first.
+        top_k (int): Passages to keep.
+
+    Returns:
+        list: The kept passages, best first.
+    """
+    if not results:
+        return []
+    texts = [result.get("content") or result.get("snippet") or "" for result in results]
+    retrieval = _normalized([float(result.get("score", result.get("similarity")) or 0.0) for result in results])
+    lexical = _normalized(lexical_scores(question, texts))
+    passages = sorted((
+        Passage((result.get("id"),), result.get("url"), text, float(result.get("similarity") or 0.0),
+                (1 - lexical_weight) * retrieval_score + lexical_weight * lexical_score)
+        for result, text, retrieval_score, lexical_score in zip(results, texts, retrieval, lexical)
+    ), key=lambda passage: -passage.score)
+    unique = dedupe(passages)
+    logger.debug("Re-ranked %d candidates into %d unique passages", len(passages), len(unique))
+    return mmr(unique, top_k, mmr_lambda)
+
+
+def best_window(question: str, text: str, max_tokens: int) -> str:
+    """
+    Returns the run of words in `text` that fits in `max_tokens` and holds the
+    most question words, centred on them, or all of `text` if it fits.
+    """
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    words = text.split()
+    query = set(_query_terms(question))
+    hits = [1 if set(_terms(word)) & query else 0 for word in words]
+    size = len(words)
+    while size > 1:
+        size = max(1, int(size * max_tokens / tokens * 0.95))
+        best_start, best_hits, window_hits = 0, -1, sum(hits[:size])
+        for start in range(len(words) - size + 1):
+            if start:
+                window_hits += hits[start + size - 1] - hits[start - 1]
+            if window_hits > best_hits:
+                best_start, best_hits = start, window_hits
+        positions = [i for i in range(best_start, best_start + size) if hits[i]]
+        if positions:
+            centre = (positions[0] + positions[-1]) // 2
+            best_start = max(0, min(len(words) - size, centre - size // 2))
+        window = " ".join(words[best_start:best_start + size])
+        tokens = count_tokens(window)
+        if tokens <= max_tokens:
+            return window
+    return words[0] if words else ""
+
+
+def pack_passages(question: str, passages: List[Passage], budget: int) -> List[Tuple[Passage, str]]:
+    """
+    Fills a token budget with passages, best first. A passage that no longer
+    fits is cut to its `best_window` of the remaining budget, unless less
+    than MIN_PASSAGE_TOKENS remain; the first passage is always included.
+
+    Returns:
+        list: (passage, text) pairs to put in the prompt, in order.
+    """
+    packed = []
+    for passage in passages:
+        tokens = count_tokens(passage.text)
+        text = passage.text
+        if tokens > budget:
+            if packed and budget < MIN_PASSAGE_TOKENS:
+                break
+            text = best_window(question, text, max(budget, 1))
+            tokens = count_tokens(text)
+        packed.append((passage, text))
+        budget -= tokens
+        if budget <= 0:
+            break
+    return packed
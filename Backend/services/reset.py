@@ -1,34 +1,47 @@
-from psycopg2 import connect
-from config import PGVECTOR_HOST, PGVECTOR_PORT, PGVECTOR_DB, PGVECTOR_USER, PGVECTOR_PASSWORD
+from services.vectorstore import VectorDB
+from services.cache import answer_cache
+from services.memory_index import memory_index
+from config import DEFAULT_COLLECTION
+from typing import Optional
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def clear_embeddings():
+def clear_embeddings(collection: Optional[str] = None):
     """
-    Clears all data in the 'scraptable' table.
+    Clears all data in the 'scraptable' table, or only one collection's.
+
+    A collection is cleared by dropping its partition, along with its pages'
+    fetch metadata and its crawls' frontier entries.
+
+    Returns:
+        bool: Whether anything was cleared; False for an unknown collection.
     """
     try:
         logger.info("Connecting to PGVector database to clear embeddings...")
-        conn = connect(
-            host=PGVECTOR_HOST,
-            port=PGVECTOR_PORT,
-            database=PGVECTOR_DB,
-            user=PGVECTOR_USER,
-            password=PGVECTOR_PASSWORD
-        )
-        cursor = conn.cursor()
-
-        # Clear the table
-        logger.debug("Executing SQL to clear 'scraptable' table...")
-        cursor.execute("TRUNCATE TABLE scraptable;")
-        conn.commit()
+        with VectorDB() as db:
+            if collection is None:
+                # Clear the table
+                logger.debug("Executing SQL to clear 'scraptable' table...")
+                db.cursor.execute("TRUNCATE TABLE scraptable, scraptable_pages, scraptable_frontier;")
+                db.conn.commit()
+                cleared = True
+            else:
+                cleared = db.drop_collection(collection)
+                # Crawl ids are "<collection>:<base URL>", see services.scraper
+                db.cursor.execute("DELETE FROM scraptable_frontier WHERE starts_with(crawl_id, %s);",
+                                  (f"{collection}:",))
+                db.conn.commit()
+        if collection is None:
+            answer_cache.clear()
+        else:
+            answer_cache.discard(lambda entry: entry.get("collection", DEFAULT_COLLECTION) == collection)
+        if memory_index is not None:
+            memory_index.mark_stale()
 
-        logger.info("All embeddings cleared from 'scraptable' table successfully.")
-        cursor.close()
-        conn.close()
+        logger.info("Embeddings cleared from %s successfully.",
+                    f"collection '{collection}'" if collection else "'scraptable' table")
+        return cleared
     except Exception as e:
         logger.error("Failed to clear embeddings: %s", e, exc_info=True)
-        raise
\ No newline at end of file
+        raise
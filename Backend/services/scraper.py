@@ -1,131 +1,715 @@
+import asyncio
+import httpx
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from services.rag import ingest_and_store
+import time
+from urllib.parse import urlsplit
+from concurrent.futures import ProcessPoolExecutor
+from services.dedupe import ContentIndex, from_signed, to_signed
+from services.discovery import (
+    MAX_SITEMAP_BYTES, RobotsRules, crawl_priority, default_sitemap, read_sitemaps, robots_url
+)
+from services.extract import process_page
+from services.frontier import get_frontier
+from services.metrics import CRAWL_EVENTS, observe_stage, stage
+from services.rag import ingest_chunks
 from services.vectorstore import VectorDB
+from utils.text_utils import content_hash
+from utils.url_utils import in_scope, normalize_url
+from config import (
+    SCRAPER_USER_AGENT, SCRAPER_CONCURRENCY, SCRAPER_PER_HOST_CONCURRENCY,
+    SCRAPER_PER_HOST_RPS, SCRAPER_TIMEOUT, SCRAPER_MAX_RESPONSE_BYTES, SCRAPER_PARSE_WORKERS,
+    SCRAPER_PARSE_QUEUE, INGEST_PAGE_BATCH, CRAWL_POLL_INTERVAL, CONTENT_DEDUPE, DEFAULT_COLLECTION,
+    SCRAPER_RESPECT_ROBOTS, SCRAPER_USE_SITEMAPS, CRAWL_MAX_PAGES, CRAWL_MAX_BYTES, CRAWL_MAX_SECONDS
+)
 import logging
-import re
+import threading
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+class HostLimiter:
+    """
+    Politeness limits for a single host: caps the number of in-flight requests
+    and spaces request starts so the host sees at most `rps` requests per second,
+    and none closer together than `min_interval` seconds (its robots.txt Crawl-delay).
+    """
+
+    def __init__(self, max_concurrency: int, rps: float, min_interval: float = 0.0):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.min_interval = max(1.0 / rps if rps > 0 else 0.0, min_interval)
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        if self.min_interval:
+            # Reserve the next start slot under the lock, then sleep outside it
+            async with self._lock:
+                now = asyncio.get_running_loop().time()
+                delay = self._next_slot - now
+                self._next_slot = max(now, self._next_slot) + self.min_interval
+            if delay > 0:
+                await asyncio.sleep(delay)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.semaphore.release()
+
+
+class CrawlProgress:
+    """
+    Thread-safe counters describing how far a crawl has got.
+    """
+    FIELDS = ("pages_fetched", "pages_unchanged", "pages_duplicate", "pages_deleted", "chunks_embedded",
+              "rows_written", "errors", "bytes_fetched", "links_disallowed", "sitemap_urls")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def add(self, field: str, amount: int = 1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+        CRAWL_EVENTS.inc(amount, event=field)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {field: getattr(self, field) for field in self.FIELDS}
+
+
+# Responses meaning the page no longer exists and its chunks should be removed
+GONE_STATUSES = (404, 410)
+
+
 class Scraper:
-    def __init__(self, base_url, max_depth=1):
+    def __init__(self, base_url, max_depth=1, concurrency=SCRAPER_CONCURRENCY,
+                 per_host_concurrency=SCRAPER_PER_HOST_CONCURRENCY, per_host_rps=SCRAPER_PER_HOST_RPS,
+                 progress=None, incremental=True, parse_workers=SCRAPER_PARSE_WORKERS, frontier=None,
+                 dedupe=CONTENT_DEDUPE, collection=DEFAULT_COLLECTION, respect_robots=SCRAPER_RESPECT_ROBOTS,
+                 use_sitemaps=SCRAPER_USE_SITEMAPS, max_pages=CRAWL_MAX_PAGES, max_bytes=CRAWL_MAX_BYTES,
+                 max_seconds=CRAWL_MAX_SECONDS):
 
-        self.base_url = base_url
+        self.base_url = normalize_url(base_url)
         self.max_depth = max_depth
+        # Pages, their chunks and fetch metadata are stored in this collection
+        self.collection = collection
+        # URLs crawled by this scraper; the crawl as a whole is tracked by the frontier
         self.visited_urls = set()
-        self.db = VectorDB()
+        # Crawls of the same base URL into the same collection share a frontier, so with a persistent
+        # backend several scrapers split the work and a restarted crawl resumes where it stopped
+        self._owns_frontier = frontier is None
+        self.frontier = frontier or get_frontier(f"{collection}:{self.base_url}")
+        self.concurrency = concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_rps = per_host_rps
+        self._host_limiters = {}
+        self.progress = progress or CrawlProgress()
+        self._pending = []  # (url, chunks) pages waiting to be embedded together
+        self._pending_meta = []  # Fetch metadata to record once the pending pages are stored
+        # URLs whose pages are queued or being stored, and those of them already crawled, which
+        # are completed in the frontier only once stored, so a crash cannot skip them on resume
+        self._unstored = set()
+        self._awaiting_store = set()
+        self._pending_lock = threading.Lock()
+        # With incremental crawling, pages whose stored fetch metadata shows
+        # they are unchanged are neither parsed nor re-embedded
+        self.incremental = incremental
+        self._known_pages = {}  # url -> stored fetch metadata
+        self._swept = False  # Whether the known pages the crawl did not reach were added to the frontier
+        # Async crawls parse, clean and chunk pages in this many worker processes (0: in a thread)
+        self.parse_workers = parse_workers
+        self._parse_pool = None
+        self._parse_slots = None
+        # Pages whose text duplicates, exactly or nearly, a page already kept are not embedded
+        self.content_index = ContentIndex() if dedupe else None
+        # robots.txt rules of the site, once read; None allows everything
+        self.respect_robots = respect_robots
+        self.robots = None
+        self.crawl_delay = 0.0
+        self._next_fetch = 0.0  # When the sync crawler may send its next request under the crawl delay
+        # Pages listed in the site's sitemaps are crawled one link away from the base URL
+        self.use_sitemaps = use_sitemaps
+        self._sitemap_entries = {}  # url -> SitemapEntry
+        # Crawl budget for this scraper, 0 for no limit. Once spent, no more URLs are leased
+        # and the frontier keeps the rest, so a persistent frontier resumes from there
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.budget_exhausted = False
+        self._pages_leased = 0
+        self._started = 0.0
 
     def scrape(self):
         """
         Begins the scraping process starting from the base URL.
         """
         logger.info("Starting scrape for base URL: %s", self.base_url)
-        self._crawl(self.base_url, 0)
+        self._started = time.monotonic()
+        self._load_known_pages()
+        self._discover()
+        try:
+            self.frontier.add(self._seeds())
+            while True:
+                limit = self._lease_limit(self.concurrency)
+                if not limit:
+                    break
+                batch = self.frontier.lease(limit)
+                self._pages_leased += len(batch)
+                if not batch:
+                    if self._pending:
+                        # Our own crawled URLs stay leased until their pages are stored
+                        self._flush_pending()
+                        continue
+                    if not self.frontier.in_progress():
+                        if self._sweep_known_pages():
+                            continue
+                        break
+                    # Other workers hold the remaining URLs and may still discover more
+                    time.sleep(CRAWL_POLL_INTERVAL)
+                    continue
+                for url, depth in batch:
+                    self._crawl(url, depth)
+            self._flush_pending()
+            if not self.budget_exhausted:
+                # Nothing is left to crawl, so the next crawl of the base URL starts from the top again
+                self.frontier.clear()
+        finally:
+            if self._owns_frontier:
+                self.frontier.close()
         logger.info("All extracted data has been stored in pgvector > scraptable > embedding.")
-        self.db.close()
 
-    def _crawl(self, url, depth):
+    async def scrape_async(self):
+        """
+        Crawls breadth-first from the base URL with a bounded number of concurrent fetches.
+
+        URLs are leased from the frontier in batches and fetched over a shared
+        keep-alive connection pool, subject to the per-host concurrency and rate
+        limits. `visited_urls`, `max_depth`, robots.txt, sitemaps and the crawl
+        budget behave exactly as in `scrape()`.
+        With `parse_workers` set, fetched bodies are parsed, cleaned and chunked
+        in a process pool; fetchers wait while SCRAPER_PARSE_QUEUE bodies are
+        already being processed.
+        """
+        logger.info("Starting async scrape for base URL: %s (workers: %d)", self.base_url, self.concurrency)
+        self._started = time.monotonic()
+        await asyncio.to_thread(self._load_known_pages)
+        await asyncio.to_thread(self._discover)
+        if self.parse_workers > 0:
+            self._parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+            self._parse_slots = asyncio.Semaphore(SCRAPER_PARSE_QUEUE or 2 * self.parse_workers)
+        try:
+            await self._crawl_frontier()
+            await asyncio.to_thread(self._flush_pending)
+            if not self.budget_exhausted:
+                # Nothing is left to crawl, so the next crawl of the base URL starts from the top again
+                await asyncio.to_thread(self.frontier.clear)
+        finally:
+            if self._parse_pool is not None:
+                self._parse_pool.shutdown(wait=False, cancel_futures=True)
+                self._parse_pool = None
+            if self._owns_frontier:
+                self.frontier.close()
+        logger.info("Async scrape finished: %d pages visited.", len(self.visited_urls))
+
+    async def _crawl_frontier(self):
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(
+            headers={"User-Agent": SCRAPER_USER_AGENT},
+            timeout=SCRAPER_TIMEOUT,
+            limits=limits,
+            follow_redirects=True,
+        ) as client:
+            await asyncio.to_thread(self.frontier.add, self._seeds())
+            active = set()
+            try:
+                while True:
+                    batch = []
+                    limit = self._lease_limit(self.concurrency - len(active)) if len(active) < self.concurrency else 0
+                    if limit:
+                        batch = await asyncio.to_thread(self.frontier.lease, limit)
+                        self._pages_leased += len(batch)
+                        for url, depth in batch:
+                            active.add(asyncio.create_task(self._crawl_async(client, url, depth)))
+                    if active:
+                        _, active = await asyncio.wait(active, return_when=asyncio.FIRST_COMPLETED)
+                    elif not batch:
+                        if self._pending:
+                            # Our own crawled URLs stay leased until their pages are stored
+                            await asyncio.to_thread(self._flush_pending)
+                            continue
+                        if self.budget_exhausted or not await asyncio.to_thread(self.frontier.in_progress):
+                            if not self.budget_exhausted and await asyncio.to_thread(self._sweep_known_pages):
+                                continue
+                            break
+                        # Other workers hold the remaining URLs and may still discover more
+                        await asyncio.sleep(CRAWL_POLL_INTERVAL)
+            finally:
+                # Unfinished URLs stay leased in the frontier and are handed out again once the lease expires
+                for task in active:
+                    task.cancel()
+                await asyncio.gather(*active, return_exceptions=True)
+
+    def _discover(self):
+        """
+        Reads the site's robots.txt and, with `use_sitemaps`, its sitemaps: those
+        robots.txt names, or /sitemap.xml. Sitemaps list pages that links may not
+        reach within `max_depth`, and their <lastmod> and <priority> feed the
+        frontier's priorities.
+        """
+        if self.respect_robots:
+            status, body = self._fetch_resource(robots_url(self.base_url))
+            self.robots = RobotsRules.from_response(status, body)
+            self.crawl_delay = self.robots.crawl_delay
+            if status is None or status >= 500:
+                logger.warning("robots.txt of %s is unreachable (status %s), so nothing may be crawled",
+                               self.base_url, status)
+            if self.crawl_delay:
+                logger.info("robots.txt asks for %.1fs between requests to %s", self.crawl_delay, self.base_url)
+        if self.use_sitemaps and self.max_depth >= 1:
+            sitemaps = (self.robots.sitemaps if self.robots is not None else []) or [default_sitemap(self.base_url)]
+            entries = read_sitemaps(sitemaps, self._fetch_resource)
+            self._sitemap_entries = {
+                url: entry for url, entry in ((normalize_url(entry.url), entry) for entry in entries.values())
+                if in_scope(url, self.base_url)
+            }
+            self.progress.add("sitemap_urls", len(self._sitemap_entries))
+            logger.info("Found %d URLs under %s in its sitemaps", len(self._sitemap_entries), self.base_url)
+
+    def _fetch_resource(self, url):
+        """
+        Fetches robots.txt or a sitemap, returning (status, body); status is None
+        if the request failed.
+        """
+        try:
+            with requests.get(url, headers={"User-Agent": SCRAPER_USER_AGENT}, timeout=SCRAPER_TIMEOUT,
+                              stream=True) as response:
+                body = self._read_body(response, url, MAX_SITEMAP_BYTES)
+            self.progress.add("bytes_fetched", len(body))
+            return response.status_code, body
+        except requests.exceptions.RequestException as e:
+            logger.warning("Could not fetch %s: %s", url, e)
+            return None, b""
+
+    def _seeds(self):
+        """
+        Returns the frontier entries a crawl starts from: the base URL and, one
+        link away from it, the in-scope pages of the sitemaps.
         """
-        Recursively crawls the given URL up to the specified depth.
+        seeds = self._frontier_entries([self.base_url], 0)
+        if self.max_depth >= 1:
+            seeds += self._frontier_entries(list(self._sitemap_entries), 1)
+        return seeds
+
+    def _frontier_entries(self, urls, depth):
+        """
+        Returns (url, depth, priority) frontier entries for the URLs robots.txt
+        allows, prioritised by `crawl_priority` from their sitemap entry and
+        when they were last crawled.
+        """
+        entries = []
+        for url in urls:
+            if self.robots is not None and not self.robots.allowed(url):
+                self.progress.add("links_disallowed")
+                continue
+            sitemap = self._sitemap_entries.get(url)
+            known = self._known_pages.get(url)
+            entries.append((url, depth, crawl_priority(
+                depth,
+                sitemap.priority if sitemap else None,
+                sitemap.lastmod if sitemap else None,
+                known.get("last_crawled") if known else None,
+            )))
+        return entries
+
+    def _sweep_known_pages(self):
+        """
+        Adds the stored pages under the base URL that the crawl did not reach to
+        the frontier, once it has run out of URLs. A page that was removed and is
+        no longer linked or in the sitemaps is thus fetched again, and its 404 or
+        410 deletes its chunks. Their links are not followed.
+
+        Runs once per crawl, and never after the crawl budget is spent, since a
+        partial crawl proves nothing about the pages it did not reach.
+
+        Returns:
+            int: The number of URLs added.
+        """
+        if self._swept or self.budget_exhausted or not self._known_pages:
+            return 0
+        self._swept = True
+        added = self.frontier.add(self._frontier_entries(list(self._known_pages), self.max_depth))
+        if added:
+            logger.info("Re-checking %d stored pages under %s that the crawl did not reach", added, self.base_url)
+        return added
+
+    def _lease_limit(self, wanted):
+        """
+        Returns how many more URLs the crawl budget lets this scraper lease, at
+        most `wanted`, or 0 once the budget is spent.
+        """
+        if not self.budget_exhausted:
+            if self.max_seconds and time.monotonic() - self._started >= self.max_seconds:
+                spent = f"{self.max_seconds:g} seconds"
+            elif self.max_bytes and self.progress.bytes_fetched >= self.max_bytes:
+                spent = f"{self.max_bytes} bytes"
+            elif self.max_pages and self._pages_leased >= self.max_pages:
+                spent = f"{self.max_pages} pages"
+            else:
+                return min(wanted, self.max_pages - self._pages_leased) if self.max_pages else wanted
+            self.budget_exhausted = True
+            logger.info("Crawl budget of %s spent for %s, leaving the remaining URLs", spent, self.base_url)
+        return 0
+
+    def _discovered(self, links, depth):
+        """
+        Returns the frontier entries to add for links found at `depth`.
+        """
+        if depth + 1 > self.max_depth:
+            logger.debug("Reached maximum depth, not following %d links", len(links))
+            return []
+        return self._frontier_entries(links, depth + 1)
+
+    def _host_limiter(self, url):
+        host = urlsplit(url).netloc
+        limiter = self._host_limiters.get(host)
+        if limiter is None:
+            limiter = HostLimiter(self.per_host_concurrency, self.per_host_rps, self.crawl_delay)
+            self._host_limiters[host] = limiter
+        return limiter
+
+    async def _crawl_async(self, client, url, depth):
+        """
+        Fetches and processes a single leased page, then completes it in the
+        frontier together with the links found on it.
 
         Args:
+            client (httpx.AsyncClient): Shared HTTP client.
             url (str): The URL to crawl.
-            depth (int): The current depth of the crawl.
+            depth (int): The depth of the URL.
         """
-        if depth > self.max_depth:
-            logger.debug("Reached maximum depth at URL: %s", url)
-            return
-        if url in self.visited_urls:
-            logger.debug("URL already visited: %s", url)
+        logger.debug("Crawling URL: %s (depth: %d)", url, depth)
+        self.visited_urls.add(url)
+        links = []
+        try:
+            async with self._host_limiter(url):
+                with stage("fetch"):
+                    async with client.stream("GET", url, headers=self._conditional_headers(url)) as response:
+                        if response.status_code not in GONE_STATUSES and response.status_code != 304:
+                            response.raise_for_status()
+                        body = b""
+                        if response.status_code == 200 and self._is_html(response.headers):
+                            body = await self._read_body_async(response, url)
+            self.progress.add("pages_fetched")
+            self.progress.add("bytes_fetched", len(body))
+            logger.debug("Fetched URL: %s (status: %d, %d bytes)", url, response.status_code, len(body))
+
+            # Parsing and storage are blocking, keep them off the event loop
+            body_hash = content_hash(body)
+            links = await asyncio.to_thread(self._reuse_stored, url, response.status_code, body, body_hash)
+            if links is None:
+                # Relative links resolve against the URL the page was finally served from
+                page = await self._parse_async(body, str(response.url))
+                links = await asyncio.to_thread(self._store_page, url, depth, response.headers, body_hash, page)
+
+        except httpx.HTTPError as e:
+            self.progress.add("errors")
+            logger.error("HTTP request failed for URL %s: %s", url, e)
+        except Exception as e:
+            self.progress.add("errors")
+            logger.error("Unexpected error during scraping for URL %s: %s", url, e)
+        await asyncio.to_thread(self._complete, url, self._discovered(links, depth))
+
+    def _load_known_pages(self):
+        """
+        Loads the stored fetch metadata of every page under the base URL.
+        """
+        if not self.incremental:
             return
+        with VectorDB() as db:
+            self._known_pages = db.get_pages(self.base_url, self.collection)
+        logger.info("Loaded fetch metadata for %d known pages under %s", len(self._known_pages), self.base_url)
+        if self.content_index is not None:
+            for url, known in self._known_pages.items():
+                if known.get("text_hash") and known.get("simhash") is not None and not known.get("duplicate_of"):
+                    self.content_index.find_or_add(url, known["text_hash"], from_signed(known["simhash"]))
+
+    def _conditional_headers(self, url):
+        """
+        Builds If-None-Match / If-Modified-Since headers from the page's stored metadata.
+        """
+        known = self._known_pages.get(url)
+        headers = {}
+        if known:
+            if known.get("etag"):
+                headers["If-None-Match"] = known["etag"]
+            if known.get("last_modified"):
+                headers["If-Modified-Since"] = known["last_modified"]
+        return headers
+
+    @staticmethod
+    def _is_html(headers):
+        content_type = headers.get("content-type", "text/html").lower()
+        return "html" in content_type or "xml" in content_type
+
+    @staticmethod
+    def _read_body(response, url, limit=SCRAPER_MAX_RESPONSE_BYTES):
+        """
+        Reads a streamed requests response, stopping at `limit` bytes.
+        """
+        body = bytearray()
+        for chunk in response.iter_content(chunk_size=65536):
+            body += chunk
+            if len(body) >= limit:
+                logger.warning("Response from %s exceeds %d bytes, truncating", url, limit)
+                break
+        return bytes(body[:limit])
+
+    @staticmethod
+    async def _read_body_async(response, url):
+        """
+        Reads a streamed httpx response, stopping at SCRAPER_MAX_RESPONSE_BYTES.
+        """
+        body = bytearray()
+        async for chunk in response.aiter_bytes():
+            body += chunk
+            if len(body) >= SCRAPER_MAX_RESPONSE_BYTES:
+                logger.warning("Response from %s exceeds %d bytes, truncating", url, SCRAPER_MAX_RESPONSE_BYTES)
+                break
+        return bytes(body[:SCRAPER_MAX_RESPONSE_BYTES])
+
+    def _process_page(self, url, depth, status_code, headers, body, final_url=None):
+        """
+        Handles a fetched page and returns the links to follow from it.
+
+        Relative links resolve against `final_url`, where the page was served
+        from after redirects, which defaults to `url`.
+        """
+        body_hash = content_hash(body)
+        links = self._reuse_stored(url, status_code, body, body_hash)
+        if links is None:
+            links = self._store_page(url, depth, headers, body_hash, process_page(body, final_url or url))
+        return links
+
+    def _reuse_stored(self, url, status_code, body, body_hash):
+        """
+        Decides whether a fetched page needs parsing.
+
+        Gone pages (404/410) have their stored chunks deleted. Pages answered with
+        304 Not Modified, or whose body hashes to the stored content hash, are
+        neither parsed nor re-embedded; their stored links are followed instead.
+
+        Returns:
+            list: The links to follow, or None if the page must be parsed and stored.
+        """
+        known = self._known_pages.get(url)
+        if status_code in GONE_STATUSES:
+            if known:
+                with VectorDB() as db:
+                    db.delete_pages([url], self.collection)
+                self.progress.add("pages_deleted")
+                logger.info("Page is gone, deleted its stored chunks: %s", url)
+            return []
+
+        if known and (status_code == 304 or known.get("content_hash") == body_hash):
+            logger.debug("Page unchanged, skipping parse and embedding: %s", url)
+            self.progress.add("pages_unchanged")
+            with self._pending_lock:
+                self._pending_meta.append(dict(known, url=url))
+            return known.get("links") or []
+        if not body:
+            # Not an HTML page
+            return []
+        return None
+
+    async def _parse_async(self, body, url):
+        """
+        Runs process_page in the process pool, or in a thread when there is none.
+        """
+        if self._parse_pool is None:
+            return await asyncio.to_thread(process_page, body, url)
+        async with self._parse_slots:
+            return await asyncio.get_running_loop().run_in_executor(self._parse_pool, process_page, body, url)
+
+    def _store_page(self, url, depth, headers, body_hash, page):
+        """
+        Queues a parsed page for embedding and returns its in-scope links.
+
+        A page whose rel=canonical names another in-scope URL is not embedded;
+        the canonical URL is crawled instead. Neither is a page whose text
+        duplicates, exactly or nearly, a page already kept. Duplicates that
+        were stored by an earlier crawl have their chunks removed.
+        """
+        observe_stage("parse", page.parse_seconds, 1)
+        observe_stage("clean", page.clean_seconds, len(page.chunks))
+        links = self._extract_links(page.links, url)
+        meta = {
+            "url": url,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "content_hash": body_hash,
+            "links": links,
+            "text_hash": page.text_hash,
+            "simhash": to_signed(page.simhash),
+            "duplicate_of": None,
+        }
+        canonical = normalize_url(page.canonical) if page.canonical else url
+        if canonical != url and in_scope(canonical, self.base_url):
+            meta["duplicate_of"] = canonical
+            self.frontier.add(self._frontier_entries([canonical], depth))
+        elif page.chunks and self.content_index is not None:
+            meta["duplicate_of"] = self.content_index.find_or_add(url, page.text_hash, page.simhash)
+
+        if meta["duplicate_of"] is None:
+            self._store_to_db(page.chunks, url, meta)
+            return links
+
+        logger.debug("Page duplicates %s, skipping embedding: %s", meta["duplicate_of"], url)
+        self.progress.add("pages_duplicate")
+        known = self._known_pages.get(url)
+        if known and not known.get("duplicate_of"):
+            with VectorDB() as db:
+                db.delete_pages([url], self.collection)
+        with self._pending_lock:
+            self._pending_meta.append(meta)
+        return links
+
+    def _crawl(self, url, depth):
+        """
+        Crawls a single leased URL and completes it in the frontier together
+        with the links found on it.
 
-        logger.info("Crawling URL: %s (depth: %d)", url, depth)
+        Args:
+            url (str): The URL to crawl.
+            depth (int): The depth of the URL.
+        """
+        logger.debug("Crawling URL: %s (depth: %d)", url, depth)
         self.visited_urls.add(url)
+        links = []
 
         try:
-            # Step 1: Perform the HTTP request
+            # Step 1: Perform the HTTP request, no sooner than robots.txt's Crawl-delay allows
             logger.debug("Sending GET request to URL: %s", url)
-            response = requests.get(url)
-            response.raise_for_status()
-            logger.info("Successfully fetched content from URL: %s", url)
-
-            # Step 2: Parse the HTML content
-            logger.debug("Parsing HTML content from URL: %s", url)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            content = self._clean_text(soup.get_text())
-            logger.debug("Cleaned content (first 100 characters): %s", content[:100])
-
-            # Step 3: Store the scraped content with embeddings in the database
-            logger.info("Storing scraped content in database for URL: %s", url)
-            self._store_to_db(content, url)
-
-            # Step 4: Find and crawl links on the page
-            logger.debug("Extracting links from URL: %s", url)
-            links = self._extract_links(soup, url)
-            for link in links:
-                self._crawl(link, depth + 1)
+            self._wait_for_crawl_delay()
+            headers = {"User-Agent": SCRAPER_USER_AGENT, **self._conditional_headers(url)}
+            with stage("fetch"), requests.get(url, headers=headers, timeout=SCRAPER_TIMEOUT, stream=True) as response:
+                if response.status_code not in GONE_STATUSES:
+                    response.raise_for_status()
+                body = b""
+                if response.status_code == 200 and self._is_html(response.headers):
+                    body = self._read_body(response, url)
+            self.progress.add("pages_fetched")
+            self.progress.add("bytes_fetched", len(body))
+            logger.debug("Fetched URL: %s (status: %d, %d bytes)", url, response.status_code, len(body))
+
+            # Step 2: Parse the HTML content and store it with embeddings, unless unchanged
+            links = self._process_page(url, depth, response.status_code, response.headers, body, response.url)
 
         except requests.exceptions.RequestException as e:
+            self.progress.add("errors")
             logger.error("HTTP request failed for URL %s: %s", url, e)
         except Exception as e:
+            self.progress.add("errors")
             logger.error("Unexpected error during scraping for URL %s: %s", url, e)
 
-    def _extract_links(self, soup, base_url):
+        # Step 3: Queue the links on the page for crawling
+        self._complete(url, self._discovered(links, depth))
+
+    def _complete(self, url, discovered):
+        """
+        Adds the links found on a crawled URL to the frontier and marks the URL
+        done, or, if its page is still waiting to be stored, marks it done once
+        `_flush_pending` has stored it.
         """
-        Extracts and normalizes links from the HTML content.
+        with self._pending_lock:
+            waiting = url in self._unstored
+            if waiting:
+                self._awaiting_store.add(url)
+        if waiting:
+            self.frontier.add(discovered)
+        else:
+            self.frontier.complete(url, discovered)
+
+    def _wait_for_crawl_delay(self):
+        if self.crawl_delay:
+            delay = self._next_fetch - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_fetch = time.monotonic() + self.crawl_delay
+
+    def _extract_links(self, links, base_url):
+        """
+        Keeps the links that fall within the crawl's base URL.
 
         Args:
-            soup (BeautifulSoup): The parsed HTML content.
-            base_url (str): The base URL to resolve relative links.
+            links (list): Absolute URLs found on the page.
+            base_url (str): The URL of the page the links came from.
 
         Returns:
-            list: A list of normalized URLs.
+            list: A list of in-scope URLs.
         """
-        links = []
-        for a_tag in soup.find_all('a', href=True):
-            href = a_tag['href']
-            # Normalize the link to an absolute URL
-            full_url = urljoin(base_url, href)
-            # Only include links within the same domain
-            if full_url.startswith(self.base_url):
-                links.append(full_url)
+        # Only include links within the same domain
+        links = [link for link in map(normalize_url, links) if in_scope(link, self.base_url)]
         logger.debug("Found %d links on the page: %s", len(links), base_url)
         return links
 
-    def _clean_text(self, text):
+    def _store_to_db(self, chunks, url, meta=None):
         """
-        Cleans the extracted text by removing extra whitespace, newlines, and non-alphanumeric characters.
+        Queues the page's chunks for embedding; pages are embedded and stored in batches.
 
         Args:
-            text (str): The raw text to clean.
-
-        Returns:
-            str: The cleaned text.
+            chunks (list): The cleaned text chunks of the page.
+            url (str): The URL of the content.
+            meta (dict): Fetch metadata recorded once the content is stored.
         """
-        logger.debug("Cleaning extracted text...")
-        text = re.sub(r'\s+', ' ', text)  # Replace multiple spaces/newlines with a single space
-        text = re.sub(r'[^\x00-\x7F]+', '', text)  # Remove non-ASCII characters
-        text = text.strip()
-        logger.debug("Cleaned text (first 100 characters): %s", text[:100])
-        return text
+        with self._pending_lock:
+            self._pending.append((url, chunks))
+            self._unstored.add(url)
+            if meta:
+                self._pending_meta.append(meta)
+            full = len(self._pending) >= INGEST_PAGE_BATCH
+        if full:
+            self._flush_pending()
 
-    def _store_to_db(self, content, url):
+    def _flush_pending(self):
         """
-        Generates embeddings for the content and stores them in the database.
-
-        Args:
-            content (str): The cleaned text content.
-            url (str): The URL of the content.
+        Generates embeddings for all queued pages and stores them in the database,
+        then records the fetch metadata of the stored and unchanged pages and
+        marks the stored pages' URLs done in the frontier.
         """
-        try:
-            # Call the ingestion pipeline to generate embeddings and store them
-            ingest_and_store(content, url)
-            logger.info("Content for URL %s successfully stored in the database.", url)
-        except Exception as e:
-            logger.error("Failed to store content for URL %s: %s", url, e)
+        with self._pending_lock:
+            documents, self._pending = self._pending, []
+            metas, self._pending_meta = self._pending_meta, []
+        if documents:
+            try:
+                # Call the ingestion pipeline to generate embeddings and store them
+                stats = ingest_chunks(documents, self.collection)
+                self.progress.add("chunks_embedded", stats["chunks_embedded"])
+                self.progress.add("rows_written", stats["rows_written"])
+                logger.info("Content for %d URLs successfully stored in the database.", len(documents))
+            except Exception as e:
+                self.progress.add("errors", len(documents))
+                logger.error("Failed to store content for URLs %s: %s", [url for url, _ in documents], e)
+                # Leave no metadata for these pages, so the next crawl retries them
+                failed = {url for url, _ in documents}
+                metas = [meta for meta in metas if meta["url"] not in failed]
+                if self.content_index is not None:
+                    for url in failed:
+                        self.content_index.remove(url)
+        if metas and self.incremental:
+            try:
+                with VectorDB() as db:
+                    db.upsert_pages(metas, self.collection)
+            except Exception as e:
+                logger.error("Failed to record fetch metadata for %d pages: %s", len(metas), e)
+        if documents:
+            with self._pending_lock:
+                stored = {url for url, _ in documents}
+                self._unstored -= stored
+                done = self._awaiting_store & stored
+                self._awaiting_store -= done
+            # Pages that failed to store are completed too; without fetch metadata the next crawl retries them
+            for url in done:
+                self.frontier.complete(url)
 
 
 if __name__ == "__main__":
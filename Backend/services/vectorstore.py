@@ -1,117 +1,725 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import io
+import numpy as np
+import re
+import struct
+import threading
+import weakref
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool, PoolError
 from psycopg2 import errors
-from config import PGVECTOR_HOST, PGVECTOR_PORT, PGVECTOR_DB, PGVECTOR_USER, PGVECTOR_PASSWORD
+from config import (
+    PGVECTOR_HOST, PGVECTOR_PORT, PGVECTOR_DB, PGVECTOR_USER, PGVECTOR_PASSWORD,
+    PGVECTOR_POOL_MIN, PGVECTOR_POOL_MAX, PGVECTOR_POOL_TIMEOUT, INSERT_BATCH_SIZE,
+    VECTOR_INDEX_TYPE, HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH, IVFFLAT_LISTS, IVFFLAT_PROBES,
+    INDEX_MAINTENANCE_WORK_MEM, EMBEDDING_DIM, TEXT_SEARCH_CONFIG, HYBRID_CANDIDATES, RRF_K, DEFAULT_COLLECTION,
+    VECTOR_QUANTIZATION, QUANTIZED_CANDIDATES
+)
+from typing import Dict, List, Optional, Tuple
+from utils.text_utils import content_hash
+from utils.url_utils import scope_prefix
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-class VectorDB:
-    def __init__(self):
 
+class BlockingConnectionPool(ThreadedConnectionPool):
+    """
+    A ThreadedConnectionPool that waits for a free connection instead of
+    raising PoolError as soon as all `maxconn` connections are checked out.
+    """
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        self._slots = threading.BoundedSemaphore(maxconn)
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None, timeout=PGVECTOR_POOL_TIMEOUT):
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolError(f"Timed out after {timeout}s waiting for a database connection")
+        try:
+            conn = super().getconn(key)
+            if conn.closed:
+                # The server dropped this idle connection, replace it
+                super().putconn(conn, key, close=True)
+                conn = super().getconn(key)
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, key=None, close=False):
         try:
-            logger.debug("Connecting to PGVector database...")
-            self.conn = psycopg2.connect(
+            super().putconn(conn, key, close=close or bool(conn.closed))
+        finally:
+            self._slots.release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def get_pool() -> BlockingConnectionPool:
+    """
+    Returns the process-wide connection pool, creating it on first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            logger.debug("Creating PGVector connection pool (%d-%d connections)...",
+                         PGVECTOR_POOL_MIN, PGVECTOR_POOL_MAX)
+            _pool = BlockingConnectionPool(
+                PGVECTOR_POOL_MIN,
+                PGVECTOR_POOL_MAX,
                 host=PGVECTOR_HOST,
                 port=PGVECTOR_PORT,
                 database=PGVECTOR_DB,
                 user=PGVECTOR_USER,
                 password=PGVECTOR_PASSWORD
             )
-            self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
             logger.info("Connected to PGVector database successfully!")
-            self._ensure_table_exists()
+        return _pool
+
+
+def init_db():
+    """
+    Creates the connection pool and bootstraps the schema. Runs the DDL only
+    once per process; later calls return immediately.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    pool = get_pool()
+    with _schema_lock:
+        if _schema_ready:
+            return
+        conn = pool.getconn()
+        try:
+            _ensure_table_exists(conn)
+            _schema_ready = True
+        finally:
+            pool.putconn(conn)
+
+
+def close_pool():
+    """
+    Closes every pooled connection. The pool is recreated on next use.
+    """
+    global _pool, _schema_ready
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _schema_ready = False
+            logger.info("Database connection pool closed.")
+
+
+def _ensure_table_exists(conn):
+    """
+    Ensures the 'scraptable' table, list-partitioned by collection, and its
+    indexes exist, along with the 'scraptable_pages' fetch metadata and
+    'scraptable_frontier' tables.
+
+    Each row holds one chunk of a page, so a URL may appear several times per
+    collection. Each collection's chunks live in their own partition with its
+    own indexes (see `VectorDB.ensure_collection`). A table created before
+    collections existed becomes the partition of DEFAULT_COLLECTION.
+    """
+    validate_collection(DEFAULT_COLLECTION)
+    _check_quantization_support(conn)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('scraptable');")
+        row = cursor.fetchone()
+        if row is not None:
+            # An existing table keeps the dimension it was created with
+            cursor.execute("""
+            SELECT atttypmod FROM pg_attribute
+            WHERE attrelid = 'scraptable'::regclass AND attname = 'embedding';
+            """)
+            stored_dim = cursor.fetchone()[0]
+            if stored_dim != EMBEDDING_DIM:
+                raise RuntimeError(f"'scraptable.embedding' holds {stored_dim}-dimensional vectors but EMBEDDING_DIM "
+                                   f"is {EMBEDDING_DIM}; drop the table (python manage.py reset does not) or "
+                                   f"restore the previous EMBEDDING_DIM")
+        if row is not None and row[0] == "r":
+            _partition_legacy_table(cursor)
+
+        logger.debug("Ensuring 'scraptable' table exists...")
+        # The text search configuration is baked into the generated column; changing
+        # TEXT_SEARCH_CONFIG later requires dropping content_tsv so it is regenerated
+        create_table_query = f"""
+        CREATE SEQUENCE IF NOT EXISTS scraptable_id_seq;
+        CREATE TABLE IF NOT EXISTS scraptable (
+            id INTEGER NOT NULL DEFAULT nextval('scraptable_id_seq'),
+            collection TEXT NOT NULL,
+            url TEXT NOT NULL,
+            chunk_index INTEGER NOT NULL DEFAULT 0,
+            embedding VECTOR({EMBEDDING_DIM}) NOT NULL,
+            content TEXT NOT NULL,
+            chunk_hash TEXT,
+            -- Lets in-process indexes pick up changed rows incrementally
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            content_tsv tsvector
+                GENERATED ALWAYS AS (to_tsvector('{TEXT_SEARCH_CONFIG}'::regconfig, content)) STORED,
+            PRIMARY KEY (id, collection),
+            CONSTRAINT unique_collection_url_chunk UNIQUE (collection, url, chunk_index)
+        ) PARTITION BY LIST (collection);
+        ALTER SEQUENCE scraptable_id_seq OWNED BY scraptable.id;
+
+        -- Per-URL fetch metadata for incremental re-crawls
+        CREATE TABLE IF NOT EXISTS scraptable_pages (
+            collection TEXT NOT NULL DEFAULT '{DEFAULT_COLLECTION}',
+            url TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            links TEXT[],
+            last_crawled TIMESTAMPTZ NOT NULL DEFAULT now(),
+            CONSTRAINT scraptable_pages_collection_pkey PRIMARY KEY (collection, url)
+        );
+        ALTER TABLE scraptable_pages ADD COLUMN IF NOT EXISTS text_hash TEXT;
+        ALTER TABLE scraptable_pages ADD COLUMN IF NOT EXISTS simhash BIGINT;
+        ALTER TABLE scraptable_pages ADD COLUMN IF NOT EXISTS duplicate_of TEXT;
+        ALTER TABLE scraptable_pages ADD COLUMN IF NOT EXISTS collection TEXT NOT NULL DEFAULT '{DEFAULT_COLLECTION}';
+
+        -- Shared crawl frontier, so several crawler nodes can work through one crawl
+        CREATE TABLE IF NOT EXISTS scraptable_frontier (
+            crawl_id TEXT NOT NULL,
+            url TEXT NOT NULL,
+            depth INTEGER NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            leased_until TIMESTAMPTZ,
+            priority REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (crawl_id, url)
+        );
+        ALTER TABLE scraptable_frontier ADD COLUMN IF NOT EXISTS priority REAL NOT NULL DEFAULT 0;
+        DROP INDEX IF EXISTS scraptable_frontier_open;
+        CREATE INDEX IF NOT EXISTS scraptable_frontier_next
+            ON scraptable_frontier (crawl_id, priority DESC, depth) WHERE state <> 'done';
+        """
+        cursor.execute(create_table_query)
+        if row is not None and row[0] == "r":
+            logger.info("Attaching the existing rows as collection '%s'...", DEFAULT_COLLECTION)
+            cursor.execute(f"ALTER TABLE scraptable ATTACH PARTITION {_partition_name(DEFAULT_COLLECTION)} "
+                           f"FOR VALUES IN (%s);", (DEFAULT_COLLECTION,))
+        conn.commit()
+        logger.info("'scraptable' table ensured to exist.")
+
+        logger.debug("Ensuring 'scraptable_pages' is keyed by (collection, url)...")
+        cursor.execute("SELECT conname FROM pg_constraint WHERE conname = 'scraptable_pages_collection_pkey';")
+        if not cursor.fetchone():
+            cursor.execute("""
+            ALTER TABLE scraptable_pages DROP CONSTRAINT IF EXISTS scraptable_pages_pkey;
+            ALTER TABLE scraptable_pages ADD CONSTRAINT scraptable_pages_collection_pkey PRIMARY KEY (collection, url);
+            """)
+            conn.commit()
+            logger.info("'scraptable_pages' primary key changed to (collection, url).")
+
+        # Indexes on the parent table are created on every partition, existing and future
+        logger.debug("Ensuring updated_at and full-text search indexes exist...")
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS scraptable_updated_at_idx ON scraptable (updated_at);
+        CREATE INDEX IF NOT EXISTS scraptable_content_tsv_idx ON scraptable USING GIN (content_tsv);
+        """)
+        conn.commit()
+        logger.info("Full-text search index on 'content' ensured to exist.")
+
+        if VECTOR_INDEX_TYPE != "none":
+            logger.debug("Ensuring %s index on 'embedding' exists...", VECTOR_INDEX_TYPE)
+            cursor.execute(_vector_index_ddl(_vector_index_name(), _ivfflat_lists(cursor)))
+            conn.commit()
+            logger.info("%s index on 'embedding' ensured to exist.", VECTOR_INDEX_TYPE)
+    except Exception as e:
+        logger.error("Failed to ensure 'scraptable' table or constraints exist: %s", e)
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _partition_legacy_table(cursor):
+    """
+    Prepares a 'scraptable' created before collections to become the partition
+    of DEFAULT_COLLECTION: brings its columns up to date, adds the collection
+    column and renames it and its indexes out of the parent table's way. Rows
+    and ids are kept; the caller attaches it in the same transaction.
+    """
+    partition = _partition_name(DEFAULT_COLLECTION)
+    logger.info("Moving the existing 'scraptable' to partition %s...", partition)
+    renamed_indexes = "\n".join(
+        f"ALTER INDEX IF EXISTS {index} RENAME TO {partition}{index[len('scraptable'):]};"
+        for index in ("scraptable_updated_at_idx", "scraptable_content_tsv_idx",
+                      "scraptable_embedding_hnsw_idx", "scraptable_embedding_ivfflat_idx")
+    )
+    cursor.execute(f"""
+    ALTER TABLE scraptable ADD COLUMN IF NOT EXISTS chunk_index INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE scraptable ADD COLUMN IF NOT EXISTS chunk_hash TEXT;
+    ALTER TABLE scraptable ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+    ALTER TABLE scraptable ADD COLUMN IF NOT EXISTS content_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('{TEXT_SEARCH_CONFIG}'::regconfig, content)) STORED;
+    ALTER TABLE scraptable ADD COLUMN IF NOT EXISTS collection TEXT NOT NULL DEFAULT '{DEFAULT_COLLECTION}';
+    -- Replaced by the parent's UNIQUE (collection, url, chunk_index)
+    ALTER TABLE scraptable DROP CONSTRAINT IF EXISTS unique_url;
+    ALTER TABLE scraptable DROP CONSTRAINT IF EXISTS unique_url_chunk;
+    -- A partition may not keep a primary key of its own; (id, collection) matches the
+    -- parent's, so ATTACH adopts it instead of building another index
+    ALTER TABLE scraptable DROP CONSTRAINT IF EXISTS scraptable_pkey;
+    ALTER TABLE scraptable ADD CONSTRAINT {partition}_pkey PRIMARY KEY (id, collection);
+    ALTER TABLE scraptable RENAME TO {partition};
+    {renamed_indexes}
+    -- The id sequence outlives this partition, it numbers every collection's rows
+    ALTER SEQUENCE scraptable_id_seq OWNED BY NONE;
+    """)
+
+
+# Collection names become part of partition table names, so they are kept to safe identifiers
+_COLLECTION_NAME = re.compile(r"^[a-z0-9_]{1,32}$")
+
+
+def validate_collection(name: str) -> str:
+    """
+    Returns `name` if it is a valid collection name: 1 to 32 lowercase
+    letters, digits or underscores.
+
+    Raises:
+        ValueError: If it is not.
+    """
+    if not isinstance(name, str) or not _COLLECTION_NAME.match(name):
+        raise ValueError(f"Invalid collection name {name!r}: use 1-32 lowercase letters, digits or underscores")
+    return name
+
+
+def _partition_name(collection: str) -> str:
+    return f"scraptable_c_{validate_collection(collection)}"
+
+
+# Searches read the query vector from this one-row temp table, filled by binary COPY
+_QUERY_VECTOR = "(SELECT embedding FROM pg_temp.scraptable_query)"
+# Connections whose session already holds the table
+_query_vector_sessions = weakref.WeakSet()
+
+# How the ANN index stores each vector, as (short name, indexed expression, operator class,
+# distance the index orders by). Quantized indexes are 2x (halfvec) or 32x (binary) smaller
+# than full vectors; their approximate order is re-ranked by exact distance.
+_QUANTIZATIONS = {
+    "none": ("", "embedding", "vector_cosine_ops", f"embedding <=> {_QUERY_VECTOR}"),
+    "halfvec": (
+        "hv", f"(embedding::halfvec({EMBEDDING_DIM}))", "halfvec_cosine_ops",
+        f"embedding::halfvec({EMBEDDING_DIM}) <=> {_QUERY_VECTOR}::halfvec({EMBEDDING_DIM})",
+    ),
+    "binary": (
+        "bq", f"(binary_quantize(embedding)::bit({EMBEDDING_DIM}))", "bit_hamming_ops",
+        f"binary_quantize(embedding)::bit({EMBEDDING_DIM}) <~> binary_quantize({_QUERY_VECTOR})",
+    ),
+}
+
+
+# First pgvector release with halfvec, binary_quantize and bit_hamming_ops
+MIN_QUANTIZATION_PGVECTOR = (0, 7, 0)
+
+
+def _quantization() -> tuple:
+    if VECTOR_QUANTIZATION not in _QUANTIZATIONS:
+        raise ValueError(f"Unsupported VECTOR_QUANTIZATION: {VECTOR_QUANTIZATION}")
+    return _QUANTIZATIONS[VECTOR_QUANTIZATION]
+
+
+def _check_quantization_support(conn):
+    """
+    Checks that the database's pgvector can build and search the configured
+    quantized index.
+
+    Raises:
+        ValueError: If VECTOR_QUANTIZATION is set and pgvector is missing or
+            older than MIN_QUANTIZATION_PGVECTOR.
+    """
+    _quantization()
+    if VECTOR_QUANTIZATION == "none":
+        return
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector';")
+        row = cursor.fetchone()
+    version = row[0] if row else None
+    required = ".".join(map(str, MIN_QUANTIZATION_PGVECTOR))
+    if version is None or tuple(int(part) for part in re.findall(r"\d+", version)[:3]) < MIN_QUANTIZATION_PGVECTOR:
+        raise ValueError(f"VECTOR_QUANTIZATION={VECTOR_QUANTIZATION} needs pgvector {required} or later, "
+                         f"the database has {version or 'no pgvector'}; upgrade the extension "
+                         f"(ALTER EXTENSION vector UPDATE) or set VECTOR_QUANTIZATION=none")
+
+
+def _vector_index_name() -> str:
+    if VECTOR_QUANTIZATION == "none":
+        return f"scraptable_embedding_{VECTOR_INDEX_TYPE}_idx"
+    return f"scraptable_embedding_{VECTOR_INDEX_TYPE}_{VECTOR_QUANTIZATION}_idx"
+
+
+def _partition_index_name(partition: str) -> str:
+    # Kept short so the longest partition name still fits Postgres' 63-character limit
+    suffix = _quantization()[0]
+    return f"{partition}_{VECTOR_INDEX_TYPE}{'_' + suffix if suffix else ''}_idx"
+
+
+def _index_distance() -> str:
+    """
+    The distance expression the configured index orders by, for the first
+    pass of a vector search.
+    """
+    return _quantization()[3]
+
+
+def _shortlist_size(limit: int) -> int:
+    """
+    Rows taken from the index before re-ranking by exact distance: with a
+    quantized index, at least QUANTIZED_CANDIDATES, since its order is only
+    approximately the exact one.
+    """
+    return limit if VECTOR_QUANTIZATION == "none" else max(QUANTIZED_CANDIDATES, limit)
+
+
+def _encode_vector(embedding) -> bytes:
+    """
+    Encodes a vector in pgvector's binary format, as read by vector_recv:
+    int16 dimensions, int16 reserved, then the values as big-endian float4.
+    """
+    return struct.pack(f"!hh{len(embedding)}f", len(embedding), 0, *embedding)
+
+
+def _encode_query_vector(embedding) -> io.BytesIO:
+    """
+    Encodes a query vector as the single row of a binary COPY.
+    """
+    vector = _encode_vector(embedding)
+    return io.BytesIO(b"PGCOPY\n\xff\r\n\x00" + struct.pack("!iih", 0, 0, 1) + struct.pack("!i", len(vector))
+                      + vector + struct.pack("!h", -1))
+
+
+def _decode_vector(data) -> np.ndarray:
+    """
+    Decodes pgvector's binary format, as sent by vector_send: int16 dimensions,
+    int16 unused, then the values as big-endian float4.
+    """
+    return np.frombuffer(data, dtype=">f4", offset=4).astype(np.float32)
+
+
+def _vector_index_ddl(name: str, lists: int, concurrently: bool = False, table: str = "scraptable") -> str:
+    """
+    Builds the CREATE INDEX statement for the configured ANN index type and
+    quantization. Cosine opclasses match the `<=>` operator used by
+    query_similar; binary quantization indexes the sign bits with Hamming distance.
+
+    On the partitioned 'scraptable' this creates one index per partition;
+    `table` may name a single partition, or be "ONLY scraptable" for the
+    parent's index alone.
+    """
+    if VECTOR_INDEX_TYPE == "hnsw":
+        method, options = "hnsw", f"m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}"
+    elif VECTOR_INDEX_TYPE == "ivfflat":
+        method, options = "ivfflat", f"lists = {lists}"
+    else:
+        raise ValueError(f"Unsupported VECTOR_INDEX_TYPE: {VECTOR_INDEX_TYPE}")
+    _, expression, opclass, _ = _quantization()
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name} "
+        f"ON {table} USING {method} ({expression} {opclass}) WITH ({options});"
+    )
+
+
+def _ivfflat_lists(cursor, table: str = "scraptable") -> int:
+    """
+    Number of IVFFlat lists for `table`: IVFFLAT_LISTS if set, otherwise
+    pgvector's guidance of rows/1000 up to 1M rows and sqrt(rows) beyond.
+    """
+    if IVFFLAT_LISTS > 0 or VECTOR_INDEX_TYPE != "ivfflat":
+        return IVFFLAT_LISTS
+    cursor.execute(f"SELECT count(*) AS row_count FROM {table};")
+    row = cursor.fetchone()
+    rows = row["row_count"] if isinstance(row, dict) else row[0]
+    lists = rows // 1000 if rows <= 1_000_000 else int(rows ** 0.5)
+    return max(1, lists)
+
+
+# Characters of content returned as a result snippet
+SNIPPET_LENGTH = 200
+
+
+def _result_columns(with_content: bool, prefix: str = "") -> str:
+    """
+    Select list for retrieval results: id, url and a snippet cut server-side,
+    plus the full content only when the caller needs it. Embeddings are never
+    sent back.
+    """
+    columns = (
+        f"{prefix}id, {prefix}url, "
+        f"CASE WHEN length({prefix}content) > %(snippet_length)s "
+        f"THEN left({prefix}content, %(snippet_length)s) || '...' ELSE {prefix}content END AS snippet"
+    )
+    if with_content:
+        columns += f", {prefix}content"
+    return columns
+
+
+def _collection_filter(collection: Optional[str], prefix: str = "") -> str:
+    """
+    WHERE clause restricting a query to one collection, which lets the planner
+    prune every other partition. Empty for None, which searches them all.
+    """
+    return f"WHERE {prefix}collection = %(collection)s" if collection is not None else ""
+
+
+def _encode_copy_binary(records) -> io.BytesIO:
+    """
+    Encodes (url, chunk_index, content, embedding) records, plus the content
+    hash, in PostgreSQL's binary COPY format. Vectors use pgvector's wire
+    format (see `_encode_vector`).
+    """
+    buf = io.BytesIO()
+    buf.write(b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0))
+    for url, chunk_index, content, embedding in records:
+        url_bytes = url.encode("utf-8")
+        # PostgreSQL text cannot contain NUL characters
+        content_bytes = content.replace("\x00", "").encode("utf-8")
+        hash_bytes = content_hash(content).encode("ascii")
+        vector = _encode_vector(embedding)
+        buf.write(struct.pack("!h", 5))
+        buf.write(struct.pack("!i", len(url_bytes)) + url_bytes)
+        buf.write(struct.pack("!ii", 4, chunk_index))
+        buf.write(struct.pack("!i", len(vector)) + vector)
+        buf.write(struct.pack("!i", len(content_bytes)) + content_bytes)
+        buf.write(struct.pack("!i", len(hash_bytes)) + hash_bytes)
+    buf.write(struct.pack("!h", -1))
+    buf.seek(0)
+    return buf
+
+
+class VectorDB:
+    def __init__(self):
+
+        try:
+            logger.debug("Checking out a PGVector connection from the pool...")
+            init_db()
+            self._pool = get_pool()
+            self.conn = self._pool.getconn()
+            self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
         except Exception as e:
             logger.error("Failed to connect to the database: %s", e)
             raise
 
-    def _ensure_table_exists(self):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def insert_vector(self, url: str, embedding: list, content: str, chunk_index: int = 0,
+                      collection: str = DEFAULT_COLLECTION):
         """
-        Ensures the 'scraptable' table and the unique constraint on the 'url' column exist.
+        Inserts a new record into the 'scraptable' table if the URL's chunk doesn't already exist.
+
+        Returns:
+            int: The number of rows inserted (0 if the chunk was already stored).
         """
+        logger.debug("Inserting data - URL: %s, chunk: %d", url, chunk_index)
+        return self.insert_vectors([(url, chunk_index, content, embedding)], collection=collection)
+
+    def insert_vectors(self, records: List[Tuple[str, int, str, list]], upsert: bool = False,
+                       chunk_counts: Optional[Dict[str, int]] = None, batch_size: int = INSERT_BATCH_SIZE,
+                       collection: str = DEFAULT_COLLECTION):
+        """
+        Bulk-writes (url, chunk_index, content, embedding) records into a collection.
+
+        Each batch is streamed with a binary COPY into a temporary staging table
+        and merged into 'scraptable' in a single transaction, so embeddings are
+        never formatted as text and there is one commit per batch. Every row
+        stores the hash of its content so unchanged chunks can be skipped later.
+        The collection's partition is created if it does not exist yet.
+
+        Args:
+            records (list): (url, chunk_index, content, embedding) tuples.
+            upsert (bool): Overwrite the content and embedding of chunks that
+                already exist instead of keeping the stored version.
+            chunk_counts (dict): Current number of chunks per URL; stored chunks
+                at or beyond that index are deleted, so shrunken pages lose
+                their stale tail. Implies `upsert`.
+            batch_size (int): Records per COPY/transaction.
+            collection (str): The collection the pages belong to.
+
+        Returns:
+            int: The number of rows inserted, updated or deleted.
+        """
+        self.ensure_collection(collection)
+        upsert = upsert or chunk_counts is not None
+        # Keep the last record for each (url, chunk_index), a batch may not touch a row twice
+        unique = {}
+        for url, chunk_index, content, embedding in records:
+            unique[(url, chunk_index)] = (url, chunk_index, content, embedding)
+        records = list(unique.values())
+
+        on_conflict = (
+            "DO UPDATE SET embedding = EXCLUDED.embedding, content = EXCLUDED.content, "
+            "chunk_hash = EXCLUDED.chunk_hash, updated_at = now()"
+            if upsert else "DO NOTHING"
+        )
+        merge_query = f"""
+        INSERT INTO scraptable (collection, url, chunk_index, embedding, content, chunk_hash)
+        SELECT %(collection)s, url, chunk_index, embedding, content, chunk_hash FROM scraptable_staging
+        ON CONFLICT (collection, url, chunk_index) {on_conflict};
+        """
+        written = 0
         try:
-            logger.debug("Ensuring 'scraptable' table exists...")
-            create_table_query = """
-            CREATE TABLE IF NOT EXISTS scraptable (
-                id SERIAL PRIMARY KEY,
-                url TEXT NOT NULL,
-                embedding VECTOR(1536) NOT NULL,
-                content TEXT NOT NULL
-            );
-            """
-            self.cursor.execute(create_table_query)
-            self.conn.commit()
-            logger.info("'scraptable' table ensured to exist.")
-
-            logger.debug("Ensuring 'url' column has UNIQUE constraint...")
-            # Check if the unique constraint already exists
-            check_constraint_query = """
-            SELECT conname
-            FROM pg_constraint
-            WHERE conname = 'unique_url';
-            """
-            self.cursor.execute(check_constraint_query)
-            result = self.cursor.fetchone()
-
-            if not result:
-                logger.debug("Adding UNIQUE constraint to 'url' column...")
-                add_unique_constraint_query = """
-                ALTER TABLE scraptable
-                ADD CONSTRAINT unique_url UNIQUE (url);
-                """
-                self.cursor.execute(add_unique_constraint_query)
+            for start in range(0, len(records), batch_size):
+                batch = records[start:start + batch_size]
+                self.cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS scraptable_staging
+                ON COMMIT DELETE ROWS
+                AS SELECT url, chunk_index, embedding, content, chunk_hash FROM scraptable WITH NO DATA;
+                """)
+                self.cursor.copy_expert(
+                    "COPY scraptable_staging (url, chunk_index, embedding, content, chunk_hash) "
+                    "FROM STDIN WITH (FORMAT BINARY)",
+                    _encode_copy_binary(batch)
+                )
+                self.cursor.execute(merge_query, {"collection": collection})
+                written += self.cursor.rowcount
                 self.conn.commit()
-                logger.info("UNIQUE constraint on 'url' column added successfully.")
-            else:
-                logger.info("UNIQUE constraint on 'url' column already exists.")
+
+            if chunk_counts:
+                self.cursor.execute("""
+                DELETE FROM scraptable t
+                USING unnest(%s::text[], %s::int[]) AS p(url, chunk_count)
+                WHERE t.collection = %s AND t.url = p.url AND t.chunk_index >= p.chunk_count;
+                """, (list(chunk_counts), list(chunk_counts.values()), collection))
+                written += self.cursor.rowcount
+                self.conn.commit()
+
+            logger.info("Wrote %d of %d records to collection '%s'.", written, len(records), collection)
+            return written
         except Exception as e:
-            logger.error("Failed to ensure 'scraptable' table or constraints exist: %s", e)
+            logger.error("Failed to write %d vectors: %s", len(records), e)
             self.conn.rollback()
             raise
 
-    def insert_vector(self, url: str, embedding: list, content: str):
+    def get_chunk_hashes(self, urls: List[str], collection: str = DEFAULT_COLLECTION) -> Dict[str, Dict[int, str]]:
+        """
+        Returns the stored content hash of every chunk of the given URLs in a collection.
+        """
+        self.cursor.execute(
+            "SELECT url, chunk_index, chunk_hash FROM scraptable WHERE collection = %s AND url = ANY(%s);",
+            (collection, list(urls))
+        )
+        hashes = {}
+        for row in self.cursor.fetchall():
+            hashes.setdefault(row["url"], {})[row["chunk_index"]] = row["chunk_hash"]
+        return hashes
+
+    def get_pages(self, base_url: str, collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
         """
-        Inserts a new record into the 'scraptable' table if the URL doesn't already exist.
+        Returns the stored fetch metadata of every page of a collection that is
+        `base_url` or lies below it (see `utils.url_utils.in_scope`).
+        """
+        self.cursor.execute("""
+        SELECT url, etag, last_modified, content_hash, links, last_crawled, text_hash, simhash, duplicate_of
+        FROM scraptable_pages
+        WHERE collection = %s AND (url = %s OR starts_with(url, %s) OR starts_with(url, %s));
+        """, (collection, base_url, scope_prefix(base_url), base_url + "?"))
+        return {row["url"]: dict(row) for row in self.cursor.fetchall()}
+
+    def upsert_pages(self, pages: List[dict], collection: str = DEFAULT_COLLECTION):
+        """
+        Records fetch metadata (etag, last_modified, content_hash, links) and duplicate
+        detection results (text_hash, simhash, duplicate_of) for pages crawled into a
+        collection, and stamps them with the current time as last_crawled.
+
+        `simhash` is stored as a signed BIGINT (see services.dedupe.to_signed).
         """
         try:
-            logger.debug(
-                "Inserting data - URL: %s, Content (first 50 chars): %s, Embedding (first 5 dims): %s",
-                url, content[:50], embedding[:5]
-            )
-            # Convert list to PostgreSQL-compatible array with proper formatting
-            embedding_str = f"[{', '.join(map(str, embedding))}]"
+            execute_values(self.cursor, """
+            INSERT INTO scraptable_pages (collection, url, etag, last_modified, content_hash, links,
+                                          text_hash, simhash, duplicate_of, last_crawled)
+            VALUES %s
+            ON CONFLICT (collection, url) DO UPDATE SET
+                etag = EXCLUDED.etag,
+                last_modified = EXCLUDED.last_modified,
+                content_hash = EXCLUDED.content_hash,
+                links = EXCLUDED.links,
+                text_hash = EXCLUDED.text_hash,
+                simhash = EXCLUDED.simhash,
+                duplicate_of = EXCLUDED.duplicate_of,
+                last_crawled = EXCLUDED.last_crawled;
+            """, [
+                (collection, page["url"], page.get("etag"), page.get("last_modified"), page.get("content_hash"),
+                 list(page.get("links") or []), page.get("text_hash"), page.get("simhash"), page.get("duplicate_of"))
+                for page in {page["url"]: page for page in pages}.values()
+            ], template="(%s, %s, %s, %s, %s, %s::text[], %s, %s, %s, now())")
+            self.conn.commit()
+        except Exception as e:
+            logger.error("Failed to record fetch metadata for %d pages: %s", len(pages), e)
+            self.conn.rollback()
+            raise
 
-            insert_query = """
-            INSERT INTO scraptable (url, embedding, content)
-            VALUES (%s, %s::vector, %s)
-            ON CONFLICT (url) DO NOTHING;
-            """
-            self.cursor.execute(insert_query, (url, embedding_str, content))
+    def delete_pages(self, urls: List[str], collection: str = DEFAULT_COLLECTION) -> int:
+        """
+        Deletes all chunks and the fetch metadata of the given URLs in a collection.
+
+        Returns:
+            int: The number of chunks deleted.
+        """
+        try:
+            self.cursor.execute("DELETE FROM scraptable WHERE collection = %s AND url = ANY(%s);",
+                                (collection, list(urls)))
+            deleted = self.cursor.rowcount
+            self.cursor.execute("DELETE FROM scraptable_pages WHERE collection = %s AND url = ANY(%s);",
+                                (collection, list(urls)))
             self.conn.commit()
-            logger.info("Data inserted successfully for URL: %s", url)
+            logger.info("Deleted %d chunks of %d pages.", deleted, len(urls))
+            return deleted
         except Exception as e:
-            logger.error("Failed to insert vector for URL %s: %s", url, e)
+            logger.error("Failed to delete pages %s: %s", urls, e)
             self.conn.rollback()
             raise
 
-    def query_similar(self, embedding: list, top_k: int = 5):
+    def query_similar(self, embedding: list, top_k: int = 5, ef_search: int = HNSW_EF_SEARCH,
+                      probes: int = IVFFLAT_PROBES, with_content: bool = True,
+                      collection: Optional[str] = DEFAULT_COLLECTION):
         """
         Queries the database for the most similar vectors based on the provided embedding.
+
+        The inner query orders by the distance the ANN index is built on, so
+        the index can serve it, and the collection filter prunes the scan to
+        that collection's partition and index. With VECTOR_QUANTIZATION set,
+        that distance is approximate: the index's top QUANTIZED_CANDIDATES are
+        re-ranked by exact distance on the full vectors.
+
+        Args:
+            embedding (list): The query embedding.
+            top_k (int): Number of results to return.
+            ef_search (int): HNSW candidate list size; higher trades latency for recall.
+            probes (int): IVFFlat lists to scan; higher trades latency for recall.
+            with_content (bool): Also return each chunk's full content, not just its snippet.
+            collection (str): The collection to search, or None for all of them.
+
+        Returns:
+            list: Rows with id, url, snippet, similarity and, if asked for, content.
         """
         try:
             logger.debug("Executing similarity query with top_k: %d", top_k)
-            # Convert list to PostgreSQL-compatible array with proper formatting
-            embedding_str = f"[{', '.join(map(str, embedding))}]"
-
-            query = """
-            SELECT id, url, content, 1 - (embedding <=> %s::vector) AS similarity
-            FROM scraptable
-            ORDER BY similarity DESC
-            LIMIT %s;
+            shortlist = _shortlist_size(top_k)
+            self._prepare_search(embedding, ef_search, probes, shortlist)
+            query = f"""
+            SELECT {_result_columns(with_content)}, 1 - distance AS similarity
+            FROM (
+                SELECT id, url, content, embedding <=> {_QUERY_VECTOR} AS distance
+                FROM scraptable
+                {_collection_filter(collection)}
+                ORDER BY {_index_distance()}
+                LIMIT %(shortlist)s
+            ) nearest
+            ORDER BY distance
+            LIMIT %(top_k)s;
             """
-            self.cursor.execute(query, (embedding_str, top_k))
+            self.cursor.execute(query, {"shortlist": shortlist, "top_k": top_k, "snippet_length": SNIPPET_LENGTH,
+                                        "collection": collection})
             results = self.cursor.fetchall()
             logger.info("Retrieved %d similar records.", len(results))
             return results
@@ -119,22 +727,322 @@ class VectorDB:
             logger.error("Failed to query similar vectors: %s", e)
             raise
 
+    def query_keyword(self, query_text: str, top_k: int = 5, with_content: bool = True,
+                      collection: Optional[str] = DEFAULT_COLLECTION):
+        """
+        Full-text searches chunk content, ranking matches with ts_rank_cd.
+
+        The question is parsed with websearch_to_tsquery, so quoted phrases and
+        -exclusions work, and the GIN index on content_tsv serves the match.
+
+        Returns:
+            list: Rows with id, url, snippet, score and, if asked for, content.
+        """
+        try:
+            logger.debug("Executing keyword query with top_k: %d", top_k)
+            self.cursor.execute(f"""
+            SELECT {_result_columns(with_content)}, ts_rank_cd(content_tsv, query) AS score
+            FROM scraptable, websearch_to_tsquery(%(config)s::regconfig, %(query)s) AS query
+            {_collection_filter(collection)} {"AND" if collection is not None else "WHERE"} content_tsv @@ query
+            ORDER BY score DESC
+            LIMIT %(top_k)s;
+            """, {"config": TEXT_SEARCH_CONFIG, "query": query_text, "top_k": top_k,
+                  "snippet_length": SNIPPET_LENGTH, "collection": collection})
+            results = self.cursor.fetchall()
+            logger.info("Retrieved %d keyword matches.", len(results))
+            return results
+        except Exception as e:
+            logger.error("Failed to query keyword matches: %s", e)
+            raise
+
+    def query_hybrid(self, embedding: list, query_text: str, top_k: int = 5,
+                     candidates: int = HYBRID_CANDIDATES, rrf_k: int = RRF_K,
+                     ef_search: int = HNSW_EF_SEARCH, probes: int = IVFFLAT_PROBES, with_content: bool = True,
+                     collection: Optional[str] = DEFAULT_COLLECTION):
+        """
+        Combines vector and keyword search with reciprocal-rank fusion in one query.
+
+        The top `candidates` chunks of each path are scored 1 / (rrf_k + rank)
+        per path they appear in, and the summed scores decide the final order.
+        Chunks matching the question's exact terms thus rise even when their
+        embedding is not the closest.
+
+        Returns:
+            list: Rows with id, url, snippet, similarity (cosine), score (fused)
+                and, if `with_content`, content.
+        """
+        try:
+            logger.debug("Executing hybrid query with top_k: %d", top_k)
+            candidates = max(candidates, top_k)
+            shortlist = _shortlist_size(candidates)
+            self._prepare_search(embedding, ef_search, probes, shortlist)
+            self.cursor.execute(f"""
+            WITH semantic AS (
+                SELECT id, row_number() OVER (ORDER BY distance) AS rank
+                FROM (
+                    SELECT id, embedding <=> {_QUERY_VECTOR} AS distance
+                    FROM scraptable
+                    {_collection_filter(collection)}
+                    ORDER BY {_index_distance()}
+                    LIMIT %(shortlist)s
+                ) nearest
+                ORDER BY rank
+                LIMIT %(candidates)s
+            ),
+            lexical AS (
+                SELECT id, row_number() OVER (ORDER BY score DESC) AS rank
+                FROM (
+                    SELECT id, ts_rank_cd(content_tsv, query) AS score
+                    FROM scraptable, websearch_to_tsquery(%(config)s::regconfig, %(query)s) AS query
+                    {_collection_filter(collection)} {"AND" if collection is not None else "WHERE"} content_tsv @@ query
+                    ORDER BY score DESC
+                    LIMIT %(candidates)s
+                ) matches
+            ),
+            fused AS (
+                SELECT id,
+                       COALESCE(1 / (%(rrf_k)s + semantic.rank)::float8, 0)
+                       + COALESCE(1 / (%(rrf_k)s + lexical.rank)::float8, 0) AS score
+                FROM semantic FULL OUTER JOIN lexical USING (id)
+                ORDER BY score DESC
+                LIMIT %(top_k)s
+            )
+            SELECT {_result_columns(with_content, "s.")},
+                   1 - (s.embedding <=> {_QUERY_VECTOR}) AS similarity, fused.score
+            FROM fused JOIN scraptable s USING (id)
+            {_collection_filter(collection, "s.")}
+            ORDER BY fused.score DESC;
+            """, {
+                "shortlist": shortlist, "candidates": candidates, "config": TEXT_SEARCH_CONFIG,
+                "query": query_text, "rrf_k": rrf_k, "top_k": top_k, "snippet_length": SNIPPET_LENGTH,
+                "collection": collection,
+            })
+            results = self.cursor.fetchall()
+            logger.info("Retrieved %d hybrid results.", len(results))
+            return results
+        except Exception as e:
+            logger.error("Failed to query hybrid results: %s", e)
+            raise
+
+    def _prepare_search(self, embedding: list, ef_search: int, probes: int, limit: int):
+        """
+        Sets the recall knobs and sends the query vector for the next search.
+
+        psycopg2 binds parameters only as text, so the vector goes by binary
+        COPY, in pgvector's wire format, into the session's temp table that
+        _QUERY_VECTOR reads. Both apply to this transaction only; close()
+        rolls it back.
+        """
+        if self.conn not in _query_vector_sessions:
+            # Created in a transaction of its own when none is open, so the rollback keeps it
+            idle = self.conn.info.transaction_status == TRANSACTION_STATUS_IDLE
+            self.cursor.execute("CREATE TEMP TABLE IF NOT EXISTS scraptable_query (embedding vector);")
+            if idle:
+                self.conn.commit()
+                _query_vector_sessions.add(self.conn)
+        # Postgres rejects an hnsw.ef_search above 1000
+        self.cursor.execute(
+            "DELETE FROM pg_temp.scraptable_query; "
+            "SELECT set_config('hnsw.ef_search', %s, true), set_config('ivfflat.probes', %s, true);",
+            (str(min(max(ef_search, limit), 1000)), str(probes))
+        )
+        self.cursor.copy_expert("COPY pg_temp.scraptable_query FROM STDIN WITH (FORMAT BINARY)",
+                                _encode_query_vector(embedding))
+
+    def ensure_collection(self, collection: str):
+        """
+        Creates the partition holding a collection's chunks if it does not exist.
+        It gets the parent table's indexes, so its searches use its own ANN index.
+        """
+        partition = _partition_name(collection)
+        self.cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS exists;", (partition,))
+        if self.cursor.fetchone()["exists"]:
+            return
+        try:
+            self.cursor.execute(f"CREATE TABLE IF NOT EXISTS {partition} PARTITION OF scraptable FOR VALUES IN (%s);",
+                                (collection,))
+            self.conn.commit()
+            logger.info("Created collection '%s'.", collection)
+        except (errors.DuplicateTable, errors.UniqueViolation):
+            # Another connection created it first
+            self.conn.rollback()
+
+    def drop_collection(self, collection: str) -> bool:
+        """
+        Deletes a collection: its partition is dropped, which is immediate
+        however many chunks it holds, and its pages' fetch metadata removed.
+
+        Returns:
+            bool: Whether the collection existed.
+        """
+        partition = _partition_name(collection)
+        try:
+            self.cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS exists;", (partition,))
+            existed = self.cursor.fetchone()["exists"]
+            self.cursor.execute(f"DROP TABLE IF EXISTS {partition};")
+            self.cursor.execute("DELETE FROM scraptable_pages WHERE collection = %s;", (collection,))
+            self.conn.commit()
+            logger.info("Dropped collection '%s'.", collection)
+            return existed
+        except Exception as e:
+            logger.error("Failed to drop collection '%s': %s", collection, e)
+            self.conn.rollback()
+            raise
+
+    def list_collections(self) -> List[dict]:
+        """
+        Lists the collections with their planner row estimate (None before the
+        partition was first analyzed) and size on disk, from the catalog
+        without scanning any table.
+        """
+        self.cursor.execute("""
+        SELECT substr(c.relname, %(offset)s) AS name,
+               CASE WHEN c.reltuples >= 0 THEN c.reltuples::bigint END AS approximate_rows,
+               pg_total_relation_size(c.oid) AS bytes
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'scraptable'::regclass
+        ORDER BY name;
+        """, {"offset": len(_partition_name("x"))})
+        return [dict(row) for row in self.cursor.fetchall()]
+
+    def rebuild_index(self, collection: Optional[str] = None):
+        """
+        Rebuilds the ANN index of one collection, or of every collection,
+        without blocking writes, e.g. after a bulk load.
+
+        Each partition's index is rebuilt concurrently in turn. For IVFFlat
+        this also recomputes the list count from the partition's row count. If
+        the index does not exist yet, e.g. after changing VECTOR_INDEX_TYPE or
+        VECTOR_QUANTIZATION, it is built concurrently on each partition and
+        attached to the parent.
+        """
+        if VECTOR_INDEX_TYPE == "none":
+            logger.info("VECTOR_INDEX_TYPE is 'none', no index to rebuild.")
+            return
+        name = _vector_index_name()
+        partition = _partition_name(collection) if collection is not None else None
+        self.conn.rollback()
+        self.conn.autocommit = True  # CREATE INDEX/REINDEX CONCURRENTLY cannot run in a transaction
+        try:
+            if INDEX_MAINTENANCE_WORK_MEM:
+                self.cursor.execute("SELECT set_config('maintenance_work_mem', %s, false);",
+                                    (INDEX_MAINTENANCE_WORK_MEM,))
+            self.cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS exists;", (name,))
+            if not self.cursor.fetchone()["exists"]:
+                self._build_index(name)
+                return
+            self.cursor.execute("""
+            SELECT t.relname AS partition, c.relname AS index
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_index x ON x.indexrelid = c.oid
+            JOIN pg_class t ON t.oid = x.indrelid
+            WHERE i.inhparent = %(index)s::regclass AND (%(partition)s::text IS NULL OR t.relname = %(partition)s)
+            ORDER BY t.relname;
+            """, {"index": name, "partition": partition})
+            for row in self.cursor.fetchall():
+                if VECTOR_INDEX_TYPE == "ivfflat":
+                    lists = _ivfflat_lists(self.cursor, row["partition"])
+                    self.cursor.execute(f"ALTER INDEX {row['index']} SET (lists = {lists});")
+                logger.info("Rebuilding %s index %s...", VECTOR_INDEX_TYPE, row["index"])
+                self.cursor.execute(f"REINDEX INDEX CONCURRENTLY {row['index']};")
+                self.cursor.execute(f"ANALYZE {row['partition']};")
+            logger.info("Index %s rebuilt.", name)
+        except Exception as e:
+            logger.error("Failed to rebuild index %s: %s", name, e)
+            raise
+        finally:
+            if INDEX_MAINTENANCE_WORK_MEM:
+                self.cursor.execute("RESET maintenance_work_mem;")
+            self.conn.autocommit = False
+
+    def _build_index(self, name: str):
+        """
+        Creates the parent's ANN index without locking writes: an index on the
+        parent alone, then each partition's index built concurrently and attached.
+        """
+        _check_quantization_support(self.conn)
+        self.cursor.execute(_vector_index_ddl(name, _ivfflat_lists(self.cursor), table="ONLY scraptable"))
+        self.cursor.execute("""
+        SELECT c.relname AS partition FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'scraptable'::regclass;
+        """)
+        for row in self.cursor.fetchall():
+            index = _partition_index_name(row["partition"])
+            logger.info("Building %s index %s...", VECTOR_INDEX_TYPE, index)
+            self.cursor.execute(_vector_index_ddl(index, _ivfflat_lists(self.cursor, row["partition"]),
+                                                  concurrently=True, table=row["partition"]))
+            self.cursor.execute(f"ALTER INDEX {name} ATTACH PARTITION {index};")
+            self.cursor.execute(f"ANALYZE {row['partition']};")
+        logger.info("Index %s built.", name)
+
+    def fetch_embeddings(self, since=None, batch_size: int = 5000):
+        """
+        Streams (id, collection, url, content, embedding, updated_at) rows of
+        every collection, optionally only those updated after `since`, in
+        batches from a server-side cursor.
+
+        Embeddings are sent in pgvector's binary format rather than as text,
+        which is about a quarter of the bytes and needs no float parsing, and
+        are returned as float32 numpy arrays.
+        """
+        cursor = self.conn.cursor(name="fetch_embeddings", cursor_factory=RealDictCursor)
+        cursor.itersize = batch_size
+        try:
+            cursor.execute("""
+            SELECT id, collection, url, content, vector_send(embedding) AS embedding, updated_at
+            FROM scraptable
+            WHERE %(since)s::timestamptz IS NULL OR updated_at > %(since)s::timestamptz;
+            """, {"since": since})
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    row["embedding"] = _decode_vector(row["embedding"])
+                yield rows
+        finally:
+            cursor.close()
+            self.conn.rollback()
+
+    def count_rows(self) -> int:
+        self.cursor.execute("SELECT count(*) AS rows FROM scraptable;")
+        return self.cursor.fetchone()["rows"]
+
+    def get_ids(self) -> List[int]:
+        self.cursor.execute("SELECT id FROM scraptable;")
+        return [row["id"] for row in self.cursor.fetchall()]
+
+    def get_chunks(self, ids: List[int], with_content: bool = True) -> List[dict]:
+        """
+        Fetches several chunks by id in one query, in the order of `ids`.
+
+        Returns:
+            list: Rows with id, url, snippet and, if asked for, content; unknown ids are skipped.
+        """
+        if not ids:
+            return []
+        self.cursor.execute(f"""
+        SELECT {_result_columns(with_content)}
+        FROM scraptable
+        WHERE id = ANY(%(ids)s);
+        """, {"ids": list(ids), "snippet_length": SNIPPET_LENGTH})
+        rows = {row["id"]: row for row in self.cursor.fetchall()}
+        return [rows[record_id] for record_id in ids if record_id in rows]
+
     def get_content_snippet(self, record_id: int):
         """
         Fetches a content snippet for a given record ID.
+
+        Prefer `get_chunks` for several records, or the snippet the retrieval
+        queries already return.
         """
         try:
             logger.debug("Fetching content snippet for record ID: %d", record_id)
-            query = """
-            SELECT content
-            FROM scraptable
-            WHERE id = %s;
-            """
-            self.cursor.execute(query, (record_id,))
-            result = self.cursor.fetchone()
+            result = next(iter(self.get_chunks([record_id], with_content=False)), None)
 
-            if result and "content" in result:
-                snippet = result["content"][:200] + "..." if len(result["content"]) > 200 else result["content"]
+            if result:
+                snippet = result["snippet"]
                 logger.debug("Snippet retrieved for record ID %d: %s", record_id, snippet)
                 return snippet
             else:
@@ -146,9 +1054,13 @@ class VectorDB:
 
     def close(self):
         """
-        Closes the database connection.
+        Returns the database connection to the pool.
         """
         if self.conn:
             self.cursor.close()
-            self.conn.close()
-            logger.info("Database connection closed.")
\ No newline at end of file
+            if not self.conn.closed:
+                # Don't hand an open transaction to the next user of this connection
+                self.conn.rollback()
+            self._pool.putconn(self.conn)
+            self.conn = None
+            logger.debug("Database connection returned to the pool.")
\ No newline at end of file
@@ -0,0 +1,103 @@
+import importlib
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+from config import OPENAI_API_KEY
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Modules the API handlers import on first use
+REQUEST_MODULES = ("services.vectorstore", "services.rag", "services.jobs", "services.reset")
+
+# Seconds spent in each startup phase, e.g. "import", "database" and each warm-up step
+startup_seconds: Dict[str, float] = {}
+
+_hooks: List[Callable[[], None]] = []
+
+
+@contextmanager
+def startup_phase(name: str):
+    """
+    Times the enclosed block as startup phase `name`, reported on /metrics.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_seconds[name] = time.perf_counter() - start
+
+
+def on_warm_up(hook: Callable[[], None]) -> Callable[[], None]:
+    """
+    Registers a callable for `warm_up` to run after its own steps, e.g. to
+    load a model or prime a cache. Can be used as a decorator.
+    """
+    _hooks.append(hook)
+    return hook
+
+
+def _import_request_modules():
+    for name in REQUEST_MODULES:
+        importlib.import_module(name)
+
+
+def _open_caches():
+    from services.cache import open_caches
+
+    open_caches()
+
+
+def _load_tokenizer():
+    from utils.text_utils import count_tokens
+
+    count_tokens("warm up")
+
+
+def _load_embedding_provider():
+    from services.embedding import get_provider
+
+    get_provider()
+
+
+def _create_openai_client():
+    from services.openai_client import openai_client
+
+    if OPENAI_API_KEY:
+        openai_client.sdk  # Importing openai alone takes about half a second
+
+
+def warm_up():
+    """
+    Does the one-time work that would otherwise land on the first requests:
+    imports the modules the API handlers use, opens the cache files, loads
+    the tokenizer and the embedding provider (a local model, if configured)
+    and creates the OpenAI client, then runs the hooks registered with
+    `on_warm_up`.
+
+    A step that fails is logged and skipped; whatever it was loading is
+    loaded again on first use.
+    """
+    steps = [
+        ("imports", _import_request_modules),
+        ("caches", _open_caches),
+        ("tokenizer", _load_tokenizer),
+        ("embedding_provider", _load_embedding_provider),
+        ("openai_client", _create_openai_client),
+    ] + [(getattr(hook, "__name__", "hook"), hook) for hook in _hooks]
+    for name, step in steps:
+        with startup_phase(name):
+            try:
+                step()
+            except Exception as e:
+                logger.warning("Warm-up step %s failed: %s", name, e)
+
+
+def _startup_metrics():
+    return [("scrapper_startup_seconds", "gauge", "Time spent in each startup phase: imports, database and warm-up steps.",
+             [({"phase": phase}, seconds) for phase, seconds in startup_seconds.items()])]
+
+
+metrics.add_collector(_startup_metrics)
@@ -1,4 +1,5 @@
 import logging
+from config import EMBEDDING_DIM
 from services.vectorstore import VectorDB
 
 # Configure logging to display each operation
@@ -11,7 +12,7 @@ def test_rag_pipeline():
     """
     # Test data
     test_text = "Happy birthday VOID 10th dec"
-    fake_embedding = [0.1] * 1536  # Simulated dummy embedding (size matches OpenAI embedding model)
+    fake_embedding = [0.1] * EMBEDDING_DIM  # Simulated dummy embedding (size matches the vector column)
 
     try:
         # Step 1: Connect to the vector database
@@ -1,5 +1,17 @@
+import hashlib
 import re
-from typing import List
+from functools import lru_cache
+from typing import List, Union
+
+import numpy as np
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to an approximate, word-based tokenizer
+    tiktoken = None
+
+# cl100k_base is the tokenizer used by OpenAI's embedding models
+TOKEN_ENCODING = "cl100k_base"
 
 def clean_text(text: str) -> str:
     """
@@ -20,9 +32,89 @@ def clean_text(text: str) -> str:
     # Strip leading and trailing whitespace
     return text.strip()
 
-def chunk_text(text: str, chunk_size: int) -> List[str]:
+def content_hash(content: Union[str, bytes]) -> str:
     """
-    Splits the input text into smaller chunks of a specified size.
+    Returns the SHA-256 hex digest of the content, used to detect unchanged pages and chunks.
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception:
+        # The encoding file could not be loaded (e.g. no network on first use)
+        return None
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens in the text, approximating with ~4 characters per token when tiktoken is unavailable.
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def chunk_text(text: str, chunk_size: int, overlap: int = 0) -> List[str]:
+    """
+    Splits the input text into chunks of at most `chunk_size` tokens.
+
+    Consecutive chunks share `overlap` tokens so that passages cut at a chunk
+    boundary still appear whole in one of them.
+
+    Args:
+        text (str): The text to split.
+        chunk_size (int): Maximum tokens per chunk.
+        overlap (int): Tokens repeated between consecutive chunks.
+
+    Returns:
+        List[str]: The chunks, in document order.
     """
+    if overlap >= chunk_size:
+        raise ValueError("overlap must be smaller than chunk_size")
+
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return [encoding.decode(window) for window in _windows(tokens, chunk_size, overlap)]
+
+    # Without a tokenizer, treat words as tokens but keep chunks conservatively
+    # small: English text averages roughly 0.75 words per token.
     words = text.split()
-    return [" ".join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
\ No newline at end of file
+    words_per_chunk = max(1, int(chunk_size * 0.75))
+    word_overlap = min(int(overlap * 0.75), words_per_chunk - 1)
+    return [" ".join(window) for window in _windows(words, words_per_chunk, word_overlap)]
+
+def _windows(items: list, size: int, overlap: int) -> List[list]:
+    step = size - overlap
+    windows = []
+    for start in range(0, len(items), step):
+        windows.append(items[start:start + size])
+        if start + size >= len(items):
+            break
+    return windows
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """
+    Computes a 64-bit SimHash over word shingles of the text.
+
+    Texts that share most of their shingles get fingerprints that differ in
+    only a few bits, so near-duplicate pages can be found by Hamming distance.
+    """
+    words = text.lower().split()
+    if not words:
+        return 0
+    shingles = {" ".join(words[i:i + shingle_size]) for i in range(max(1, len(words) - shingle_size + 1))}
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+         for shingle in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    # Each bit of the fingerprint is the majority vote of that bit across all shingles
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(votes, bitorder="little").tobytes(), "little")
@@ -0,0 +1,62 @@
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+
+from config import URL_STRIP_QUERY_PARAMS
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalizes a URL so that equivalent spellings dedupe to one frontier entry.
+
+    The scheme and host are lowercased, default ports and fragments are dropped,
+    tracking parameters (URL_STRIP_QUERY_PARAMS) are removed and the remaining
+    query parameters are sorted by name. Parameters are otherwise kept as the
+    site wrote them: a bare "?foo" stays bare and nothing is re-encoded, since
+    some servers tell those spellings apart. Trailing slashes are kept: "/docs/"
+    and "/docs" resolve relative links differently, so they are different pages.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        host = f"{userinfo}@{host}"
+    path = parts.path or "/"
+    query = parts.query
+    if query:
+        # A stable sort on the name keeps repeated parameters in their original order
+        params = [(_param_name(param), param) for param in query.split("&") if param]
+        query = "&".join(param for name, param in sorted(params, key=lambda item: item[0])
+                         if not _is_stripped(name))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def scope_prefix(base_url: str) -> str:
+    """
+    Returns the prefix of every URL below `base_url`, ending at a path segment
+    boundary, so that "/docs" covers "/docs/api" but not "/docs-old".
+    """
+    path = urlsplit(base_url).path
+    if base_url.endswith("/") or not path:
+        return base_url
+    return base_url + "/"
+
+
+def in_scope(url: str, base_url: str) -> bool:
+    """
+    Whether a normalized URL is `base_url` itself (with any query) or lies below it.
+    """
+    return url == base_url or url.startswith(scope_prefix(base_url)) or url.startswith(base_url + "?")
+
+
+def _param_name(param: str) -> str:
+    return unquote_plus(param.split("=", 1)[0])
+
+
+def _is_stripped(param: str) -> bool:
+    param = param.lower()
+    return any(param.startswith(pattern[:-1]) if pattern.endswith("*") else param == pattern
+               for pattern in URL_STRIP_QUERY_PARAMS)